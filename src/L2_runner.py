@@ -1,8 +1,13 @@
 
 import sys
 sys.path.append("..") # Adds higher directory to python modules path.
-from program_manipulation import ProgramManipulator
+from program_manipulation import ProgramManipulator, FunctionChunkStore
 from runner import *
+from run_journal import RunJournal
+from mutant_diff import MutantSet
+from ptxc_builder import PtxcBuilder
+from mutant_store import MutantStore
+from cpu_budget import CPUBudget
 from shutil import copy
 from os.path import isfile, join
 import subprocess
@@ -11,8 +16,8 @@ import re
 import yaml
 import time
 import multiprocessing as mp
-import threading
 import queue
+import signal
 
 
 def process_instructions_yaml(yaml_file):
@@ -27,63 +32,103 @@ def get_input_path(insn_info, insn):
     return None
 
 
-def compile_mutated_binary(mutation,function_name, insn, ptxc_pm, command_change_dir_to_ptx, mutated_binary_folder, make_command, path_to_fakeheaders):
-    try:
-        print(f"Compiling {mutation}")
-        mutation_pm = ProgramManipulator(mutation, path_to_fakeheaders)
-        # extract mutated function from mutated folder
-        mutated_func_node = mutation_pm.get_function_ast(function_name)
-        # replace in ptx.c
-        ptxc_pm = ptxc_pm.replace_function(mutated_func_node, function_name)
-        # stitch together ast and write to ptxc.c
-        new_ptxc_program = ptxc_pm.create_string_from_program()
-        # write to ptxc.c
-        f = open(path_to_ptxc, "w+")
-        f.write(new_ptxc_program)
-        f.close()
-
-        # get MUTxxx
-        # add_rm_ftz_sat_f32.MUT2.c
-        pattern="\w*.(\w*).\w*"
-        mutation_filename = ProgramManipulator.extract_last_file_from_prog_path(mutation)
-        mutation_number = re.search(pattern, mutation_filename).group(1)
-        # get make command for specific insn 
-        subprocess.call(f"{command_change_dir_to_ptx} && {make_command}", shell=True, timeout=5)
-        subprocess.call(f"{command_change_dir_to_ptx} && mv {insn} {insn}_{mutation_number}.exe && mv {insn}_{mutation_number}.exe {mutated_binary_folder}/", shell=True)
-        print(f"Created executable: {insn}_{mutation_number}.exe")
-    except Exception as e:
-        print(f"Exception in compile mutated binary {mutation}")
-        print(e)
-        raise e
-
-def run_single_insn(insn, ptxc_pm, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, file_dependencies, pre_compile_flags, test_suite_path, result_dict, eqv_on_all_mutations):
-    mutation_directory_name = f"mutated-programs-{insn}"
-    working_dir_name = f"working-directory-{insn}/"
-    if not os.path.isdir(f"./{working_dir_name}"):
-        os.mkdir(f"./{working_dir_name}")
-    else:
-        os.system(f"rm -rf {working_dir_name}")
-        os.mkdir(f"./{working_dir_name}")
-    insn_start = time.perf_counter()
-    print(f"Processing {insn}")
-    
-    # prepare insn.c file with execute_function from ptxc
+def build_mutated_binaries(insn, function_name, insn_program, mutation_directory_name, ptxc_chunks, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, num_processes=None, mutation_operators=None, mutant_store_dir=None, compilation_info="-lm", pre_compile_flags=None, working_dir_name="working_directory/", file_dependencies=[], sample_size=None, sample_strata="operator", sample_seed=0):
+    """
+    Generates the mutations of insn_program and builds a test binary of the instruction for each of them,
+    compiling only the mutated function and linking it against the rest of ptxc.c, which is compiled once.
+    Returns:
+    (folder of the mutated binaries, path to the oracle binary)
+    """
+    M = Mutator(insn_program, function_name, mutation_directory_name, compilation_info=compilation_info, compilation_pre_flags=pre_compile_flags, MUSIC_executable=path_to_MUSIC, working_dir_name=working_dir_name, file_dependencies=file_dependencies, path_to_fakeheaders=path_to_fakeheaders, num_processes=num_processes,
+                mutation_operators=mutation_operators, sample_size=sample_size, sample_strata=sample_strata, sample_seed=sample_seed, mutant_store_dir=mutant_store_dir)
+    M.generate_mutations()
+    mutant_set = MutantSet(insn_program, function_name, path_to_fakeheaders, other_headers=[f"-I{path_to_ptx_semantics}/c"])
+    # add_rm_ftz_sat_f32.MUT2.c -> MUT2
+    pattern="\w*.(\w*).\w*"
+    mutated_functions = {}
+    for mutation in M.get_mutations():
+        mutated_function = mutant_set.get_function(os.path.join(mutation_directory_name, mutation))
+        if mutated_function is not None:
+            mutated_functions[re.search(pattern, mutation).group(1)] = mutated_function
+    builder = PtxcBuilder(ptxc_chunks, path_to_ptx_semantics, num_processes=num_processes)
+    mutated_binary_folder = os.path.abspath(f"mutated-binaries-{insn}")
+    os.system(f"rm -rf {mutated_binary_folder}")
+    oracle_binary, _ = builder.build_all(insn, function_name, mutated_functions, mutated_binary_folder)
+    return mutated_binary_folder, oracle_binary
+
+def prepare_insn_program(insn, ptxc_chunks, path_to_ptx_semantics, path_to_fakeheaders):
+    """ Writes insn_copy.c, the instruction's test program with execute_insn from ptxc added, and returns its path. """
     oracle_program_path = f"{path_to_ptx_semantics}/c/{insn}.c"
     function_name = f"execute_{insn}"
     insn_file_copy_path = f"{insn}_copy.c"
     insn_file = open(insn_file_copy_path, "w+")
     copy(oracle_program_path, insn_file_copy_path)
     insn_pm = ProgramManipulator(f"{insn}_copy.c", path_to_fakeheaders, other_headers=[f"-I{path_to_ptx_semantics}/c"])
-    execute_insn_func = ptxc_pm.get_function(function_name)
+    execute_insn_func = ptxc_chunks.get_function(function_name)
     updated_insn_program = insn_pm.add_function_to_program(execute_insn_func, add_header="ptxc_utils.h")
 
     insn_file.truncate(0)
     insn_file.write(updated_insn_program)
     insn_file.close()
     # insn file is now ready for mutation.
+    return insn_file_copy_path
+
+def pregenerate_insn_mutations(insn, ptxc_chunks_filename, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, mutant_store_dir, mutation_operators=None):
+    """ Generates the mutations of one instruction into the mutant store. Returns (insn, store key, hit, seconds). """
+    start = time.perf_counter()
+    try:
+        ptxc_chunks = FunctionChunkStore.load(ptxc_chunks_filename)
+        insn_file_copy_path = prepare_insn_program(insn, ptxc_chunks, path_to_ptx_semantics, path_to_fakeheaders)
+        store = MutantStore(mutant_store_dir, path_to_MUSIC)
+        key, hit = store.generate(insn_file_copy_path, ProgramManipulator.get_function_lines(insn_file_copy_path, f"execute_{insn}"), mutation_operators)
+        os.remove(insn_file_copy_path)
+    except Exception as e:
+        # the instruction generates its mutations itself later
+        print(f"Pre-generating mutations of {insn} failed: {e}")
+        key, hit = None, False
+    return insn, key, hit, time.perf_counter() - start
+
+def pregenerate_mutations(insn_list, ptxc_chunks_filename, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, mutant_store_dir, mutation_operators=None, num_processes=None):
+    """
+    Runs MUSIC for all instructions in a pool before any of them is processed, so instructions do not wait
+    on MUSIC one after the other. Instructions find their mutations in the store afterwards.
+    """
+    start = time.perf_counter()
+    num_processes = num_processes if num_processes is not None else mp.cpu_count()
+    context = mp.get_context("fork")
+    with context.Pool(max(1, min(num_processes, len(insn_list)))) as pool:
+        results = []
+        for result, parse_counts in pool.starmap(ProgramManipulator.call_counting_parses, [(pregenerate_insn_mutations, insn, ptxc_chunks_filename, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, mutant_store_dir, mutation_operators) for insn in insn_list]):
+            results.append(result)
+            ProgramManipulator.parse_cache.merge(parse_counts)
+    hits = len([r for r in results if r[2]])
+    generated = len([r for r in results if r[1] is not None and not r[2]])
+    print(f"Pre-generated mutations of {len(insn_list)} instructions in {time.perf_counter()-start:.1f}s: {generated} generated, {hits} already stored")
+    return results
+
+def run_single_insn(insn, ptxc_chunks, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, file_dependencies, pre_compile_flags, test_suite_path, result_dict, eqv_on_all_mutations, cbmc_cache_dir=None, kill_mode="per_mutant", early_exit=False, minimize_suite=None, num_processes=None, journal=None, build_binaries=False, build_cache_dir=None, cbmc_timeout=None, cbmc_max_rss=None, fuzz_prefilter=False, cbmc_batch_size=1, engine="cbmc", counterexamples_per_mutant=1, diversity_budget=60, triage=False, mutation_operators=None, sample_size=None, sample_strata="operator", sample_seed=0, mutant_store_dir=None, oracle_cache_dir=None, incremental_rekill=False):
+    mutation_directory_name = f"mutated-programs-{insn}"
+    working_dir_name = f"working-directory-{insn}/"
+    if not os.path.isdir(f"./{working_dir_name}"):
+        os.mkdir(f"./{working_dir_name}")
+    else:
+        os.system(f"rm -rf {working_dir_name}")
+        os.mkdir(f"./{working_dir_name}")
+    insn_start = time.perf_counter()
+    print(f"Processing {insn}")
+    function_name = f"execute_{insn}"
+    insn_file_copy_path = prepare_insn_program(insn, ptxc_chunks, path_to_ptx_semantics, path_to_fakeheaders)
+    binary_folder = None
+    oracle_binary = None
+    if build_binaries:
+        binary_folder, oracle_binary = build_mutated_binaries(insn, function_name, insn_file_copy_path, mutation_directory_name, ptxc_chunks, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, num_processes=num_processes, mutation_operators=mutation_operators, mutant_store_dir=mutant_store_dir,
+                                                           compilation_info="-lm", pre_compile_flags=pre_compile_flags, working_dir_name=working_dir_name, file_dependencies=file_dependencies, sample_size=sample_size, sample_strata=sample_strata, sample_seed=sample_seed)
     solver = ""  #default
     run_data = L1_runner(insn_file_copy_path, function_name, os.path.join(path_to_ptx_semantics, test_suite_path), mutation_directory_name, "-lm", solver, f"new_inputs_{insn}", 
-                         path_to_MUSIC, path_to_fakeheaders, working_dir_name=working_dir_name,  file_dependencies=file_dependencies, pre_compile_flags=pre_compile_flags,equivalence_on_all_mutations=eqv_on_all_mutations)
+                         path_to_MUSIC, path_to_fakeheaders, working_dir_name=working_dir_name,  file_dependencies=file_dependencies, pre_compile_flags=pre_compile_flags,equivalence_on_all_mutations=eqv_on_all_mutations, cbmc_cache_dir=cbmc_cache_dir, kill_mode=kill_mode, early_exit=early_exit, minimize_suite=minimize_suite,
+                         analysis_dir=f"analysis-{insn}", num_processes=num_processes, journal=journal, journal_key=insn,
+                         binary_folder=binary_folder, oracle_binary=oracle_binary, build_cache_dir=build_cache_dir,
+                         cbmc_timeout=cbmc_timeout, cbmc_max_rss=cbmc_max_rss, fuzz_prefilter=fuzz_prefilter, cbmc_batch_size=cbmc_batch_size, engine=engine, counterexamples_per_mutant=counterexamples_per_mutant, diversity_budget=diversity_budget, triage=triage, mutation_operators=mutation_operators, sample_size=sample_size, sample_strata=sample_strata, sample_seed=sample_seed, mutant_store_dir=mutant_store_dir, oracle_cache_dir=oracle_cache_dir, incremental_rekill=incremental_rekill)
     result_dict[insn] = run_data
     try:
         #os.system(f"rm -rf {working_dir_name}")
@@ -94,18 +139,96 @@ def run_single_insn(insn, ptxc_pm, path_to_ptx_semantics, path_to_MUSIC, path_to
         pass
 
 
-class Worker(threading.Thread):
-    def __init__(self, q, *args, **kwargs):
-        self.q = q
-        super().__init__(*args, **kwargs)
-    def run(self):
-        while True:
+def run_insn_in_process(result_queue, insn, args, kwargs):
+    # own process group, so a timeout also kills the pools, gcc and CBMC processes of this instruction
+    os.setpgrp()
+    result_dict = {}
+    try:
+        run_single_insn(insn, *args, result_dict, **kwargs)
+    except Exception as e:
+        print(f"{insn} failed: {e}")
+        result_dict[insn] = {"Insn Failed due to exception" : str(e)}
+    result_queue.put((insn, result_dict.get(insn)))
+
+def schedule_insns(insn_jobs, result_dict, jobs=1, insn_timeout=None, results_name="Run_Results", interrupt_grace=10):
+    """
+    Runs instructions in up to jobs processes at once and rewrites the results file as each one finishes.
+    Args:
+    insn_jobs = list of (insn, args, kwargs). run_single_insn(insn, *args, result_dict, **kwargs) is called for each.
+    insn_timeout = seconds an instruction may run before it and all its child processes are killed. No limit if None.
+    On Ctrl-C, SIGINT is forwarded to the process groups of the running instructions, which are killed
+    if they have not exited after interrupt_grace seconds.
+    """
+    context = mp.get_context("fork")
+    result_queue = context.Queue()
+    pending = list(insn_jobs)
+    running = {}
+
+    def collect(timeout):
+        # returns False once the queue is empty
+        try:
+            insn, run_data = result_queue.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        result_dict[insn] = run_data if run_data is not None else {"Insn Failed due to exception" : "no results"}
+        write_run_data(result_dict, results_name)
+        return True
+
+    try:
+        while len(pending) > 0 or len(running) > 0:
+            while len(pending) > 0 and len(running) < jobs:
+                insn, args, kwargs = pending.pop(0)
+                process = context.Process(target=run_insn_in_process, args=(result_queue, insn, args, kwargs))
+                process.start()
+                running[insn] = (process, time.perf_counter())
+            collect(1)
+            for insn in list(running):
+                process, start = running[insn]
+                if insn in result_dict:
+                    process.join()
+                    del running[insn]
+                elif not process.is_alive():
+                    # results of a process that just exited may still be in the queue
+                    while insn not in result_dict and collect(1):
+                        pass
+                    process.join()
+                    if insn not in result_dict:
+                        result_dict[insn] = {"Insn Failed due to exception" : f"process exited with code {process.exitcode}"}
+                        write_run_data(result_dict, results_name)
+                    del running[insn]
+                elif insn_timeout is not None and time.perf_counter() - start > insn_timeout:
+                    print(f"{insn} timed out after {insn_timeout} seconds")
+                    try:
+                        os.killpg(process.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                    process.kill()
+                    process.join()
+                    result_dict[insn] = {"Insn Failed due to timeout" : insn_timeout}
+                    write_run_data(result_dict, results_name)
+                    del running[insn]
+    except KeyboardInterrupt:
+        # instructions run in their own process groups, so they do not see the terminal's SIGINT
+        print(f"Interrupted. Stopping {len(running)} running instructions.")
+        for insn in running:
+            try:
+                os.killpg(running[insn][0].pid, signal.SIGINT)
+            except ProcessLookupError:
+                pass
+        deadline = time.perf_counter() + interrupt_grace
+        for insn in running:
+            process = running[insn][0]
+            process.join(max(0, deadline - time.perf_counter()))
             try:
-                work = self.q.get(timeout=3)  # 3s timeout
-            except queue.Empty:
-                return
-            run_single_insn(*work)
-            self.q.task_done()
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            process.join()
+            if insn not in result_dict:
+                result_dict[insn] = {"Insn Failed due to interrupt" : True}
+        write_run_data(result_dict, results_name)
+        raise
+    return result_dict
 
 def hc_insn_list():
     return ["abs_f32"]
@@ -127,7 +250,7 @@ def find_insn_list(path_to_ptx_semantics, total=100):
 
     return insn_list
 
-def runner(path_to_MUSIC, path_to_fakeheaders, insn_list, use_yaml=True, eqv_on_all_mutations=False):
+def runner(path_to_MUSIC, path_to_fakeheaders, insn_list, use_yaml=True, eqv_on_all_mutations=False, cbmc_cache_dir=None, kill_mode="per_mutant", early_exit=False, minimize_suite=None, parse_cache_dir=None, jobs=1, insn_timeout=None, journal_filename="run_journal.jsonl", resume=False, build_binaries=False, build_cache_dir=None, cbmc_timeout=None, cbmc_max_rss=None, fuzz_prefilter=False, cbmc_batch_size=1, engine="cbmc", counterexamples_per_mutant=1, diversity_budget=60, triage=False, mutation_operators=None, sample_size=None, sample_strata="operator", sample_seed=0, mutant_store_dir=None, oracle_cache_dir=None, incremental_rekill=False, ptxc_chunks_filename="ptxc_chunks.bin"):
 
    # idea; start by only looking at tests of f32 type:
    # command to get all of them: find . -maxdepth 1 -name "*f32*.c" -print 
@@ -137,7 +260,10 @@ def runner(path_to_MUSIC, path_to_fakeheaders, insn_list, use_yaml=True, eqv_on_
 
     print("Starting runner")
     total_start = time.perf_counter()
+    if parse_cache_dir is not None:
+        ProgramManipulator.configure_parse_cache(cache_dir=parse_cache_dir)
     result_dict = {}
+    journal = RunJournal(journal_filename, resume=resume)
     #path_to_fakeheaders = "pycparser/utils/fake_libc_include"
     path_to_ptx_semantics = "../ROCetta/ptx-semantics-tests/v6.5"
     #path_to_MUSIC = "./MUSIC/music"
@@ -146,7 +272,11 @@ def runner(path_to_MUSIC, path_to_fakeheaders, insn_list, use_yaml=True, eqv_on_
     print(insn_list)
     ptxc_pm = ProgramManipulator(path_to_ptxc, path_to_fakeheaders,
                                  other_headers=[f"-I{path_to_ptx_semantics}/c"])
-    original_ptxc_contents = open(path_to_ptxc, "r").readlines()
+    # functions of ptxc.c are rendered once and memory-mapped, so instruction processes share them
+    FunctionChunkStore.from_program_manipulator(ptxc_pm).save(ptxc_chunks_filename)
+    ptxc_chunks = FunctionChunkStore.load(ptxc_chunks_filename)
+    # the AST is not needed anymore, don't carry it into the instruction processes
+    del ptxc_pm
 
     if use_yaml:
         insn_info = process_instructions_yaml(f"{path_to_ptx_semantics}/instructions.yaml")
@@ -161,25 +291,17 @@ def runner(path_to_MUSIC, path_to_fakeheaders, insn_list, use_yaml=True, eqv_on_
     # set precompile flags;
     pre_compile_flags = "-g -O3 -L. testutils.c"
 
-    ## parallel method
-    # num_threads = mp.cpu_count()
-    # q = queue.Queue()
-    # for insn in insn_list:
-    #      # test suite associated with 
-    #     if use_yaml:
-    #         test_suite_path = get_input_path(insn_info, insn)
-    #     else:
-    #         insn_info_command = test_info_command + f" {insn}"
-    #         output = subprocess.check_output(test_info_command, shell=True)
-    #         test_suite_path = output.split()[0].split(' ')[1]                
-    #         # run and parse gpusemtest/run_test.py
-    #     q.put_nowait((insn, ptxc_pm, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, file_dependencies, pre_compile_flags, test_suite_path, result_dict))
-    # for _ in range(num_threads):
-    #     Worker(q).start()
-    # q.join()
-
-    ## serial method
+    # instructions run in parallel processes whose worker pools all draw from one budget of a token per core,
+    # so an instruction can use the cores the others leave idle
+    num_processes = mp.cpu_count()
+    if jobs > 1:
+        CPUBudget.configure(mp.cpu_count())
+    insn_jobs = []
     for insn in insn_list:
+        if journal.is_done(insn):
+            print(f"Resuming: {insn} already finished")
+            result_dict[insn] = journal.completed(insn, "done")
+            continue
         # test suite associated with 
         if use_yaml:
             test_suite_path = get_input_path(insn_info, insn)
@@ -190,11 +312,20 @@ def runner(path_to_MUSIC, path_to_fakeheaders, insn_list, use_yaml=True, eqv_on_
             test_suite_path = output.splitlines()[1].split(b' ')[1].decode('utf-8')
 
             # run and parse gpusemtest/run_test.py
-        try:
-            run_single_insn(insn, ptxc_pm, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, file_dependencies, pre_compile_flags, test_suite_path, result_dict, eqv_on_all_mutations)
-        except Exception as e:
-            result_dict[insn] = {"Insn Failed due to exception" : e}
+        insn_jobs.append((insn, (ptxc_chunks, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, file_dependencies, pre_compile_flags, test_suite_path),
+                          {"eqv_on_all_mutations" : eqv_on_all_mutations, "cbmc_cache_dir" : cbmc_cache_dir, "kill_mode" : kill_mode, "early_exit" : early_exit, "minimize_suite" : minimize_suite, "num_processes" : num_processes, "journal" : journal, "build_binaries" : build_binaries, "build_cache_dir" : build_cache_dir, "cbmc_timeout" : cbmc_timeout, "cbmc_max_rss" : cbmc_max_rss, "fuzz_prefilter" : fuzz_prefilter, "cbmc_batch_size" : cbmc_batch_size, "engine" : engine, "counterexamples_per_mutant" : counterexamples_per_mutant, "diversity_budget" : diversity_budget, "triage" : triage, "mutation_operators" : mutation_operators, "sample_size" : sample_size, "sample_strata" : sample_strata, "sample_seed" : sample_seed, "mutant_store_dir" : mutant_store_dir, "oracle_cache_dir" : oracle_cache_dir, "incremental_rekill" : incremental_rekill}))
+    if mutant_store_dir is not None and len(insn_jobs) > 0:
+        pregenerate_mutations([job[0] for job in insn_jobs], ptxc_chunks_filename, path_to_ptx_semantics, path_to_MUSIC, path_to_fakeheaders, mutant_store_dir, mutation_operators=mutation_operators)
+    try:
+        schedule_insns(insn_jobs, result_dict, jobs=jobs, insn_timeout=insn_timeout, results_name="Run_Results")
+    finally:
+        CPUBudget.close()
     write_run_data(result_dict, "Run_Results")
+    # instructions parse in their own processes, their counts come back in the run data
+    for insn, _, _ in insn_jobs:
+        if isinstance(result_dict.get(insn), dict) and isinstance(result_dict[insn].get("parse_cache"), dict):
+            ProgramManipulator.parse_cache.merge({k : v for k, v in result_dict[insn]["parse_cache"].items() if k in ProgramManipulator.parse_cache.counts})
+    print(f"Parse cache: {ProgramManipulator.parse_cache.stats()}")
     total_end = time.perf_counter()
     print(f"Total run took {total_end-total_start}")
 
@@ -208,6 +339,33 @@ if __name__ == "__main__":
     p.add_argument("yaml", choices=["yaml", "no-yaml"], help="Use the instructions.yaml file to find tests (or use run_test.py instead)")
     p.add_argument("list", nargs="?", help="File containing list of instructions to run")
     p.add_argument("--full", action="store_true", help="Do not use existing test suite")
+    p.add_argument("--kill-mode", choices=Mutator.kill_modes, default="per_mutant", help="How mutations are tested: one executable each, one meta-mutant program, or in-process shared objects")
+    p.add_argument("--early-exit", action="store_true", help="Stop testing a mutation at its first differing test row")
+    p.add_argument("--minimize-suite", choices=SuiteMinimizer.methods, help="Write a minimized copy of each new test suite")
+    p.add_argument("--parse-cache-dir", help="Directory to keep parsed program ASTs in across runs")
+    p.add_argument("--cbmc-cache-dir", help="Directory of the persistent CBMC result cache. Results are not cached if not given")
+    p.add_argument("--jobs", "-j", type=int, default=1, help="Number of instructions to run in parallel. Their CPU-bound tasks share one token per core")
+    p.add_argument("--fuzz-prefilter", action="store_true", help="Fuzz surviving mutations with generated edge case inputs before running CBMC on the rest")
+    p.add_argument("--cbmc-timeout", type=float, help="Seconds one CBMC run may take before it is killed and retried with another backend")
+    p.add_argument("--cbmc-max-rss", type=int, help="Megabytes of memory one CBMC run may use before it is killed")
+    p.add_argument("--engine", choices=["cbmc", "smt"], default="cbmc", help="Equivalence checking engine. smt checks mutations against one SMT encoding of the oracle on long-lived z3 processes")
+    p.add_argument("--counterexamples-per-mutant", type=int, default=1, help="Number of distinct counterexamples looked for per mutation, in different float classes first")
+    p.add_argument("--diversity-budget", type=float, default=60, help="Seconds of solver time per mutation spent on counterexamples after the first")
+    p.add_argument("--triage", action="store_true", help="Hash the -O2 code of every mutation first. Mutations with the oracle's code are equivalent, and of mutations with the same code only one is tested")
+    p.add_argument("--incremental-rekill", action="store_true", help="After CBMC, only run the surviving mutations on the generated rows of the new suite, each on its own counterexample first with --early-exit")
+    p.add_argument("--oracle-cache-dir", help="Directory of the persistent cache of oracle outputs per test suite. The oracle runs on every kill pass if not given")
+    p.add_argument("--mutant-store-dir", help="Directory of the content-addressed store of generated mutations. Mutations of all instructions are generated into it in parallel first. MUSIC runs on every generation if not given")
+    p.add_argument("--mutation-operators", nargs="+", help="MUSIC mutation operators to apply, e.g. ORRN OAAN. All operators if not given")
+    p.add_argument("--sample-size", type=int, help="Number of generated mutations to keep per instruction, sampled evenly across operators or lines")
+    p.add_argument("--sample-strata", choices=Mutator.sample_strata, default="operator", help="What the generated mutations are grouped by for sampling")
+    p.add_argument("--sample-seed", type=int, default=0, help="Seed of the mutation sampling")
+    p.add_argument("--cbmc-batch-size", type=int, default=1, help="Number of mutations checked together in one CBMC run, one assertion each")
+    p.add_argument("--build-cache-dir", help="Directory of the persistent cache of compiled executables. Everything is compiled if not given")
+    p.add_argument("--build-binaries", action="store_true", help="Test prebuilt instruction binaries. Only the mutated function is compiled per mutation, the rest of ptxc.c once")
+    p.add_argument("--journal", default="run_journal.jsonl", help="Append-only journal of finished stages and instructions")
+    p.add_argument("--resume", action="store_true", help="Continue the last run in the journal, skipping finished instructions and stages")
+    p.add_argument("--insn-timeout", type=float, help="Seconds after which an instruction is killed")
+    p.add_argument("--ptxc-chunks", default="ptxc_chunks.bin", help="File the rendered functions of ptxc.c are written to and shared by the instruction processes from")
 
     args = p.parse_args()
 
@@ -222,10 +380,10 @@ if __name__ == "__main__":
     flag = use_yaml == "yaml"
 
     if args.list:
-        insn_list = file_insn_list(sys.argv[4])
+        insn_list = file_insn_list(args.list)
     else:
         insn_list = hc_insn_list()
 
     eqvflag = args.full
 
-    runner(MUSIC, fake_headers, insn_list, use_yaml=flag, eqv_on_all_mutations=eqvflag)
+    runner(MUSIC, fake_headers, insn_list, use_yaml=flag, eqv_on_all_mutations=eqvflag, cbmc_cache_dir=args.cbmc_cache_dir, kill_mode=args.kill_mode, early_exit=args.early_exit, minimize_suite=args.minimize_suite, parse_cache_dir=args.parse_cache_dir, jobs=args.jobs, insn_timeout=args.insn_timeout, journal_filename=args.journal, resume=args.resume, build_binaries=args.build_binaries, build_cache_dir=args.build_cache_dir, cbmc_timeout=args.cbmc_timeout, cbmc_max_rss=args.cbmc_max_rss*1024**2 if args.cbmc_max_rss else None, fuzz_prefilter=args.fuzz_prefilter, cbmc_batch_size=args.cbmc_batch_size, engine=args.engine, counterexamples_per_mutant=args.counterexamples_per_mutant, diversity_budget=args.diversity_budget, triage=args.triage, mutation_operators=args.mutation_operators, sample_size=args.sample_size, sample_strata=args.sample_strata, sample_seed=args.sample_seed, mutant_store_dir=args.mutant_store_dir, oracle_cache_dir=args.oracle_cache_dir, incremental_rekill=args.incremental_rekill, ptxc_chunks_filename=args.ptxc_chunks)
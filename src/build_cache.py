@@ -0,0 +1,142 @@
+# This component is a persistent cache of compiled executables, in the spirit of ccache.
+# A build is keyed on the preprocessed text of all its C sources, its compiler flags and the compiler version,
+# so the same oracle or mutation is only compiled once across kill passes and runs.
+# The cache is bounded in size and evicts the least recently used executables first.
+import hashlib
+import os
+import shlex
+import shutil
+import subprocess
+import time
+
+
+class BuildCache(object):
+
+    compiler_versions = {}
+
+    def __init__(self, cache_dir="build-cache", max_bytes=2*1024**3, compiler="gcc"):
+        """
+        Args:
+        cache_dir = directory executables are stored in, one file per key
+        max_bytes = total size of the cached executables before the least recently used are evicted
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.compiler = compiler
+        os.makedirs(cache_dir, exist_ok=True)
+        # size of the cache as seen by this process, only recomputed when eviction might be needed
+        self.size = None
+        # key_seconds is the time spent preprocessing sources for keys, uncacheable counts builds without a key
+        self.counts = {"hits" : 0, "misses" : 0, "uncacheable" : 0, "key_seconds" : 0.0}
+
+    def get_compiler_version(self):
+        if self.compiler not in BuildCache.compiler_versions:
+            BuildCache.compiler_versions[self.compiler] = subprocess.check_output([self.compiler, "--version"], text=True).splitlines()[0]
+        return BuildCache.compiler_versions[self.compiler]
+
+    @staticmethod
+    def split_sources_and_flags(arguments):
+        """
+        Splits compiler arguments into C sources and everything else.
+        The output (-o) must not be part of the arguments.
+        """
+        tokens = shlex.split(arguments)
+        sources = [t for t in tokens if t.endswith(".c")]
+        flags = [t for t in tokens if not t.endswith(".c")]
+        return sources, flags
+
+    def make_key(self, arguments, cwd):
+        """ Key of a build, or None if a source could not be preprocessed. """
+        sources, flags = BuildCache.split_sources_and_flags(arguments)
+        h = hashlib.sha256()
+        h.update(self.get_compiler_version().encode())
+        h.update(b"\0")
+        h.update(" ".join(flags).encode())
+        for source in sources:
+            preprocessed = subprocess.run([self.compiler, "-E"] + flags + [source], cwd=cwd, capture_output=True)
+            if preprocessed.returncode != 0:
+                return None
+            h.update(b"\0")
+            h.update(source.encode())
+            h.update(b"\0")
+            h.update(preprocessed.stdout)
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, key, output):
+        """ Copies the cached executable of key to output. Returns False if it is not cached. """
+        entry = self.entry_path(key)
+        try:
+            shutil.copyfile(entry, output)
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        os.chmod(output, 0o755)
+        return True
+
+    def store(self, key, output):
+        tmp_path = f"{self.entry_path(key)}.{os.getpid()}.tmp"
+        shutil.copyfile(output, tmp_path)
+        os.replace(tmp_path, self.entry_path(key))
+        if self.size is None:
+            self.size = sum([e.stat().st_size for e in os.scandir(self.cache_dir) if e.is_file()])
+        else:
+            self.size += os.path.getsize(output)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """ Removes the least recently used executables until the cache fits in max_bytes. """
+        entries = []
+        for e in os.scandir(self.cache_dir):
+            try:
+                if e.is_file() and not e.name.endswith(".tmp"):
+                    stat = e.stat()
+                    entries.append((stat.st_mtime, stat.st_size, e.path))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        self.size = sum([e[1] for e in entries])
+        for mtime, size, path in entries:
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def compile(self, arguments, output, cwd, timeout=None, capture_output=False):
+        """
+        Runs "<compiler> <arguments> -o <output>" in cwd unless the executable is cached.
+        Returns the subprocess.CompletedProcess of the compilation, or a successful one on a cache hit.
+        """
+        key_start = time.perf_counter()
+        key = self.make_key(arguments, cwd)
+        self.counts["key_seconds"] += time.perf_counter() - key_start
+        output_path = os.path.join(cwd, output)
+        if key is not None and self.lookup(key, output_path):
+            self.counts["hits"] += 1
+            return subprocess.CompletedProcess(arguments, 0, "", "")
+        self.counts["misses" if key is not None else "uncacheable"] += 1
+        compilation = subprocess.run(f"{self.compiler} {arguments} -o {output}", shell=True, cwd=cwd, timeout=timeout, capture_output=capture_output, text=True)
+        if key is not None and compilation.returncode == 0 and os.path.isfile(output_path):
+            self.store(key, output_path)
+        return compilation
+
+    def counts_since(self, before):
+        """ Counts since the copy before was taken, e.g. of one task in a pool worker. """
+        return {k : self.counts[k] - before.get(k, 0) for k in self.counts}
+
+    def merge(self, counts):
+        """ Adds the counts of another process's copy of the cache, e.g. of a pool worker. """
+        for k in counts:
+            self.counts[k] = self.counts.get(k, 0) + counts[k]
+
+    def stats(self, since=None):
+        counts = self.counts_since(since) if since is not None else dict(self.counts)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = counts["hits"] / lookups if lookups > 0 else 0.0
+        return counts
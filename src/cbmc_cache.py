@@ -0,0 +1,78 @@
+# This is a persistent on-disk cache of CBMC equivalence check results.
+# Entries are keyed by the pycparser-normalized oracle and mutated functions, the solver backend and the CBMC version,
+# so unchanged mutants do not pay for another CBMC run when the pipeline is rerun.
+import hashlib
+import json
+import os
+import subprocess
+
+
+class CBMCResultCache(object):
+
+    def __init__(self, cache_dir="cbmc-cache", cbmc_version=None):
+        """
+        Args:
+        cache_dir = directory the cache entries are stored in. Created if it does not exist.
+        cbmc_version = version string of the CBMC used. Queried from cbmc if not given.
+        """
+        self.cache_dir = cache_dir
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        self.cbmc_version = cbmc_version if cbmc_version is not None else CBMCResultCache.get_cbmc_version()
+
+    @staticmethod
+    def get_cbmc_version():
+        try:
+            return subprocess.check_output("cbmc --version", shell=True).decode("utf-8").strip()
+        except Exception as e:
+            print(f"Could not get CBMC version: {e}")
+            return "unknown"
+
+    def make_key(self, oracle_function, mutated_function, backend, includes=[]):
+        """
+        Hash of everything that determines the verdict of an equivalence check.
+        Functions are expected to be pycparser generated strings, so formatting differences in the source do not matter.
+        """
+        h = hashlib.sha256()
+        for part in [self.cbmc_version, backend, "".join(includes), oracle_function, mutated_function]:
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def lookup(self, key):
+        """
+        Returns the cached entry {"verdict": ..., "counterexample": ..., "counterexamples": ..., "diversity_searched": ...}
+        or None on a miss. Entries written without the last two get the first counterexample and 0.
+        """
+        path = self.entry_path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable CBMC cache entry {path}: {e}")
+            return None
+        entry.setdefault("counterexamples", [entry["counterexample"]] if entry.get("counterexample") is not None else [])
+        entry.setdefault("diversity_searched", 0)
+        return entry
+
+    def store(self, key, verdict, counterexample, counterexamples=None, diversity_searched=0):
+        """
+        verdict is "equivalent" or "counterexample".
+        Written to a temporary file first so concurrent workers never see partial entries.
+        Args:
+        counterexamples = all distinct counterexamples found, the first one included. Just counterexample if None.
+        diversity_searched = number of counterexamples the last search for more of them looked for. A search ends early
+                             if there are no more or its budget is spent, so asking for as many again finds no more.
+        """
+        if counterexamples is None:
+            counterexamples = [counterexample] if counterexample is not None else []
+        path = self.entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w+") as f:
+            json.dump({"verdict": verdict, "counterexample": counterexample, "counterexamples": counterexamples, "diversity_searched": diversity_searched}, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,233 @@
+# This component runs CBMC jobs in parallel with per-job wall-clock and memory limits.
+# Jobs are started largest first, and only while enough memory is available for another one.
+# A job that times out is retried with the next backend (e.g. --z3, then --cvc4) before it is given up on.
+# Every running job holds a token of the run's CPUBudget.
+# CBMC's output is read from its stdout pipe while it runs and parsed incrementally by a CBMCTraceParser.
+from cbmc_trace_parser import CBMCTraceParser
+from cpu_budget import CPUBudget
+import codecs
+import os
+import selectors
+import signal
+import subprocess
+import time
+
+
+class CBMCJob(object):
+
+    def __init__(self, name, instrumented_program, variable_names, cwd, backend="", size=0, timeout=None):
+        """
+        Args:
+        name = key the result is returned under
+        instrumented_program = program for CBMC, relative to cwd
+        variable_names = variables whose last assignment in the trace is extracted from CBMC's output
+        size = estimate of the job's cost, larger jobs are started first
+        timeout = seconds an attempt of this job may run, on top of the scheduler's timeout. No limit of its own if None.
+        """
+        self.name = name
+        self.instrumented_program = instrumented_program
+        self.variable_names = variable_names
+        self.cwd = cwd
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self.tried_backends = []
+
+    def command(self):
+        return ["cbmc", "--trace", self.instrumented_program] + self.backend.split() + ["--json-ui"]
+
+
+class CBMCScheduler(object):
+
+    retry_backends = ["--z3", "--cvc4"]
+    poll_interval = 0.1
+    # memory assumed for a job until one has finished
+    default_job_memory = 512*1024**2
+
+    def __init__(self, max_jobs, timeout=None, max_rss=None, memory_reserve=256*1024**2, retry_backends=None):
+        """
+        Args:
+        max_jobs = number of CBMC processes run at once
+        timeout = seconds a single attempt may run. No limit if None.
+        max_rss = bytes of resident memory a job may use before it is killed. No limit if None.
+        memory_reserve = bytes of available memory left alone when deciding whether to start another job
+        retry_backends = backends tried, in order, after a timeout. Defaults to --z3 and --cvc4.
+        """
+        self.max_jobs = max(1, max_jobs)
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.memory_reserve = memory_reserve
+        self.retry_backends = retry_backends if retry_backends is not None else CBMCScheduler.retry_backends
+        self.peak_rss = []
+        self.stats = {"jobs" : 0, "timeouts" : 0, "memory_kills" : 0, "retries" : 0, "max_peak_rss" : 0}
+
+    @staticmethod
+    def memory_available():
+        """ MemAvailable from /proc/meminfo in bytes, or None if it cannot be read. """
+        try:
+            for line in open("/proc/meminfo", "r").readlines():
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    @staticmethod
+    def rss(pid):
+        """ Resident memory of the process in bytes, 0 if it is gone. """
+        try:
+            for line in open(f"/proc/{pid}/status", "r").readlines():
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    @staticmethod
+    def tree_rss(pid):
+        """ Resident memory of the process and all its descendants in bytes. """
+        total = 0
+        pids = [pid]
+        while len(pids) > 0:
+            p = pids.pop()
+            total += CBMCScheduler.rss(p)
+            try:
+                pids += [int(c) for c in open(f"/proc/{p}/task/{p}/children", "r").read().split()]
+            except OSError:
+                pass
+        return total
+
+    def job_memory_estimate(self):
+        return max(self.peak_rss) if len(self.peak_rss) > 0 else CBMCScheduler.default_job_memory
+
+    def can_start(self, num_running):
+        if num_running >= self.max_jobs:
+            return False
+        # one job always runs, however little memory there is
+        if num_running == 0:
+            return True
+        available = CBMCScheduler.memory_available()
+        return available is None or available - self.memory_reserve > self.job_memory_estimate()
+
+    def start(self, job, selector):
+        # own session, so killing the job kills everything it started
+        process = subprocess.Popen(job.command(), cwd=job.cwd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, start_new_session=True)
+        os.set_blocking(process.stdout.fileno(), False)
+        parser = CBMCTraceParser(job.variable_names)
+        selector.register(process.stdout, selectors.EVENT_READ, (parser, codecs.getincrementaldecoder("utf-8")()))
+        return process, parser
+
+    @staticmethod
+    def read_output(selector, timeout):
+        """ Feeds whatever the running jobs have written to their parsers, waiting at most timeout seconds for it. """
+        if len(selector.get_map()) == 0:
+            time.sleep(timeout)
+            return
+        for key, _ in selector.select(timeout):
+            CBMCScheduler.read_available(selector, key.fileobj)
+
+    @staticmethod
+    def read_available(selector, stdout):
+        """ Returns False once stdout is at its end, after which it is unregistered and closed. """
+        parser, decoder = selector.get_key(stdout).data
+        try:
+            data = os.read(stdout.fileno(), 1 << 20)
+        except BlockingIOError:
+            return True
+        parser.feed(decoder.decode(data, final=len(data) == 0))
+        if len(data) == 0:
+            selector.unregister(stdout)
+            stdout.close()
+            return False
+        return True
+
+    @staticmethod
+    def finish_output(selector, process):
+        """ Reads the rest of the output of a process that has exited. """
+        if process.stdout.closed:
+            return
+        os.set_blocking(process.stdout.fileno(), True)
+        while CBMCScheduler.read_available(selector, process.stdout):
+            pass
+
+    @staticmethod
+    def kill(process, selector):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        if not process.stdout.closed:
+            selector.unregister(process.stdout)
+            process.stdout.close()
+        process.wait()
+
+    def next_backend(self, job):
+        for backend in self.retry_backends:
+            if backend != job.backend and backend not in job.tried_backends:
+                return backend
+        return None
+
+    def run(self, jobs):
+        """
+        Runs all jobs. Returns dictionary of job name to result:
+        {"status" : "done" | "timeout" | "memory" | "error", "output" : CBMCTraceParser, "backend", "wall_time"}
+        Only "done" jobs have complete CBMC output.
+        """
+        queue = sorted(jobs, key=lambda j: j.size, reverse=True)
+        self.stats["jobs"] += len(queue)
+        running = []
+        results = {}
+        selector = selectors.DefaultSelector()
+        while len(queue) > 0 or len(running) > 0:
+            while len(queue) > 0 and self.can_start(len(running)):
+                token = CPUBudget.acquire(block=False)
+                if token is None:
+                    break
+                job = queue.pop(0)
+                process, parser = self.start(job, selector)
+                running.append((job, process, parser, time.perf_counter(), [0], token))
+            CBMCScheduler.read_output(selector, CBMCScheduler.poll_interval)
+            still_running = []
+            for job, process, parser, start, peak, token in running:
+                elapsed = time.perf_counter() - start
+                status = None
+                if process.poll() is not None:
+                    CBMCScheduler.finish_output(selector, process)
+                    status = "done" if process.returncode in [0, 10] and parser.complete() else "error"
+                else:
+                    peak[0] = max(peak[0], CBMCScheduler.tree_rss(process.pid))
+                    timeout = min([t for t in [self.timeout, job.timeout] if t is not None], default=None)
+                    if timeout is not None and elapsed > timeout:
+                        CBMCScheduler.kill(process, selector)
+                        status = "timeout"
+                        self.stats["timeouts"] += 1
+                    elif self.max_rss is not None and peak[0] > self.max_rss:
+                        CBMCScheduler.kill(process, selector)
+                        status = "memory"
+                        self.stats["memory_kills"] += 1
+                if status is None:
+                    still_running.append((job, process, parser, start, peak, token))
+                    continue
+                CPUBudget.release(token)
+                if peak[0] > 0:
+                    self.peak_rss.append(peak[0])
+                    self.stats["max_peak_rss"] = max(self.stats["max_peak_rss"], peak[0])
+                backend = self.next_backend(job) if status == "timeout" else None
+                if backend is not None:
+                    print(f"CBMC timed out on {job.name} with backend '{job.backend}'. Retrying with {backend}.")
+                    job.tried_backends.append(job.backend)
+                    job.backend = backend
+                    self.stats["retries"] += 1
+                    queue.insert(0, job)
+                    continue
+                if status != "done":
+                    print(f"CBMC {status} on {job.name}")
+                results[job.name] = {
+                    "status" : status,
+                    "output" : parser,
+                    "backend" : job.backend,
+                    "wall_time" : elapsed
+                }
+            running = still_running
+        selector.close()
+        return results
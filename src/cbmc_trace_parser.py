@@ -0,0 +1,158 @@
+# This component parses CBMC's --json-ui output incrementally, as it is read from CBMC's stdout.
+# Trace events are decoded one at a time and only the last assignment of each requested variable is kept,
+# so a trace is never held in memory as a whole and is scanned exactly once.
+# Everything else CBMC prints (messages, property results, the final status) is kept, with every trace
+# event replaced by 0.
+import json
+import re
+
+
+class CBMCTraceParser(object):
+
+    token_pattern = re.compile(r'[{}\[\]"]')
+    string_token_pattern = re.compile(r'["\\]')
+    # nesting of a trace event: top-level array, element, "result" array, result, "trace" array, event
+    event_depth = 6
+    result_depth = 4
+
+    def __init__(self, variable_names):
+        """
+        Args:
+        variable_names = names whose last assignment in each trace is recorded
+        """
+        self.variable_names = set(variable_names)
+        # top-level elements of the output, without their trace events
+        self.elements = []
+        # for every element, dictionary of result index to the last assigned value (CBMC json) of each variable
+        self.element_assignments = []
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.skeleton = []
+        self.event = None
+        self.assignments = {}
+        self.result_index = -1
+        self.failed = False
+
+    def emit(self, text):
+        if self.event is not None:
+            self.event.append(text)
+        elif len(self.stack) >= 2:
+            self.skeleton.append(text)
+
+    def open(self, c):
+        self.stack.append(c)
+        depth = len(self.stack)
+        if depth == 2:
+            self.skeleton = []
+            self.assignments = {}
+            self.result_index = -1
+        elif depth == CBMCTraceParser.result_depth and c == "{":
+            self.result_index += 1
+        elif depth == CBMCTraceParser.event_depth and c == "{" and self.stack[-2] == "[":
+            self.event = []
+        self.emit(c)
+
+    def close(self, c):
+        self.emit(c)
+        depth = len(self.stack)
+        if depth == CBMCTraceParser.event_depth and self.event is not None:
+            self.handle_event(json.loads("".join(self.event)))
+            self.event = None
+            self.skeleton.append("0")
+        elif depth == 2:
+            self.elements.append(json.loads("".join(self.skeleton)))
+            self.element_assignments.append(self.assignments)
+            self.skeleton = []
+        self.stack.pop()
+
+    def handle_event(self, event):
+        if event.get("assignmentType") == "variable" and event.get("lhs") in self.variable_names:
+            self.assignments.setdefault(self.result_index, {})[event["lhs"]] = event.get("value")
+
+    def feed(self, text):
+        """ Parses the next part of the output. Once the output turns out to be malformed, the rest is ignored. """
+        if self.failed:
+            return
+        try:
+            self.scan(text)
+        except (ValueError, IndexError) as e:
+            print(f"Malformed CBMC output: {e}")
+            self.failed = True
+
+    def scan(self, text):
+        i = 0
+        n = len(text)
+        while i < n:
+            if self.escape:
+                # the previous part ended with a backslash inside a string
+                self.emit(text[i])
+                self.escape = False
+                i += 1
+            elif self.in_string:
+                m = CBMCTraceParser.string_token_pattern.search(text, i)
+                if m is None:
+                    self.emit(text[i:])
+                    return
+                j = m.start()
+                if text[j] == "\\":
+                    self.emit(text[i:j+2])
+                    self.escape = j + 1 >= n
+                    i = j + 2
+                else:
+                    self.emit(text[i:j+1])
+                    self.in_string = False
+                    i = j + 1
+            else:
+                m = CBMCTraceParser.token_pattern.search(text, i)
+                if m is None:
+                    self.emit(text[i:])
+                    return
+                j = m.start()
+                self.emit(text[i:j])
+                c = text[j]
+                if c == '"':
+                    self.emit(c)
+                    self.in_string = True
+                elif c in "{[":
+                    self.open(c)
+                else:
+                    self.close(c)
+                i = j + 1
+
+    def parse_stream(self, stream, chunk_size=1 << 16):
+        """ Feeds everything from a text stream, e.g. CBMC's stdout pipe. """
+        while True:
+            text = stream.read(chunk_size)
+            if not text:
+                break
+            self.feed(text)
+        return self
+
+    def complete(self):
+        """ True if the output was a well-formed top-level array. """
+        return not self.failed and len(self.stack) == 0 and len(self.elements) > 0
+
+    def verified(self):
+        """ True if CBMC proved all properties. """
+        return self.complete() and self.elements[-1].get("cProverStatus") == "success"
+
+    def results(self):
+        """
+        Property results of the last element with results, as a list of (result, values) where values are the
+        last assigned values of the variables in the result's trace, or None if the result has no trace.
+        """
+        for element, assignments in zip(reversed(self.elements), reversed(self.element_assignments)):
+            if "result" in element:
+                return [(result, assignments.get(i, {}) if isinstance(result, dict) and "trace" in result else None) for i, result in enumerate(element["result"])]
+        return []
+
+    def trace_values(self):
+        """
+        Last assigned values of the variables in the trace of the first result of the last element with results,
+        the trace a counterexample is taken from. None if there is no such trace.
+        """
+        results = self.results()
+        if len(results) == 0:
+            return None
+        return results[0][1]
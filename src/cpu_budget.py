@@ -0,0 +1,83 @@
+# This component is a CPU budget shared by all processes of a run.
+# L2_runner runs several instructions at once, each with its own worker pools, gcc and CBMC processes.
+# Instead of splitting the cores between instructions up front, the runner creates one token per core and every
+# CPU-bound task (a mutant build and run, a CBMC job, ...) holds a token while it runs, so an instruction
+# can use the cores the others leave idle.
+# Tokens are lock files held with flock, which the kernel releases when a holder dies, e.g. when an
+# instruction's process group is killed on timeout. Without a configured budget, tasks never wait.
+import fcntl
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from os.path import join
+
+
+class CPUBudget(object):
+
+    # shared by all processes forked after configure
+    token_dir = None
+    num_tokens = 0
+    poll_interval = 0.05
+
+    @staticmethod
+    def configure(num_tokens, token_dir=None):
+        """
+        Creates the tokens. Processes forked afterwards share them.
+        Args:
+        token_dir = directory for the lock files, a new temporary directory if None
+        """
+        CPUBudget.token_dir = token_dir if token_dir is not None else tempfile.mkdtemp(prefix="cpu-budget-")
+        os.makedirs(CPUBudget.token_dir, exist_ok=True)
+        CPUBudget.num_tokens = max(1, num_tokens)
+        for i in range(CPUBudget.num_tokens):
+            open(join(CPUBudget.token_dir, f"token{i}"), "a").close()
+
+    @staticmethod
+    def close():
+        """ Removes the tokens once no process uses them anymore. """
+        if CPUBudget.token_dir is not None:
+            shutil.rmtree(CPUBudget.token_dir, ignore_errors=True)
+        CPUBudget.token_dir = None
+
+    @staticmethod
+    def acquire(block=True):
+        """
+        Takes a token, waiting for one if block is set.
+        Returns the token to release, None if block is not set and no token was free.
+        Without a configured budget, returns a token that releases nothing.
+        """
+        if CPUBudget.token_dir is None:
+            return -1
+        while True:
+            # start at a different token in every process, so they do not all contend for the first one
+            first = os.getpid() % CPUBudget.num_tokens
+            for i in range(CPUBudget.num_tokens):
+                fd = os.open(join(CPUBudget.token_dir, f"token{(first + i) % CPUBudget.num_tokens}"), os.O_RDWR | os.O_CLOEXEC)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    continue
+                return fd
+            if not block:
+                return None
+            time.sleep(CPUBudget.poll_interval)
+
+    @staticmethod
+    def release(token):
+        if token is None or token < 0:
+            return
+        fcntl.flock(token, fcntl.LOCK_UN)
+        os.close(token)
+
+    @staticmethod
+    @contextmanager
+    def token():
+        """ Holds a token for the duration of a with block. Tasks holding one must not wait for other tasks that need one. """
+        token = CPUBudget.acquire()
+        try:
+            yield
+        finally:
+            CPUBudget.release(token)
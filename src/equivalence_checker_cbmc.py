@@ -8,6 +8,12 @@ import os
 import subprocess
 from os.path import isfile, join
 from program_manipulation import ProgramManipulator 
+from cbmc_cache import CBMCResultCache
+from mutant_diff import MutantSet
+from cbmc_scheduler import CBMCJob, CBMCScheduler
+from cbmc_trace_parser import CBMCTraceParser
+from smt_backend import IncrementalSMTEngine
+from multiprocessing.pool import ThreadPool
 import json
 import time
 import math
@@ -18,12 +24,23 @@ import sys
 
 class EquivalenceChecker(object):
 
-    def __init__(self, oracle_program, function_name, survived_mutations, input_file, new_input_filename="new_inputs.txt", backend="", path_to_fakeheaders="pycparser/utils/fake_libc_include", analysis=True, survived_mutation_outputs=None, create_new_suite=False, working_directory = "working_directory"):
+    def __init__(self, oracle_program, function_name, survived_mutations, input_file, new_input_filename="new_inputs.txt", backend="", path_to_fakeheaders="pycparser/utils/fake_libc_include", analysis=True, survived_mutation_outputs=None, create_new_suite=False, working_directory = "working_directory", cache_dir=None, analysis_dir="analysis", num_processes=None, cbmc_timeout=None, cbmc_max_rss=None, batch_size=1, engine="cbmc", counterexamples_per_mutant=1, diversity_budget=60):
         """
         Args:
         oracle_program is a path to the program.
-        survived_mutations is a path to the directory of survived mutated programs.
+        survived_mutations is a path to the directory of survived mutated programs, or a list of paths to them.
         checker is type of equivalence checker.
+        cache_dir is an optional directory for the persistent CBMC result cache. No caching if None.
+        analysis_dir is the directory the html analysis is written to. It is recreated on every run.
+        num_processes is the number of CBMC jobs run at once. Defaults to all cores.
+        cbmc_timeout is the number of seconds one CBMC attempt may take before it is killed and retried with another backend.
+        cbmc_max_rss is the number of bytes of memory one CBMC job may use before it is killed.
+        batch_size is the number of mutations checked together in one CBMC run, with one assertion each.
+        engine is "cbmc" for a CBMC run per mutation, or "smt" to check mutations against one SMT encoding of the oracle
+        on long-lived solver processes. Mutations the smt engine has no verdict for are checked with CBMC.
+        counterexamples_per_mutant is the number of distinct counterexamples looked for per mutation. After the first,
+        inputs in other classify_float classes are looked for first, then any other inputs.
+        diversity_budget is the number of seconds of solver time spent per mutation on counterexamples after the first.
         We currently support the following equivalence checkers:
         CBMC = "Equivalence Check via --trace flag in CBMC
         """
@@ -34,6 +51,8 @@ class EquivalenceChecker(object):
         # dynamic values
         self.oracle_manipulator = ProgramManipulator(oracle_program, path_to_fakeheaders, other_headers=[f"-I{working_directory}"])
         self.oracle_function = self.oracle_manipulator.get_function(function_name)
+        # mutated programs are kept as diffs against the oracle, so only mutated functions are re-parsed
+        self.mutant_set = MutantSet(oracle_program, function_name, path_to_fakeheaders, other_headers=[f"-I{working_directory}"])
         self.inputs = EquivalenceChecker.process_inputs(input_file) if input_file is not None else []
         self.function_inputs = self.oracle_manipulator.get_function_inputs(function_name)
         self.function_return_type = self.oracle_manipulator.get_function_return_type(function_name)
@@ -42,6 +61,23 @@ class EquivalenceChecker(object):
         self.do_analysis = analysis
         self.survived_mutation_outputs = survived_mutation_outputs
         self.working_dir = working_directory
+        self.cache = CBMCResultCache(cache_dir) if cache_dir is not None else None
+        self.cache_stats = None
+        self.num_mutations_checked = 0
+        self.analysis_dir = analysis_dir
+        self.num_processes = num_processes if num_processes is not None else mp.cpu_count()
+        self.cbmc_timeout = cbmc_timeout
+        self.cbmc_max_rss = cbmc_max_rss
+        self.batch_size = max(1, batch_size)
+        self.batch_stats = None
+        if engine not in ["cbmc", "smt"]:
+            raise Exception(f"Unknown equivalence checking engine {engine}")
+        self.engine = engine
+        self.smt_stats = None
+        self.counterexamples_per_mutant = max(1, counterexamples_per_mutant)
+        self.diversity_budget = diversity_budget
+        self.diversity_stats = None
+        self.scheduler_stats = None
 
     # stolen from smt2utils
     @staticmethod
@@ -73,8 +109,9 @@ class EquivalenceChecker(object):
         return int(b, 2)
 
     @staticmethod
-    def classify_float(x):
-        fp = numpy.single(x) # equivalent to c float.
+    def classify_float(x, np_type=numpy.single):
+        """ Class of x as a value of np_type, numpy.single (C float) or numpy.double (C double). """
+        fp = np_type(x)
         # classifications are inf, nan, normal, subnormal, zero, unknown
         if fp == 0.0:
             return "zero"
@@ -83,7 +120,7 @@ class EquivalenceChecker(object):
         if numpy.isnan(fp):
             return "NaN"
         else:
-            fmin_normalized = numpy.finfo(type(fp)).tiny # smallest normal representation
+            fmin_normalized = numpy.finfo(np_type).tiny # smallest normal representation
             fp_is_subnormal = numpy.isfinite(fp) and fp != 0 and abs(fp) < fmin_normalized
             if fp_is_subnormal:
                 return "subnormal"
@@ -92,7 +129,7 @@ class EquivalenceChecker(object):
         return "unknown"
     
     @staticmethod
-    def create_html_file(mutated_function, oracle_function, input_values, input_classifications, mut_name):
+    def create_html_file(mutated_function, oracle_function, input_values, input_classifications, mut_name, analysis_dir="analysis"):
         html_head = f"""<head> 
                <meta charset=\"UTF-8\">
         <title>Analysis for {mut_name}</title>
@@ -132,27 +169,27 @@ class EquivalenceChecker(object):
         #     html_body += f"<p>{mut_out_string}</p>"
 
         html = html = f"""<html lang="en"> {html_head} {html_body} </html>"""
-        f = open(os.path.join("./analysis",f"{mut_name}.html"), "w+")
+        f = open(os.path.join(analysis_dir, f"{mut_name}.html"), "w+")
         f.write(html)
         f.close()
 
     def create_analysis(self, new_inputs):
         # create analysis directory
         print("Analyzing")
-        if not os.path.isdir("./analysis"):
-	        os.mkdir("./analysis")
+        if not os.path.isdir(self.analysis_dir):
+	        os.mkdir(self.analysis_dir)
         else:
-	        os.system("rm -rf analysis")
-	        os.mkdir("./analysis")
+	        os.system(f"rm -rf {self.analysis_dir}")
+	        os.mkdir(self.analysis_dir)
         print(new_inputs)
         for i in new_inputs:
             if i is not None:
                 input_values = i[0]
                 mutation = i[1]
-                if input_values is not None and mutation is not None:
+                # the analysis shows the first counterexample of every mutation
+                if input_values is not None and mutation is not None and i[2] != "extra":
                     # extract mutated function as a string
-                    mutation_manipulator = ProgramManipulator(mutation, self.path_to_fakeheaders, other_headers=[f"-I{self.working_dir}"])
-                    mutated_func = mutation_manipulator.get_function(self.function_name)
+                    mutated_func = self.get_mutated_function(mutation)
                             
                     # classify inputs
                     # TODO: only float, what about int?
@@ -160,7 +197,7 @@ class EquivalenceChecker(object):
                     for i_float in input_values:
                         classifications.append(EquivalenceChecker.classify_float(float.fromhex(i_float)))
                     # create html file 
-                    html_file = EquivalenceChecker.create_html_file(mutated_func, self.oracle_function, input_values, classifications, ProgramManipulator.extract_last_file_from_prog_path(mutation))
+                    html_file = EquivalenceChecker.create_html_file(mutated_func, self.oracle_function, input_values, classifications, ProgramManipulator.extract_last_file_from_prog_path(mutation), self.analysis_dir)
     
     @staticmethod
     def process_inputs(input_file):
@@ -178,18 +215,9 @@ class EquivalenceChecker(object):
         return inputs
     
     @staticmethod
-    def get_first_value_from_trace(trace, variable_name, trace_reversed=False):
-        value = None
+    def convert_trace_value(value, variable_name):
+        """ Converts a value of CBMC's json trace from its bit pattern, so floats keep every bit. """
         try:
-            if trace_reversed:
-                for event in reversed(trace):
-                    if event.get("assignmentType") == "variable" and event.get("lhs") == variable_name:
-                        value = event["value"]
-                        break
-            else:
-                for event in trace:
-                    if event.get("assignmentType") == "variable" and event.get("lhs") == variable_name:
-                        value = event["value"]
             if value is not None:
                 if value["name"] == "integer":
                     return EquivalenceChecker.bin_to_int(value["binary"])
@@ -198,46 +226,65 @@ class EquivalenceChecker(object):
         except Exception as e:
             print(e)
             print(f"Could not find {variable_name} in trace")
-            pass
 
-    def create_instrumented_program(self, mutated_program):
-        # create .c file
-        filename = f"equivalence_check_{ProgramManipulator.extract_last_file_from_prog_path(mutated_program)}.c"
-        f = open(os.path.join(self.working_dir, filename), "w+")
-        # add includes        
-        includes = ProgramManipulator.get_all_includes(mutated_program)
+    def get_trace_variable_names(self):
+        """ Variables of the instrumented program a counterexample is read from. """
+        return [f"variable_{i}" for i in range(len(self.function_inputs))] + ["result", "mutated_result"]
 
+    def get_mutated_function(self, mutated_program):
         # extract mutated function from mutated program
-        # Create manipulator for mutated program
-        mutated_pm = ProgramManipulator(mutated_program, self.path_to_fakeheaders, other_headers=[f"-I{self.working_dir}"])
-        mutated_function = mutated_pm.get_function(self.function_name)
-        mutated_function_name = "mutated_function"
-        mutated_function = ProgramManipulator.rename_function(mutated_function, self.function_name, mutated_function_name)
-        # add them both to .c file
-        # add main method to nondeterministically equal both functions
-        main_method = ["int main(){"]
-        # for each input 
+        return self.mutant_set.get_function(mutated_program)
 
+    def get_harness_inputs(self):
+        """ Returns (declarations of the nondeterministic inputs, the inputs as arguments, whether all inputs are floats). """
+        declarations = []
         counter = 0
         param_string = ""
         all_float = True # TODO: also applies to double
         for i in self.function_inputs:
             all_float = all_float and i[1] == 'float'
-            main_method.append(f"{i[1]} variable_{counter};")
+            declarations.append(f"{i[1]} variable_{counter};")
             param_string += f"variable_{counter},"
             counter+=1
         
         # remove trailing comma
         param_string = param_string[:-1]
+        return declarations, param_string, all_float
+
+    @staticmethod
+    def equal_outputs_condition(oracle_output, mutated_output, all_float):
+        if all_float:
+            return f"({oracle_output} == {mutated_output}) || (isnan({oracle_output}) && isnan({mutated_output}))"
+        return f"{oracle_output} == {mutated_output}"
+
+    def create_instrumented_program(self, mutated_program, mutated_function=None, assumptions=[], filename=None):
+        """
+        assumptions = C conditions the inputs are restricted to, e.g. to exclude counterexamples found before
+        """
+        # create .c file
+        if filename is None:
+            filename = f"equivalence_check_{ProgramManipulator.extract_last_file_from_prog_path(mutated_program)}.c"
+        f = open(os.path.join(self.working_dir, filename), "w+")
+        # add includes        
+        includes = ProgramManipulator.get_all_includes(mutated_program)
+
+        if mutated_function is None:
+            mutated_function = self.get_mutated_function(mutated_program)
+        mutated_function_name = "mutated_function"
+        mutated_function = ProgramManipulator.rename_function(mutated_function, self.function_name, mutated_function_name)
+        # add them both to .c file
+        # add main method to nondeterministically equal both functions
+        main_method = ["int main(){"]
+        # for each input 
+        declarations, param_string, all_float = self.get_harness_inputs()
+        main_method += declarations
+        main_method += [f"__CPROVER_assume({a});" for a in assumptions]
 
         # create main method
         main_method.append(f"{self.function_return_type} result = {self.function_name}({param_string});")
         main_method.append(f"{self.function_return_type}  mutated_result = {mutated_function_name}({param_string});")
         # set them equal so that --trace flag gives counterexample where they are not equal.
-        if all_float:
-            main_method.append("assert((result == mutated_result) || (isnan(result) && isnan(mutated_result)));")
-        else:
-            main_method.append("assert(result == mutated_result);")
+        main_method.append(f"assert({EquivalenceChecker.equal_outputs_condition('result', 'mutated_result', all_float)});")
         main_method.append("return 0;")
         main_method.append("}")
 
@@ -254,36 +301,78 @@ class EquivalenceChecker(object):
 
 
 
+    @staticmethod
+    def batch_property_description(index):
+        return f"mutant:{index}"
+
+    def create_batched_instrumented_program(self, mutated_programs, mutated_functions, batch_index):
+        """
+        Writes one program with the oracle and all mutated functions of a batch, each renamed to mutated_function_<i>,
+        and one assertion per mutation described as mutant:<i>. CBMC checks all of them in one run.
+        Returns (program file name, list of variable names a counterexample is read from).
+        """
+        filename = f"equivalence_check_batch_{batch_index}.c"
+        includes = []
+        for mutated_program in mutated_programs:
+            includes += ProgramManipulator.get_all_includes(mutated_program)
+        main_method = ["int main(){"]
+        declarations, param_string, all_float = self.get_harness_inputs()
+        main_method += declarations
+        main_method.append(f"{self.function_return_type} result = {self.function_name}({param_string});")
+        program = "".join(dict.fromkeys(includes))
+        program += self.oracle_function + "\n"
+        variable_names = [f"variable_{i}" for i in range(len(self.function_inputs))] + ["result"]
+        for i, mutated_function in enumerate(mutated_functions):
+            program += ProgramManipulator.rename_function(mutated_function, self.function_name, f"mutated_function_{i}")
+            main_method.append(f"{self.function_return_type} mutated_result_{i} = mutated_function_{i}({param_string});")
+            main_method.append(f'__CPROVER_assert({EquivalenceChecker.equal_outputs_condition("result", f"mutated_result_{i}", all_float)}, "{EquivalenceChecker.batch_property_description(i)}");')
+            variable_names.append(f"mutated_result_{i}")
+        main_method.append("return 0;")
+        main_method.append("}")
+        program += "\n".join(main_method)
+        f = open(os.path.join(self.working_dir, filename), "w+")
+        f.write(program)
+        f.close()
+        return filename, variable_names
+
+    def run_CBMC(self, instrumented_program, mutation_name):
+        """ Runs CBMC and parses its output from the pipe as it is printed. Returns the CBMCTraceParser. """
+        parser = CBMCTraceParser(self.get_trace_variable_names())
+        process = subprocess.Popen(["cbmc", "--trace", instrumented_program] + self.backend.split() + ["--json-ui"], cwd=self.working_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        parser.parse_stream(process.stdout)
+        process.wait()
+        return parser
+
     def get_counterexample_from_CBMC(self, instrumented_program, mutation_name):
-        cbmc_json_filename = f"cbmc_output_{ProgramManipulator.extract_last_file_from_prog_path(mutation_name)}.json"
-        subprocess.call(f"cbmc --trace {instrumented_program} {self.backend} --json-ui > {cbmc_json_filename}", shell=True, cwd=self.working_dir)
-        cbmc_results = open(os.path.join(self.working_dir, cbmc_json_filename), "r").read()
-        cbmc_json = json.loads(cbmc_results)
-        trace = None
-        print(cbmc_json_filename)
-        if cbmc_json is not None:
-            if "cProverStatus" in cbmc_json[-1] and cbmc_json[-1]["cProverStatus"] == "success":
-                print(f"{mutation_name} is semantically identical to source!")
-
-        for value in cbmc_json:
-            if "result" in value:
-                try:
-                    trace = value["result"][0]["trace"]
-                except Exception as e:
-                    print(type(e), str(e))
-                    print(f"Trace not found for {mutation_name}")
-                    return None
-        if trace == None:
+        cbmc_output = self.run_CBMC(instrumented_program, mutation_name)
+        return self.get_counterexample_from_cbmc_output(cbmc_output, mutation_name)
+
+    def get_counterexample_from_cbmc_output(self, cbmc_output, mutation_name):
+        """
+        Args:
+        cbmc_output = CBMCTraceParser that has parsed all of CBMC's output
+        """
+        if cbmc_output.verified():
+            print(f"{mutation_name} is semantically identical to source!")
+
+        values = cbmc_output.trace_values()
+        if values is None:
             print((f"CBMC Result not found for {mutation_name}"))
             return None
+        return self.get_counterexample_from_trace_values(values, mutation_name)
 
-        # get number of inputs from ProgramManipulator, loop over and interprolate the number into variable_
+    def get_counterexample_from_trace_values(self, values, mutation_name, mutated_result_name="mutated_result"):
+        """
+        Args:
+        values = dictionary of variable name to its last assigned value in the trace
+        mutated_result_name = variable holding the mutated function's output
+        """
+        # all variables were extracted in the single pass over the trace, the last assignment of each is its value
         counter_example = []
         for i in range(len(self.function_inputs)):
-            value = EquivalenceChecker.get_first_value_from_trace(trace,f"variable_{i}")
-            counter_example.append(value)
-        mutated_output = EquivalenceChecker.get_first_value_from_trace(trace, 'mutated_result', trace_reversed=True) 
-        oracle_output =  EquivalenceChecker.get_first_value_from_trace(trace, 'result', trace_reversed=True)
+            counter_example.append(EquivalenceChecker.convert_trace_value(values.get(f"variable_{i}"), f"variable_{i}"))
+        mutated_output = EquivalenceChecker.convert_trace_value(values.get(mutated_result_name), mutated_result_name)
+        oracle_output = EquivalenceChecker.convert_trace_value(values.get("result"), "result")
 
         # TODO: if mutated_output == oracle_output, equivalence check failed, raise exception
         if mutated_output == oracle_output:
@@ -291,16 +380,389 @@ class EquivalenceChecker(object):
         return counter_example
 
 
-    def equivalence_check_CBMC(self, mutated_program):
+    def prepare_CBMC(self, mutated_program):
+        """
+        Everything before running CBMC: extracts the mutated function, looks it up in the cache and
+        writes the instrumented program.
+        Returns [mutated_program, cache_key, cached entry or None, instrumented program or None].
+        """
         try:
-            instrumented_program = self.create_instrumented_program(mutated_program)
-            inputs = self.get_counterexample_from_CBMC(instrumented_program, mutated_program)
+            mutated_function = self.get_mutated_function(mutated_program)
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self.cache.make_key(self.oracle_function, mutated_function, self.backend, ProgramManipulator.get_all_includes(mutated_program))
+                entry = self.cache.lookup(cache_key)
+                if entry is not None:
+                    print(f"CBMC cache hit for {mutated_program} ({entry['verdict']})")
+                    return [mutated_program, cache_key, entry, None]
+            instrumented_program = self.create_instrumented_program(mutated_program, mutated_function)
             sys.stdout.flush()
-            return [inputs, mutated_program]
+            return [mutated_program, cache_key, None, instrumented_program]
+        except Exception as e:
+            print("Caught Exception in prepare_CBMC")
+            print(e)
+            return [mutated_program, None, None, None]
+
+    def collect_CBMC(self, mutated_program, cache_key, cbmc_output):
+        """
+        Extracts the counterexample from CBMC's parsed output and caches definite verdicts.
+        Returns [counterexample, mutated_program, cache_status].
+        """
+        try:
+            inputs = self.get_counterexample_from_cbmc_output(cbmc_output, mutated_program)
+            return self.record_verdict(mutated_program, cache_key, cbmc_output.verified(), inputs)
+        except Exception as e:
+            print("Caught Exception in collect_CBMC")
+            print(e)
+            return None
+
+    def record_verdict(self, mutated_program, cache_key, verified, inputs, counterexamples=None, diversity_searched=0):
+        """
+        Caches definite verdicts. Returns [counterexample, mutated_program, cache_status].
+        Args:
+        counterexamples = all counterexamples found for the mutation, inputs first, if more than one was looked for
+        diversity_searched = number of counterexamples that were looked for
+        """
+        if cache_key is not None:
+            # only definite verdicts are cached, failed runs are retried next time
+            if verified:
+                self.cache.store(cache_key, "equivalent", None)
+            elif inputs is not None:
+                self.cache.store(cache_key, "counterexample", inputs, counterexamples=counterexamples, diversity_searched=diversity_searched)
+        return [inputs, mutated_program, "miss" if cache_key is not None else None]
+
+    def equivalence_check_CBMC(self, mutated_program):
+        """
+        Returns [counterexample, mutated_program, cache_status].
+        cache_status is "hit" or "miss", or None when caching is disabled.
+        """
+        mutated_program, cache_key, entry, instrumented_program = self.prepare_CBMC(mutated_program)
+        if entry is not None:
+            return [entry["counterexample"], mutated_program, "hit"]
+        if instrumented_program is None:
+            return None
+        try:
+            cbmc_output = self.run_CBMC(instrumented_program, mutated_program)
         except Exception as e:
             print("Caught Exception in equivalence_check_CBMC")
             print(e)
-            pass
+            return None
+        return self.collect_CBMC(mutated_program, cache_key, cbmc_output)
+
+    def check_all_CBMC(self, mutated_programs):
+        """
+        Checks all mutated programs: prepares them in a pool, runs CBMC through the scheduler
+        and collects the counterexamples. With a batch size above 1, mutations are first checked in batches
+        and only those without a verdict from their batch get a CBMC run of their own.
+        Returns list of [counterexample, mutated_program, cache_status], None for failed checks.
+        """
+        with mp.Pool(self.num_processes) as pool:
+            prepared = []
+            for result, parse_counts in pool.starmap(ProgramManipulator.call_counting_parses, [(self.prepare_CBMC, m) for m in mutated_programs]):
+                prepared.append(result)
+                ProgramManipulator.parse_cache.merge(parse_counts)
+        results = []
+        to_check = []
+        cached = {}
+        for mutated_program, cache_key, entry, instrumented_program in prepared:
+            if entry is not None:
+                results.append([entry["counterexample"], mutated_program, "hit"])
+                cached[mutated_program] = entry
+            elif instrumented_program is not None:
+                to_check.append((mutated_program, instrumented_program))
+            else:
+                results.append(None)
+        scheduler = CBMCScheduler(self.num_processes, timeout=self.cbmc_timeout, max_rss=self.cbmc_max_rss)
+        cache_keys = {p[0] : p[1] for p in prepared}
+        smt_decided = set()
+        if self.engine == "smt" and len(to_check) > 0:
+            smt_results, to_check = self.check_all_SMT(to_check, cache_keys)
+            smt_decided = set([r[1] for r in smt_results])
+            results += smt_results
+        if self.batch_size > 1 and len(to_check) > 1:
+            batch_results, to_check = self.check_batches_CBMC(to_check, cache_keys, scheduler)
+            results += batch_results
+        jobs = []
+        for mutated_program, instrumented_program in to_check:
+            size = os.path.getsize(os.path.join(self.working_dir, instrumented_program))
+            jobs.append(CBMCJob(mutated_program, instrumented_program, self.get_trace_variable_names(), self.working_dir, backend=self.backend, size=size))
+        job_results = scheduler.run(jobs)
+        self.scheduler_stats = scheduler.stats
+        for job in jobs:
+            job_result = job_results[job.name]
+            if job_result["status"] != "done":
+                results.append(None)
+                continue
+            results.append(self.collect_CBMC(job.name, cache_keys[job.name], job_result["output"]))
+        if self.counterexamples_per_mutant > 1:
+            # the smt engine already looked for more counterexamples of the mutations it decided
+            results += self.find_more_counterexamples_CBMC([r for r in results if r is not None and r[1] not in smt_decided], cache_keys, cached)
+        return results
+
+    def create_smt_engine(self):
+        _, _, all_float = self.get_harness_inputs()
+        return IncrementalSMTEngine(self.function_name, self.function_inputs, self.function_return_type, self.working_dir, timeout=self.cbmc_timeout, nan_equal=all_float)
+
+    def check_SMT_chunk(self, oracle_encoding, chunk):
+        """
+        Checks a list of (mutated_program, includes, mutated_function) on one solver.
+        Returns (list of (mutated_program, verdict, list of counterexamples as bits or None), solver calls spent on extra counterexamples).
+        """
+        engine = self.create_smt_engine()
+        if not engine.start(oracle_encoding):
+            return [(c[0], None, None) for c in chunk], 0
+        verdicts = []
+        try:
+            for mutated_program, includes, mutated_function in chunk:
+                name = ProgramManipulator.extract_last_file_from_prog_path(mutated_program)
+                encoding = engine.encode(includes, mutated_function, name)
+                if encoding is None:
+                    verdicts.append((mutated_program, None, None))
+                    continue
+                verdict, bits = engine.check(name, encoding, self.counterexamples_per_mutant, self.diversity_budget)
+                verdicts.append((mutated_program, verdict, bits))
+        finally:
+            engine.close()
+        return verdicts, engine.extra_checks
+
+    def check_all_SMT(self, to_check, cache_keys):
+        """
+        Checks mutations with the incremental SMT engine: the oracle is encoded once, and num_processes solvers
+        each check a share of the mutations against it.
+        Args:
+        to_check = list of (mutated_program, instrumented_program)
+        Returns:
+        (list of [counterexample, mutated_program, cache_status] of mutations with a verdict,
+         list of (mutated_program, instrumented_program) of mutations without one)
+        """
+        start = time.perf_counter()
+        engine = self.create_smt_engine()
+        oracle_encoding = engine.encode(ProgramManipulator.get_all_includes(self.oracle_program), self.oracle_function, "oracle")
+        if oracle_encoding is None or None in oracle_encoding["inputs"]:
+            print("Could not encode the oracle for the smt engine. Checking all mutations with CBMC.")
+            return [], to_check
+        instrumented_programs = dict(to_check)
+        mutations = []
+        remaining = []
+        for mutated_program, instrumented_program in to_check:
+            try:
+                mutations.append((mutated_program, ProgramManipulator.get_all_includes(mutated_program), self.get_mutated_function(mutated_program)))
+            except Exception as e:
+                print(f"Could not extract the mutated function of {mutated_program}: {e}")
+                remaining.append((mutated_program, instrumented_program))
+        num_solvers = max(1, min(self.num_processes, len(mutations)))
+        with ThreadPool(num_solvers) as pool:
+            chunks = pool.starmap(self.check_SMT_chunk, [(oracle_encoding, mutations[i::num_solvers]) for i in range(num_solvers)])
+        results = []
+        input_names = ["float" if i[1] in ["float", "double"] else "integer" for i in self.function_inputs]
+        for mutated_program, verdict, bits in [v for chunk in chunks for v in chunk[0]]:
+            if verdict == "equivalent":
+                print(f"{mutated_program} is semantically identical to source!")
+                results.append(self.record_verdict(mutated_program, cache_keys[mutated_program], True, None))
+            elif verdict == "counterexample":
+                counterexamples = [[EquivalenceChecker.convert_trace_value({"name" : n, "binary" : b}, f"variable_{i}") for i, (n, b) in enumerate(zip(input_names, c))] for c in bits]
+                results.append(self.record_verdict(mutated_program, cache_keys[mutated_program], False, counterexamples[0], counterexamples, self.counterexamples_per_mutant))
+                results += [[c, mutated_program, "extra"] for c in counterexamples[1:]]
+            else:
+                remaining.append((mutated_program, instrumented_programs[mutated_program]))
+        stop = time.perf_counter()
+        print(f"The smt engine decided {len(results)} of {len(to_check)} mutations")
+        self.smt_stats = {
+            "wall_time" : stop-start,
+            "solvers" : num_solvers,
+            "mutations" : len(to_check),
+            "equivalent" : len([r for r in results if r[0] is None]),
+            "counterexamples" : len([r for r in results if r[0] is not None and r[2] != "extra"]),
+            "extra_counterexamples" : len([r for r in results if r[2] == "extra"]),
+            "extra_solver_calls" : sum([chunk[1] for chunk in chunks]),
+            "undecided" : len(remaining)
+        }
+        return results, remaining
+
+    @staticmethod
+    def c_float_literal(value):
+        """ C expression of a float as formatted by float_hex2 and conform_c. """
+        if value.endswith("nan"):
+            return "NAN"
+        if value.endswith("inf"):
+            return "-INFINITY" if value.startswith("-") else "INFINITY"
+        return value
+
+    def diversity_assumption(self, counterexample, mode):
+        """
+        C condition excluding a counterexample: in "class" mode all inputs with the same classify_float classes,
+        in "value" mode just the counterexample. None in "class" mode if no input is a floating point value.
+        """
+        conditions = []
+        for i, (value, (_, c_type)) in enumerate(zip(counterexample, self.function_inputs)):
+            if c_type in ["float", "double"]:
+                if mode == "class":
+                    np_type = numpy.single if c_type == "float" else numpy.double
+                    fp_class = {"zero" : "FP_ZERO", "subnormal" : "FP_SUBNORMAL", "normal" : "FP_NORMAL", "Inf" : "FP_INFINITE", "NaN" : "FP_NAN"}[EquivalenceChecker.classify_float(float.fromhex(value), np_type)]
+                    conditions.append(f"fpclassify(variable_{i}) == {fp_class}")
+                elif value.endswith("nan"):
+                    conditions.append(f"isnan(variable_{i})")
+                else:
+                    conditions.append(f"variable_{i} == {EquivalenceChecker.c_float_literal(value)}")
+            elif mode == "value":
+                conditions.append(f"variable_{i} == ({c_type}){value}ULL")
+        if len(conditions) == 0:
+            return None
+        return "!(" + " && ".join(conditions) + ")"
+
+    def find_more_counterexamples_CBMC(self, results, cache_keys=None, cached=None):
+        """
+        Looks for up to counterexamples_per_mutant distinct counterexamples of every mutation in results that has one.
+        CBMC is rerun in rounds with the counterexamples found so far excluded, first by their classes, then by value,
+        until a mutation has enough, has no other counterexamples, or has spent its diversity_budget.
+        The counterexamples of finished searches are cached with the mutation's verdict.
+        Args:
+        cache_keys = dictionary of mutation to its cache key
+        cached = dictionary of mutation to its cache entry, for cache hits. Their cached counterexamples are used first,
+                 and mutations whose cached search looked for at least as many counterexamples are not searched again.
+        Returns list of [counterexample, mutated_program, "extra"] for the counterexamples found.
+        """
+        start = time.perf_counter()
+        found = {}
+        for r in results:
+            if r is not None and r[0] is not None:
+                found.setdefault(r[1], []).append(r[0])
+        extras = []
+        searched_before = set()
+        for mutated_program, entry in (cached if cached is not None else {}).items():
+            if mutated_program not in found:
+                continue
+            for c in entry["counterexamples"]:
+                if c not in found[mutated_program] and len(found[mutated_program]) < self.counterexamples_per_mutant:
+                    found[mutated_program].append(c)
+                    extras.append([c, mutated_program, "extra"])
+            if entry["diversity_searched"] >= self.counterexamples_per_mutant:
+                searched_before.add(mutated_program)
+        num_cached = len(extras)
+        pending = {m : {"mode" : "class", "spent" : 0.0} for m, c in found.items() if len(c) < self.counterexamples_per_mutant and m not in searched_before}
+        # mutations whose search ended with enough counterexamples, without more of them, or out of budget
+        finished = set()
+        cbmc_runs = 0
+        while len(pending) > 0:
+            jobs = []
+            for mutated_program, state in list(pending.items()):
+                assumptions = [self.diversity_assumption(c, state["mode"]) for c in found[mutated_program]]
+                if None in assumptions:
+                    state["mode"] = "value"
+                    assumptions = [self.diversity_assumption(c, state["mode"]) for c in found[mutated_program]]
+                filename = f"equivalence_check_{ProgramManipulator.extract_last_file_from_prog_path(mutated_program)}.diverse.c"
+                try:
+                    self.create_instrumented_program(mutated_program, assumptions=assumptions, filename=filename)
+                except Exception as e:
+                    print(f"Could not instrument {mutated_program} for more counterexamples: {e}")
+                    del pending[mutated_program]
+                    continue
+                # every run is limited by what is left of its own mutation's budget
+                timeout = self.diversity_budget - state["spent"] if self.diversity_budget is not None else None
+                jobs.append(CBMCJob(mutated_program, filename, self.get_trace_variable_names(), self.working_dir, backend=self.backend, timeout=timeout))
+            if len(jobs) == 0:
+                break
+            job_results = CBMCScheduler(self.num_processes, timeout=self.cbmc_timeout, max_rss=self.cbmc_max_rss, retry_backends=[]).run(jobs)
+            cbmc_runs += len(jobs)
+            for job in jobs:
+                state = pending[job.name]
+                job_result = job_results[job.name]
+                state["spent"] += job_result["wall_time"]
+                inputs = None
+                if job_result["status"] == "done" and job_result["output"].verified():
+                    # nothing left outside the excluded counterexamples
+                    if state["mode"] == "class":
+                        state["mode"] = "value"
+                        inputs = "retry"
+                elif job_result["status"] == "done":
+                    try:
+                        inputs = self.get_counterexample_from_cbmc_output(job_result["output"], job.name)
+                    except Exception as e:
+                        print(f"Could not get another counterexample for {job.name}: {e}")
+                    if inputs is not None and inputs not in found[job.name]:
+                        found[job.name].append(inputs)
+                        extras.append([inputs, job.name, "extra"])
+                    else:
+                        inputs = None
+                out_of_budget = self.diversity_budget is not None and state["spent"] >= self.diversity_budget
+                exhausted = job_result["status"] == "done" and job_result["output"].verified() and inputs is None
+                if out_of_budget or exhausted or len(found[job.name]) >= self.counterexamples_per_mutant:
+                    finished.add(job.name)
+                if inputs is None or out_of_budget or len(found[job.name]) >= self.counterexamples_per_mutant:
+                    del pending[job.name]
+        if self.cache is not None and cache_keys is not None:
+            for mutated_program in finished:
+                if cache_keys.get(mutated_program) is not None:
+                    self.cache.store(cache_keys[mutated_program], "counterexample", found[mutated_program][0], counterexamples=found[mutated_program], diversity_searched=self.counterexamples_per_mutant)
+        stop = time.perf_counter()
+        print(f"Found {len(extras) - num_cached} more counterexamples for {len(found)} mutations, {num_cached} more from the cache")
+        self.diversity_stats = {
+            "counterexamples_per_mutant" : self.counterexamples_per_mutant,
+            "diversity_budget" : self.diversity_budget,
+            "extra_counterexamples" : len(extras),
+            "cached_extra_counterexamples" : num_cached,
+            "extra_cbmc_runs" : cbmc_runs,
+            "wall_time" : stop-start
+        }
+        return extras
+
+    def check_batches_CBMC(self, to_check, cache_keys, scheduler):
+        """
+        Checks the mutations in batches of batch_size, one CBMC run per batch on all of the batch's properties.
+        Args:
+        to_check = list of (mutated_program, instrumented_program)
+        Returns:
+        (list of [counterexample, mutated_program, cache_status] of mutations with a verdict,
+         list of (mutated_program, instrumented_program) of mutations that still need their own run)
+        """
+        batches = [to_check[i:i+self.batch_size] for i in range(0, len(to_check), self.batch_size)]
+        jobs = []
+        batch_members = {}
+        remaining = []
+        for b, batch in enumerate(batches):
+            try:
+                mutated_functions = [self.get_mutated_function(p[0]) for p in batch]
+                instrumented_program, variable_names = self.create_batched_instrumented_program([p[0] for p in batch], mutated_functions, b)
+            except Exception as e:
+                print(f"Could not create batch {b}: {e}")
+                remaining += batch
+                continue
+            size = os.path.getsize(os.path.join(self.working_dir, instrumented_program))
+            name = f"batch_{b}"
+            jobs.append(CBMCJob(name, instrumented_program, variable_names, self.working_dir, backend=self.backend, size=size))
+            batch_members[name] = batch
+        job_results = scheduler.run(jobs)
+        results = []
+        for job in jobs:
+            batch = batch_members[job.name]
+            job_result = job_results[job.name]
+            if job_result["status"] != "done":
+                remaining += batch
+                continue
+            # map every property back to its mutation by the index in its description
+            properties = {}
+            for result, values in job_result["output"].results():
+                description = result.get("description", "")
+                if description.startswith("mutant:"):
+                    properties[int(description[len("mutant:"):])] = (result.get("status"), values)
+            for i, (mutated_program, instrumented_program) in enumerate(batch):
+                status, values = properties.get(i, (None, None))
+                try:
+                    if status == "SUCCESS":
+                        print(f"{mutated_program} is semantically identical to source!")
+                        results.append(self.record_verdict(mutated_program, cache_keys[mutated_program], True, None))
+                        continue
+                    if status == "FAILURE" and values is not None:
+                        inputs = self.get_counterexample_from_trace_values(values, mutated_program, mutated_result_name=f"mutated_result_{i}")
+                        results.append(self.record_verdict(mutated_program, cache_keys[mutated_program], False, inputs))
+                        continue
+                except Exception as e:
+                    print(f"Caught Exception collecting {mutated_program} from {job.name}")
+                    print(e)
+                remaining.append((mutated_program, instrumented_program))
+        print(f"Checked {len(to_check) - len(remaining)} of {len(to_check)} mutations in {len(batches)} batched CBMC runs")
+        self.batch_stats = {"batch_size" : self.batch_size, "batches" : len(batches), "mutations_batched" : len(to_check) - len(remaining), "mutations_unbatched" : len(remaining)}
+        return results, remaining
 
     def cleanup(self):
         for p in Path(self.working_dir).glob("equivalence_check*"):
@@ -322,22 +784,64 @@ class EquivalenceChecker(object):
         file.write(result)
         file.close()
 
-    def runner(self):
+    @staticmethod
+    def get_counterexample_rows_filename(new_input_filename):
+        return f"{new_input_filename}.rows.json"
+
+    def write_counterexample_rows(self, first_new_row, counterexample_rows):
+        """
+        Records where the generated inputs start in the new suite, after the original rows,
+        and the row of the first counterexample of every mutation.
+        """
+        f = open(EquivalenceChecker.get_counterexample_rows_filename(self.new_input_filename), "w+")
+        f.write(json.dumps({"first_new_row" : first_new_row, "counterexample_rows" : counterexample_rows}, indent=4))
+        f.close()
+
+    @staticmethod
+    def read_counterexample_rows(new_input_filename):
+        """ {"first_new_row" : row, "counterexample_rows" : {mutation : row}} of a generated suite, None if it was not recorded. """
+        filename = EquivalenceChecker.get_counterexample_rows_filename(new_input_filename)
+        if not isfile(filename):
+            return None
+        f = open(filename, "r")
+        rows = json.loads(f.read())
+        f.close()
+        return rows
+
+    def runner(self, extra_results=[]):
+        """
+        extra_results = counterexamples found without CBMC, as [counterexample, mutated_program, status].
+                        They are added to the new test suite together with the CBMC counterexamples.
+        """
         self.cleanup()
         print("Begin generating counterexamples.")
         # start timer
         start = time.perf_counter()
         original_inputs = len(self.inputs)
         # loop over every program in survived mutations
-        mutated_programs = [f for f in os.listdir(self.survived_mutations) if isfile(join(self.survived_mutations, f))]
-        # remove other files generated by the mutator
+        if isinstance(self.survived_mutations, list):
+            # paths of the survivors, e.g. from the mutator's kill manifest
+            mutated_programs = self.survived_mutations
+        else:
+            mutated_programs = [f for f in os.listdir(self.survived_mutations) if isfile(join(self.survived_mutations, f))]
+            # remove other files generated by the mutator
 
-        mutated_programs = [m for m in mutated_programs if m.endswith(".c")]
-        mutated_programs = [join(self.survived_mutations, m) for m in mutated_programs if m is not None]
+            mutated_programs = [m for m in mutated_programs if m.endswith(".c")]
+            mutated_programs = [join(self.survived_mutations, m) for m in mutated_programs if m is not None]
+        self.num_mutations_checked = len(mutated_programs)
         print(mutated_programs)
-        with mp.Pool(mp.cpu_count()) as pool:
-          results = pool.map_async(self.equivalence_check_CBMC, mutated_programs).get()
+        results = list(extra_results) + self.check_all_CBMC(mutated_programs)
         print(results)
+        if self.cache is not None:
+            hits = len([r for r in results if r is not None and r[2] == "hit"])
+            misses = len([r for r in results if r is not None and r[2] == "miss"])
+            self.cache_stats = {
+                "hits" : hits,
+                "misses" : misses,
+                "hit_ratio" : hits/(hits+misses) if hits+misses > 0 else 0.0,
+                "cache_dir" : self.cache.cache_dir
+            }
+            print(f"CBMC cache: {hits} hits, {misses} misses")
         if self.do_analysis:
             self.create_analysis(results)
 
@@ -347,15 +851,25 @@ class EquivalenceChecker(object):
 
         tmp = [i[0] for i in results if i is not None and i[0] is not None] # remove the associated mutation with the test case
         print(tmp)
-        results = set(tuple(i) for i in tmp)
+        # first counterexample found for every mutation, the one an incremental re-kill tries first
+        first_counterexamples = {}
+        for r in results:
+            if r is not None and r[0] is not None:
+                first_counterexamples.setdefault(ProgramManipulator.extract_last_file_from_prog_path(r[1]), tuple(r[0]))
+        # duplicates are removed in order, so the rows of the new suite do not depend on hashing
+        results = list(dict.fromkeys(tuple(i) for i in tmp))
         inputs_post_deduplication = len(results)
         print(f"After removing duplicates: {inputs_post_deduplication}")
+        # rows of the written suite: blank original rows are not counted
+        first_new_row = len([t for t in self.inputs if t is not None and len(t) > 0])
         for i in results:
             if i is not None:
                 self.add_to_inputs(i)
 
         print(f"Total inputs added...{len(self.inputs) - original_inputs}")
         self.write_inputs_file()
+        row_of = {c : first_new_row + i for i, c in enumerate(results)}
+        self.write_counterexample_rows(first_new_row, {m : row_of[c] for m, c in first_counterexamples.items()})
         # stop timer
         stop = time.perf_counter()
         #self.cleanup()
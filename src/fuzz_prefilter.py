@@ -0,0 +1,121 @@
+# This component is a cheap differential fuzzing stage run on surviving mutations before CBMC.
+# It generates floating point inputs that cover every combination of the value classes of
+# EquivalenceChecker.classify_float (zero, subnormal, normal, Inf, NaN) plus random bit patterns,
+# runs the survivors on them with the Mutator, and takes the first differing input of each killed
+# mutation as its counterexample. Only mutations that survive fuzzing need to go to CBMC.
+from equivalence_checker_cbmc import EquivalenceChecker
+from program_manipulation import ProgramManipulator
+import itertools
+import numpy
+import time
+
+
+class FuzzPrefilter(object):
+
+    float_types = {"float" : numpy.float32, "double" : numpy.float64}
+    # results of the Mutator's last kill pass, which the pass over the fuzz inputs must not replace
+    mutator_state = ["kill_rows", "num_test_rows", "kill_test_suite", "oracle_output_data", "build_cache_data"]
+
+    def __init__(self, mutator, num_random=2000, rows_per_class_combination=4, seed=0):
+        """
+        Args:
+        mutator = Mutator of the oracle program, used to run the survivors on the generated inputs
+        num_random = number of rows of random bit patterns and random small values
+        rows_per_class_combination = rows generated for every combination of value classes of the inputs
+        seed = seed of the random generator, so the generated inputs are reproducible
+        """
+        self.mutator = mutator
+        self.num_random = num_random
+        self.rows_per_class_combination = rows_per_class_combination
+        self.seed = seed
+        oracle_pm = ProgramManipulator(mutator.program_name, mutator.path_to_fakeheaders, other_headers=[f"-I{mutator.working_dir_name}"])
+        self.function_inputs = oracle_pm.get_function_inputs(mutator.function_name)
+
+    def supported(self):
+        return len(self.function_inputs) > 0 and all([i[1] in FuzzPrefilter.float_types for i in self.function_inputs])
+
+    @staticmethod
+    def boundary_values(np_type):
+        """ Values around the edges of every value class of np_type. """
+        info = numpy.finfo(np_type)
+        smallest_subnormal = numpy.nextafter(np_type(0), np_type(1))
+        values = [0.0, info.tiny - smallest_subnormal, smallest_subnormal, info.tiny / 2, info.tiny, info.tiny * 2,
+                  1.0, 1.0 + info.eps, 1.0 - info.eps / 2, 0.5, 1.5, 2.0, 3.0, 10.0, 0.1,
+                  2.0 ** (info.nmant + 1), 2.0 ** (info.nmant + 1) + 2.0, info.max, info.max / 2, numpy.inf, numpy.nan]
+        values = [np_type(v) for v in values]
+        return values + [-v for v in values]
+
+    @staticmethod
+    def format_value(value):
+        return EquivalenceChecker.conform_c(EquivalenceChecker.float_hex2(float(value)))
+
+    def generate_inputs(self):
+        """ Returns list of rows, each a list of input values as strings in the test suite format. """
+        rng = numpy.random.default_rng(self.seed)
+        # candidate values of every input, grouped by their classify_float class
+        classes = []
+        for i in self.function_inputs:
+            np_type = FuzzPrefilter.float_types[i[1]]
+            by_class = {}
+            for v in FuzzPrefilter.boundary_values(np_type):
+                by_class.setdefault(EquivalenceChecker.classify_float(v, np_type), []).append(v)
+            classes.append(by_class)
+
+        rows = []
+        for combination in itertools.product(*[sorted(c) for c in classes]):
+            for _ in range(self.rows_per_class_combination):
+                rows.append([c[k][rng.integers(len(c[k]))] for c, k in zip(classes, combination)])
+        for n in range(self.num_random):
+            row = []
+            for i in self.function_inputs:
+                np_type = FuzzPrefilter.float_types[i[1]]
+                if n % 2 == 0:
+                    # random bit patterns cover every exponent, including subnormals, Inf and NaN
+                    bits_type = numpy.dtype(f"u{numpy.dtype(np_type).itemsize}")
+                    row.append(rng.integers(0, numpy.iinfo(bits_type).max, size=1, dtype=bits_type, endpoint=True).view(np_type)[0])
+                else:
+                    row.append(np_type(rng.uniform(-10, 10)))
+            rows.append(row)
+        return [[FuzzPrefilter.format_value(v) for v in row] for row in rows]
+
+    def write_inputs(self, rows, filename):
+        f = open(filename, "w+")
+        f.write("".join([" ".join(row) + "\n" for row in rows]))
+        f.close()
+
+    def run(self, survived_mutations, suite_filename):
+        """
+        Runs the survivors on the generated inputs.
+        Args:
+        survived_mutations = list of paths of surviving mutations
+        suite_filename = file the generated inputs are written to
+        Returns:
+        (dictionary of mutation path to counterexample, dictionary of statistics for the run data)
+        Mutations that crash without a differing row are not included and still need CBMC.
+        """
+        start = time.perf_counter()
+        if not self.supported() or len(survived_mutations) == 0:
+            return {}, {"wall_time" : 0.0, "num_inputs" : 0, "mutations_fuzzed" : 0, "mutations_killed" : 0}
+        rows = self.generate_inputs()
+        self.write_inputs(rows, suite_filename)
+        paths = {ProgramManipulator.extract_last_file_from_prog_path(m) : m for m in survived_mutations}
+        saved_state = {a : getattr(self.mutator, a) for a in FuzzPrefilter.mutator_state}
+        try:
+            self.mutator.kill_mutations(suite_filename, mutations=list(paths))
+            fuzz_rows = self.mutator.kill_rows
+        finally:
+            for a in saved_state:
+                setattr(self.mutator, a, saved_state[a])
+        counterexamples = {}
+        for mutation, differing in fuzz_rows.items():
+            if differing is not None and len(differing) > 0 and differing[0] < len(rows):
+                counterexamples[paths[mutation]] = rows[int(differing[0])]
+        stop = time.perf_counter()
+        print(f"Fuzzing killed {len(counterexamples)} of {len(survived_mutations)} surviving mutations.")
+        return counterexamples, {
+            "wall_time" : stop-start,
+            "num_inputs" : len(rows),
+            "mutations_fuzzed" : len(survived_mutations),
+            "mutations_killed" : len(counterexamples),
+            "suite_filename" : suite_filename
+        }
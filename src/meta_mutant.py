@@ -0,0 +1,227 @@
+# This component builds a "meta-mutant": a single program containing the oracle function and every mutated function,
+# with a dispatcher in place of the oracle function that runs all of them on each call and records which mutations
+# produced a different result. One compile and one run of the test suite then decide the fate of every mutation.
+# The mutations of every row run in a forked child, so a mutation that crashes, exits or hangs only kills itself.
+from program_manipulation import ProgramManipulator
+import numpy
+import os
+import re
+
+
+class MetaMutantHarness(object):
+
+    report_filename = "meta_mutant_report.txt"
+
+    def __init__(self, program_name, function_name, path_to_fakeheaders, other_headers=[]):
+        """
+        Args:
+        program_name = path to the oracle program
+        function_name = name of the mutated function
+        """
+        self.program_name = program_name
+        self.function_name = function_name
+        oracle_pm = ProgramManipulator(program_name, path_to_fakeheaders, other_headers=other_headers)
+        self.function_inputs = oracle_pm.get_function_inputs(function_name)
+        self.return_type = oracle_pm.get_function_return_type(function_name)
+        self.program_lines = open(program_name, "r").readlines()
+        self.function_lines = ProgramManipulator.get_function_lines(program_name, function_name)
+        # line ranges (1-indexed, inclusive) of each mutated function in the last created program
+        self.mutation_line_ranges = {}
+
+    def supported(self):
+        """ The dispatcher can only be generated for functions that return their result by value. """
+        return len(self.function_inputs) > 0 and self.return_type is not None and self.return_type != "void"
+
+    @staticmethod
+    def rename(function, current_name, desired_name):
+        return re.sub(rf"\b{current_name}\b", desired_name, function)
+
+    @staticmethod
+    def extract_function_source(program_lines, function_lines):
+        return "".join(program_lines[function_lines[0]:function_lines[1]+1])
+
+    def mutated_function_name(self, index):
+        return f"{self.function_name}__mut{index}"
+
+    def create_dispatcher(self, num_mutations, signed_zeros=False, early_exit=False, row_timeout=5):
+        """
+        The dispatcher counts its calls as test rows, assuming the test program calls the function once per row.
+        Every (mutation, row) pair with a differing result is written to the report after the bitmap line.
+        With early_exit, a mutation is not called again once it has been killed.
+        The mutations of a row run in a forked child that writes their results to shared memory, each starting from the
+        floating point environment the oracle was called with, so they can not change the process state of the oracle,
+        of later rows or of the report. A mutation that ends the child (a signal, exit() or taking longer than row_timeout
+        seconds for the row) is killed at that row and not called again, and a new child continues with the next mutation.
+        """
+        params = ", ".join([f"{i[1]} variable_{n}" for n, i in enumerate(self.function_inputs)])
+        param_types = ", ".join([i[1] for i in self.function_inputs])
+        args = ", ".join([f"variable_{n}" for n in range(len(self.function_inputs))])
+        is_float = self.return_type in ["float", "double"]
+        skip = "meta_mutant_crashed[k] || meta_mutant_killed[k]" if early_exit else "meta_mutant_crashed[k]"
+        functions = ", ".join([self.mutated_function_name(k) for k in range(num_mutations)])
+        if is_float and signed_zeros:
+            differs = "!((result == mutated_result && signbit(result) == signbit(mutated_result)) || (isnan(result) && isnan(mutated_result)))"
+        elif is_float:
+            differs = "!((result == mutated_result) || (isnan(result) && isnan(mutated_result)))"
+        else:
+            differs = "result != mutated_result"
+        lines = [f"static unsigned char meta_mutant_killed[{num_mutations}];",
+                 f"static unsigned char meta_mutant_crashed[{num_mutations}];",
+                 "static unsigned long meta_mutant_row = 0;",
+                 "static unsigned long *meta_mutant_kills = NULL;",
+                 "static unsigned long meta_mutant_num_kills = 0, meta_mutant_kills_capacity = 0;",
+                 "static pid_t meta_mutant_pid = 0;",
+                 # results of the mutations of the current row, shared with the child running them
+                 "struct meta_mutant_shared {",
+                 "long current;",
+                 f"unsigned char done[{num_mutations}];",
+                 f"{self.return_type} results[{num_mutations}];",
+                 "};",
+                 "static struct meta_mutant_shared *meta_mutant_state = NULL;",
+                 "static int meta_mutant_isolated = 0;",
+                 f"static {self.return_type} (*const meta_mutant_functions[{num_mutations}])({param_types}) = {{{functions}}};",
+                 "static void meta_mutant_record(unsigned long k) {",
+                 "meta_mutant_killed[k] = 1;",
+                 "if (meta_mutant_num_kills == meta_mutant_kills_capacity) {",
+                 "unsigned long capacity = meta_mutant_kills_capacity ? 2 * meta_mutant_kills_capacity : 1024;",
+                 "unsigned long *kills = realloc(meta_mutant_kills, 2 * capacity * sizeof(unsigned long));",
+                 "if (kills == NULL) return;",
+                 "meta_mutant_kills = kills;",
+                 "meta_mutant_kills_capacity = capacity;",
+                 "}",
+                 "meta_mutant_kills[2 * meta_mutant_num_kills] = k;",
+                 "meta_mutant_kills[2 * meta_mutant_num_kills + 1] = meta_mutant_row;",
+                 "meta_mutant_num_kills++;",
+                 "}",
+                 "static void meta_mutant_report(void) {",
+                 # a mutation calling exit() in the child must not write the report
+                 "if (getpid() != meta_mutant_pid) return;",
+                 f"FILE *report = fopen(\"{MetaMutantHarness.report_filename}\", \"w\");",
+                 "if (report == NULL) return;",
+                 f"for (int i = 0; i < {num_mutations}; i++) fputc(meta_mutant_killed[i] ? '1' : '0', report);",
+                 "fputc('\\n', report);",
+                 "for (unsigned long i = 0; i < meta_mutant_num_kills; i++) fprintf(report, \"%lu %lu\\n\", meta_mutant_kills[2 * i], meta_mutant_kills[2 * i + 1]);",
+                 "fclose(report);",
+                 "}",
+                 f"static void meta_mutant_run(int k, const fenv_t *env, {params}) {{",
+                 f"for (; k < {num_mutations}; k++) {{",
+                 f"if ({skip}) continue;",
+                 "meta_mutant_state->current = k;",
+                 "fesetenv(env);",
+                 f"meta_mutant_state->results[k] = meta_mutant_functions[k]({args});",
+                 "meta_mutant_state->done[k] = 1;",
+                 "}",
+                 "meta_mutant_state->current = -1;",
+                 "}",
+                 f"{self.return_type} {self.function_name}({params}) {{",
+                 "if (meta_mutant_state == NULL) {",
+                 "meta_mutant_pid = getpid();",
+                 "atexit(meta_mutant_report);",
+                 "void *shared = mmap(NULL, sizeof(struct meta_mutant_shared), PROT_READ | PROT_WRITE, MAP_SHARED | MAP_ANONYMOUS, -1, 0);",
+                 "meta_mutant_isolated = shared != MAP_FAILED;",
+                 "meta_mutant_state = meta_mutant_isolated ? shared : calloc(1, sizeof(struct meta_mutant_shared));",
+                 "}",
+                 "fenv_t meta_mutant_entry_env, meta_mutant_oracle_env;",
+                 "fegetenv(&meta_mutant_entry_env);",
+                 f"{self.return_type} result = {self.function_name}__oracle({args});",
+                 "fegetenv(&meta_mutant_oracle_env);",
+                 "memset(meta_mutant_state->done, 0, sizeof(meta_mutant_state->done));",
+                 "int first = 0;",
+                 f"while (first < {num_mutations}) {{",
+                 "meta_mutant_state->current = -1;",
+                 "pid_t pid = meta_mutant_isolated ? (fflush(NULL), fork()) : -1;",
+                 "if (pid < 0) {",
+                 f"meta_mutant_run(first, &meta_mutant_entry_env, {args});",
+                 "break;",
+                 "}",
+                 "if (pid == 0) {",
+                 f"alarm({int(row_timeout)});",
+                 f"meta_mutant_run(first, &meta_mutant_entry_env, {args});",
+                 "_exit(0);",
+                 "}",
+                 "int status = 0;",
+                 "while (waitpid(pid, &status, 0) < 0 && errno == EINTR);",
+                 "long crashed = meta_mutant_state->current;",
+                 "if ((WIFEXITED(status) && WEXITSTATUS(status) == 0 && crashed < 0) || crashed < first) break;",
+                 "meta_mutant_crashed[crashed] = 1;",
+                 "meta_mutant_record(crashed);",
+                 "first = crashed + 1;",
+                 "}",
+                 f"{self.return_type} mutated_result;",
+                 f"for (int k = 0; k < {num_mutations}; k++) {{",
+                 "if (!meta_mutant_state->done[k]) continue;",
+                 "mutated_result = meta_mutant_state->results[k];",
+                 f"if ({differs}) meta_mutant_record(k);",
+                 "}",
+                 "fesetenv(&meta_mutant_oracle_env);",
+                 "meta_mutant_row++;",
+                 "return result;",
+                 "}"]
+        return "\n".join(lines) + "\n"
+
+    def create_program(self, mutations, signed_zeros=False, early_exit=False):
+        """
+        Creates the meta-mutant program text.
+        The oracle function is replaced in place, so everything else in the oracle program is kept as is.
+        Args:
+        mutations = list of paths to mutated programs. The k-th mutation becomes <function_name>__mut<k>.
+        signed_zeros = if True, results of +0 and -0 are different
+        early_exit = if True, stop calling a mutation after its first differing row
+        Returns:
+        (program, mutations included in the program)
+        """
+        oracle_function = MetaMutantHarness.extract_function_source(self.program_lines, self.function_lines)
+        prefix = ["#include <stdio.h>\n", "#include <stdlib.h>\n", "#include <math.h>\n", "#include <string.h>\n", "#include <errno.h>\n",
+                  "#include <fenv.h>\n", "#include <unistd.h>\n", "#include <sys/mman.h>\n", "#include <sys/wait.h>\n"]
+        prefix += self.program_lines[:self.function_lines[0]]
+        program = "".join(prefix)
+        program += MetaMutantHarness.rename(oracle_function, self.function_name, f"{self.function_name}__oracle")
+        current_line = program.count("\n")
+
+        included = []
+        self.mutation_line_ranges = {}
+        for mutation in mutations:
+            try:
+                mutation_lines = open(mutation, "r").readlines()
+                mutated_function = MetaMutantHarness.extract_function_source(mutation_lines, ProgramManipulator.get_function_lines(mutation, self.function_name))
+            except Exception as e:
+                print(f"Could not extract {self.function_name} from {mutation}: {e}")
+                continue
+            mutated_function = MetaMutantHarness.rename(mutated_function, self.function_name, self.mutated_function_name(len(included)))
+            if not mutated_function.endswith("\n"):
+                mutated_function += "\n"
+            program += mutated_function
+            self.mutation_line_ranges[mutation] = (current_line + 1, current_line + mutated_function.count("\n"))
+            current_line += mutated_function.count("\n")
+            included.append(mutation)
+
+        program += self.create_dispatcher(len(included), signed_zeros, early_exit)
+        program += "".join(self.program_lines[self.function_lines[1]+1:])
+        return program, included
+
+    def mutations_at_lines(self, lines):
+        """ Mutations whose function contains any of the given lines of the last created program. """
+        at_lines = []
+        for mutation in self.mutation_line_ranges:
+            start, end = self.mutation_line_ranges[mutation]
+            if any([start <= l <= end for l in lines]):
+                at_lines.append(mutation)
+        return at_lines
+
+    @staticmethod
+    def read_report(report_path, mutations):
+        """
+        Returns dictionary of mutation to array of differing test rows, or None if the report is missing or incomplete.
+        """
+        if not os.path.isfile(report_path):
+            return None
+        report = open(report_path, "r").read().splitlines()
+        if len(report) == 0 or len(report[0]) != len(mutations):
+            return None
+        rows = {k : [] for k in range(len(mutations))}
+        for line in report[1:]:
+            k, row = line.split()
+            rows[int(k)].append(int(row))
+        if any([(report[0][k] == "1") != (len(rows[k]) > 0) for k in rows]):
+            return None
+        return {mutations[k] : numpy.array(rows[k], dtype=numpy.int64) for k in rows}
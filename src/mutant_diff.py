@@ -0,0 +1,113 @@
+# This component stores mutated programs as small diffs against the oracle program.
+# MUSIC only edits the mutated function, so a mutation is kept as the line edits inside that function's range.
+# Extracting a mutated function then only needs those edits and, when normalized code is wanted, a parse of the
+# function alone instead of the whole preprocessed program. How often that works is counted in the parse cache statistics.
+from program_manipulation import ProgramManipulator
+try:
+    from pycparser.pycparser import c_generator, c_ast, c_parser
+except:
+    from pycparser import c_generator, c_ast, c_parser
+import difflib
+import re
+
+
+class MutantDiff(object):
+    __slots__ = ["edits"]
+
+    def __init__(self, edits):
+        """
+        Args:
+        edits = tuple of (start, end, replacement lines) relative to the oracle function's lines
+        """
+        self.edits = edits
+
+    def apply(self, function_lines):
+        lines = []
+        last = 0
+        for start, end, replacement in self.edits:
+            lines.extend(function_lines[last:start])
+            lines.extend(replacement)
+            last = end
+        lines.extend(function_lines[last:])
+        return lines
+
+
+class MutantSet(object):
+
+    # comments, and string and character literals so that comment markers inside them are kept
+    comment_pattern = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+    def __init__(self, oracle_program, function_name, path_to_fakeheaders, other_headers=[]):
+        self.oracle_program = oracle_program
+        self.function_name = function_name
+        self.path_to_fakeheaders = path_to_fakeheaders
+        self.other_headers = other_headers
+        program_lines = open(oracle_program, "r").readlines()
+        self.function_lines = ProgramManipulator.get_function_lines(oracle_program, function_name)
+        self.prefix = program_lines[:self.function_lines[0]]
+        self.suffix = program_lines[self.function_lines[1]+1:]
+        self.oracle_function_lines = program_lines[self.function_lines[0]:self.function_lines[1]+1]
+        self.diffs = {}
+        self.oracle_pm = ProgramManipulator(oracle_program, path_to_fakeheaders, other_headers=other_headers)
+        # declarations every standalone function parse starts with, so typedef names are known to the parser
+        typedef_names = [node.name for node in self.oracle_pm.ast.ext if isinstance(node, c_ast.Typedef)]
+        self.typedef_prefix = "".join([f"typedef int {name};\n" for name in sorted(set(typedef_names))])
+        # parsing functions alone is only trusted if it reproduces the oracle function exactly,
+        # e.g. it does not if the function uses macros
+        oracle_function = self.parse_function("".join(self.oracle_function_lines))
+        self.standalone_parse = oracle_function is not None and c_generator.CGenerator().visit(oracle_function) == self.oracle_pm.get_function(function_name)
+        if not self.standalone_parse:
+            print(f"{function_name} cannot be parsed on its own. Mutated functions will be extracted from full parses.")
+
+    def add(self, mutation):
+        """
+        Records the mutation as a diff against the oracle.
+        Returns None if the mutated program differs from the oracle outside of the function.
+        """
+        if mutation in self.diffs:
+            return self.diffs[mutation]
+        lines = open(mutation, "r").readlines()
+        if lines[:len(self.prefix)] != self.prefix or len(lines) < len(self.prefix) + len(self.suffix) or lines[len(lines)-len(self.suffix):] != self.suffix:
+            self.diffs[mutation] = None
+            return None
+        mutated_function_lines = lines[len(self.prefix):len(lines)-len(self.suffix)]
+        matcher = difflib.SequenceMatcher(None, self.oracle_function_lines, mutated_function_lines, autojunk=False)
+        edits = tuple([(i1, i2, tuple(mutated_function_lines[j1:j2])) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"])
+        self.diffs[mutation] = MutantDiff(edits)
+        return self.diffs[mutation]
+
+    def get_function_source(self, mutation):
+        """ Source text of the mutated function as written in the mutated program. """
+        diff = self.add(mutation)
+        if diff is None:
+            mutation_lines = open(mutation, "r").readlines()
+            function_lines = ProgramManipulator.get_function_lines(mutation, self.function_name)
+            return "".join(mutation_lines[function_lines[0]:function_lines[1]+1])
+        return "".join(diff.apply(self.oracle_function_lines))
+
+    def parse_function(self, function_source):
+        """ Parses a single function definition. Returns its FuncDef node, or None if it does not parse on its own. """
+        source = MutantSet.comment_pattern.sub(lambda m: m.group(0) if m.group(0)[0] in "\"'" else " ", function_source)
+        try:
+            ast = c_parser.CParser().parse(self.typedef_prefix + source, self.oracle_program)
+        except Exception:
+            return None
+        function_nodes = [node for node in ast.ext if isinstance(node, c_ast.FuncDef) and node.decl.name == self.function_name]
+        return function_nodes[0] if len(function_nodes) == 1 else None
+
+    def get_function_ast(self, mutation):
+        node = None
+        if self.standalone_parse and self.add(mutation) is not None:
+            node = self.parse_function(self.get_function_source(mutation))
+        if node is None:
+            ProgramManipulator.parse_cache.counts["function_fallbacks"] += 1
+            mutation_pm = ProgramManipulator(mutation, self.path_to_fakeheaders, other_headers=self.other_headers)
+            node = mutation_pm.get_function_ast(self.function_name)
+        else:
+            ProgramManipulator.parse_cache.counts["function_parses"] += 1
+        return node
+
+    def get_function(self, mutation):
+        """ Mutated function as pycparser generated code, the same as ProgramManipulator.get_function gives. """
+        node = self.get_function_ast(mutation)
+        return c_generator.CGenerator().visit(node) if node is not None else None
@@ -0,0 +1,113 @@
+# This component is a content-addressed store of generated mutations.
+# MUSIC is run once per oracle text, mutated line range and operator selection, into a temporary directory
+# that is renamed to the hash of those inputs when MUSIC is done, so concurrent runs never see half a generation.
+# Mutation directories are populated from the store with hard links (copies across file systems).
+# Stored files are read-only, so a mutation directory can not change the store through its links.
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from os.path import isfile, join
+from program_manipulation import ProgramManipulator
+
+
+class MutantStore(object):
+
+    metadata_filename = "mutant_store.json"
+
+    def __init__(self, store_dir="mutant-store", MUSIC_executable="./MUSIC/music"):
+        """
+        Args:
+        store_dir = directory generations are stored in, one directory per key
+        MUSIC_executable = MUSIC binary, its size and modification time are part of the key
+        """
+        self.store_dir = store_dir
+        self.MUSIC_executable = MUSIC_executable
+        os.makedirs(store_dir, exist_ok=True)
+
+    def make_key(self, program_name, function_lines, operators=None):
+        """ Key of a generation: MUSIC's identity, the oracle's filename and text, the line range and the operators. """
+        h = hashlib.sha256()
+        if isfile(self.MUSIC_executable):
+            stat = os.stat(os.path.realpath(self.MUSIC_executable))
+            h.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        h.update(b"\0")
+        # MUSIC names the mutations after the oracle file
+        h.update(ProgramManipulator.extract_last_file_from_prog_path(program_name).encode())
+        h.update(b"\0")
+        f = open(program_name, "rb")
+        h.update(f.read())
+        f.close()
+        h.update(b"\0")
+        h.update(f"{function_lines[0]}-{function_lines[1]}".encode())
+        h.update(b"\0")
+        h.update(" ".join(operators if operators else []).encode())
+        return h.hexdigest()
+
+    def get_path(self, key):
+        return join(self.store_dir, key)
+
+    def contains(self, key):
+        return isfile(join(self.get_path(key), MutantStore.metadata_filename))
+
+    def generate(self, program_name, function_lines, operators=None):
+        """
+        Runs MUSIC on the lines of program_name, unless the store already holds that generation.
+        Returns (key, hit). key is None if MUSIC failed or generated no mutations, which is not stored.
+        """
+        key = self.make_key(program_name, function_lines, operators)
+        if self.contains(key):
+            return key, True
+        start = time.perf_counter()
+        filename = ProgramManipulator.extract_last_file_from_prog_path(program_name)
+        tmp_dir = tempfile.mkdtemp(prefix="tmp-", dir=self.store_dir)
+        try:
+            operator_flags = "".join([f" -m {op}" for op in operators]) if operators else ""
+            returncode = subprocess.call(f"{self.MUSIC_executable} {program_name} -o {tmp_dir} -rs {filename}:{function_lines[0]} -re {filename}:{function_lines[1]}{operator_flags} --", shell=True)
+            if returncode != 0:
+                print(f"MUSIC failed on {program_name} with exit code {returncode}, nothing is stored")
+                return None, False
+            mutations = [m for m in os.listdir(tmp_dir) if m.endswith(".c")]
+            if len(mutations) == 0:
+                print(f"MUSIC generated no mutations of {program_name}, nothing is stored")
+                return None, False
+            for m in os.listdir(tmp_dir):
+                os.chmod(join(tmp_dir, m), 0o444)
+            metadata = {
+                "program" : filename,
+                "function_lines" : list(function_lines),
+                "operators" : operators,
+                "num_mutations" : len(mutations),
+                "wall_time" : time.perf_counter() - start
+            }
+            f = open(join(tmp_dir, MutantStore.metadata_filename), "w+")
+            f.write(json.dumps(metadata, indent=4))
+            f.close()
+            try:
+                os.rename(tmp_dir, self.get_path(key))
+            except OSError:
+                # another process stored the same generation first
+                pass
+        finally:
+            # nothing is left behind when MUSIC generated nothing, crashed or was interrupted
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        return key, False
+
+    def populate(self, key, mutated_program_dir_name):
+        """ Links the mutations of a stored generation into mutated_program_dir_name. Returns the number of files. """
+        os.makedirs(mutated_program_dir_name, exist_ok=True)
+        path = self.get_path(key)
+        files = [m for m in os.listdir(path) if m != MutantStore.metadata_filename]
+        for m in files:
+            destination = join(mutated_program_dir_name, m)
+            if os.path.lexists(destination):
+                os.remove(destination)
+            try:
+                os.link(join(path, m), destination)
+            except OSError:
+                shutil.copy2(join(path, m), destination)
+        return len(files)
@@ -0,0 +1,214 @@
+# This component triages generated mutations before any of them is executed.
+# Every mutation is compiled to assembly with optimizations, and the code of the mutated function and of every
+# function and object it reaches (including clones the compiler specialized for its calls) is canonicalized and
+# hashed. Mutations whose code is identical to the oracle's are equivalent without testing or solving.
+# Mutations with identical code are grouped, and only one representative per group is tested and checked.
+# The others inherit its verdict.
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import re
+import subprocess
+import time
+from os.path import join
+from cpu_budget import CPUBudget
+
+
+class MutantTriage(object):
+
+    triage_filename = "triage.json"
+    data_directives = [".long", ".quad", ".byte", ".value", ".short", ".word", ".2byte", ".4byte", ".8byte", ".string", ".ascii", ".zero", ".float", ".double", ".octa"]
+    local_label_pattern = re.compile(r'\.L\d+\b')
+    constant_label_pattern = re.compile(r'\.LC\d+\b')
+    symbol_pattern = re.compile(r'[A-Za-z_.$][\w.$]*')
+
+    def __init__(self, program_name, function_name, mutated_program_dir_name, compilation_pre_flags=None, working_dir_name="working_directory/", optimization="-O2", compiler="gcc", num_processes=None):
+        """
+        Args:
+        program_name = oracle program the mutations were generated from
+        mutated_program_dir_name = directory of the generated mutations, triage.json is written to it
+        compilation_pre_flags = flags the programs are compiled with, e.g. defines and include paths
+        working_dir_name = directory with the headers the programs include
+        """
+        self.program_name = program_name
+        self.function_name = function_name
+        self.mutated_program_dir_name = mutated_program_dir_name
+        self.compilation_pre_flags = compilation_pre_flags if compilation_pre_flags is not None else ""
+        self.working_dir_name = working_dir_name
+        self.optimization = optimization
+        self.compiler = compiler
+        self.num_processes = num_processes if num_processes is not None else mp.cpu_count()
+
+    @staticmethod
+    def read(mutated_program_dir_name):
+        """ Triage of a mutation directory, or None if it has not been triaged. """
+        path = join(mutated_program_dir_name, MutantTriage.triage_filename)
+        if not os.path.isfile(path):
+            return None
+        f = open(path, "r")
+        triage = json.loads(f.read())
+        f.close()
+        return triage
+
+    @staticmethod
+    def representatives(triage, mutations):
+        """ The mutations still to be tested: representatives and mutations that could not be triaged. """
+        return [m for m in mutations if triage["mutations"].get(m, {"status" : "representative"})["status"] == "representative"]
+
+    @staticmethod
+    def inherit(triage, kill_results):
+        """ Adds the duplicates of the mutations in kill_results with their representative's result. """
+        kill_results = dict(kill_results)
+        for m, entry in triage["mutations"].items():
+            if entry["status"] == "duplicate" and entry["representative"] in kill_results:
+                kill_results[m] = kill_results[entry["representative"]]
+        return kill_results
+
+    def compile_to_assembly(self, program):
+        result = subprocess.run(f"{self.compiler} {self.optimization} {self.compilation_pre_flags} -I{os.path.abspath(self.working_dir_name)} -S -o - {program}", shell=True, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            return None
+        return result.stdout
+
+    @staticmethod
+    def owner(label, functions):
+        """ Function a code label belongs to: itself, or the longest function it is a part of (e.g. helper.cold). None if neither. """
+        owners = [f for f in functions if label == f or label.startswith(f"{f}.")]
+        return max(owners, key=len) if len(owners) > 0 else None
+
+    @staticmethod
+    def canonicalize(assembly, function_name):
+        """
+        Canonical text of the function and of the functions (with their .part, .isra, .constprop, .cold, ... clones)
+        and objects it reaches in the assembly:
+        directives are dropped, local labels are numbered in order of appearance and constants are replaced by their data.
+        None if the function is not in the assembly or refers to local labels outside of it, e.g. jump tables.
+        """
+        lines = [l.strip() for l in assembly.splitlines()]
+        lines = [l for l in lines if len(l) > 0 and not l.startswith("#") and not l.startswith("//")]
+        # data of the constants, e.g. ".LC0: .long 1065353216"
+        constants = {}
+        current = None
+        for line in lines:
+            m = re.match(r'^(\.LC\d+):$', line)
+            if m is not None:
+                current = m.group(1)
+                constants[current] = []
+            elif current is not None and line.split()[0] in MutantTriage.data_directives:
+                constants[current].append(line)
+            else:
+                current = None
+        # functions and data objects defined in the assembly, e.g. ".type helper.constprop.0, @function"
+        text = "\n".join(lines)
+        functions = set(re.findall(r'^\.type\s+([^\s,]+),\s*[@%]function$', text, re.MULTILINE))
+        objects = set(re.findall(r'^\.type\s+([^\s,]+),\s*[@%]object$', text, re.MULTILINE))
+        # code of every part of every function (the function itself and its .cold, ... parts), up to the end of its frame,
+        # and the data of every object
+        parts = {}
+        current = None
+        for line in lines:
+            m = re.match(r'^([^\s:]+):$', line)
+            if m is not None and (MutantTriage.owner(m.group(1), functions) is not None or m.group(1) in objects):
+                current = m.group(1)
+                parts[current] = []
+            elif current is not None and current in objects:
+                if line.split()[0] in MutantTriage.data_directives:
+                    parts[current].append(line)
+                else:
+                    current = None
+            elif current is not None:
+                if line.startswith(".cfi_endproc") or (line.startswith(".size") and current in line):
+                    current = None
+                elif line.startswith(".") and not line.endswith(":"):
+                    continue
+                elif re.match(r'^\.L(FB|FE|FSB|COLD|HOT|VL|BB|BE|LST)\w*:$', line):
+                    continue
+                else:
+                    parts[current].append(line)
+        if function_name not in parts:
+            return None
+        # the function and everything it reaches: callees, including clones the compiler specialized for the
+        # mutated call sites (e.g. helper.constprop.0), and the objects they use
+        owners = {name : MutantTriage.owner(name, functions) if name not in objects else name for name in parts}
+        reached = set()
+        pending = [function_name]
+        while len(pending) > 0:
+            symbol = pending.pop()
+            if symbol in reached:
+                continue
+            reached.add(symbol)
+            for name in parts:
+                if owners[name] == symbol:
+                    pending += [t for t in MutantTriage.symbol_pattern.findall("\n".join(parts[name])) if (t in functions or t in objects) and t not in reached]
+        code = []
+        for name in sorted([n for n in parts if owners[n] in reached]):
+            code.append(f"{name}:")
+            code += parts[name]
+        defined = set([l[:-1] for l in code if MutantTriage.local_label_pattern.fullmatch(l[:-1]) is not None and l.endswith(":")])
+        referenced = set(MutantTriage.local_label_pattern.findall("\n".join(code)))
+        if not referenced <= defined:
+            return None
+        numbering = {}
+        for label in MutantTriage.local_label_pattern.findall("\n".join(code)):
+            numbering.setdefault(label, f".L_{len(numbering)}")
+        text = "\n".join(code)
+        text = MutantTriage.local_label_pattern.sub(lambda m: numbering[m.group(0)], text)
+        text = MutantTriage.constant_label_pattern.sub(lambda m: "{" + "; ".join(constants.get(m.group(0), [m.group(0)])) + "}", text)
+        return text
+
+    def hash_program(self, program):
+        """ Hash of the canonical code of the function in program, None if it could not be compiled or canonicalized. """
+        try:
+            with CPUBudget.token():
+                assembly = self.compile_to_assembly(program)
+        except subprocess.TimeoutExpired:
+            return None
+        if assembly is None:
+            return None
+        code = MutantTriage.canonicalize(assembly, self.function_name)
+        if code is None:
+            return None
+        return hashlib.sha256(code.encode()).hexdigest()
+
+    def run(self, mutations):
+        """
+        Triages the mutations (filenames in the mutation directory) and writes triage.json.
+        Every mutation is "equivalent" (same code as the oracle), "duplicate" (same code as its "representative")
+        or "representative". Mutations that could not be compiled or hashed are representatives without a hash.
+        Returns dictionary of statistics for the run data.
+        """
+        start = time.perf_counter()
+        oracle_hash = self.hash_program(self.program_name)
+        with mp.Pool(self.num_processes) as pool:
+            hashes = pool.map(self.hash_program, [join(self.mutated_program_dir_name, m) for m in mutations])
+        entries = {}
+        groups = {}
+        for m, h in sorted(zip(mutations, hashes)):
+            if h is None:
+                entries[m] = {"status" : "representative", "hash" : None}
+            elif h == oracle_hash:
+                entries[m] = {"status" : "equivalent", "hash" : h}
+            elif h in groups:
+                entries[m] = {"status" : "duplicate", "hash" : h, "representative" : groups[h]}
+            else:
+                groups[h] = m
+                entries[m] = {"status" : "representative", "hash" : h}
+        f = open(join(self.mutated_program_dir_name, MutantTriage.triage_filename), "w+")
+        f.write(json.dumps({"oracle_hash" : oracle_hash, "optimization" : self.optimization, "mutations" : entries}, indent=4))
+        f.close()
+        stop = time.perf_counter()
+        statuses = [e["status"] for e in entries.values()]
+        stats = {
+            "wall_time" : stop-start,
+            "num_mutations" : len(mutations),
+            "equivalent" : statuses.count("equivalent"),
+            "duplicates" : statuses.count("duplicate"),
+            "representatives" : statuses.count("representative"),
+            "untriaged" : len([e for e in entries.values() if e["hash"] is None]),
+            "triage_filename" : join(self.mutated_program_dir_name, MutantTriage.triage_filename)
+        }
+        if oracle_hash is None:
+            print(f"Could not hash {self.function_name} in the oracle, no mutation is marked equivalent.")
+        print(f"Triage: {stats['equivalent']} equivalent to the oracle, {stats['duplicates']} duplicates, {stats['representatives']} to test")
+        return stats
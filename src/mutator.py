@@ -1,24 +1,65 @@
 # This is the component that will run the desired mutator tool on a C program to generate mutated programs.
 # Currently this component supports the MUSIC mutation tool.
 from program_manipulation import ProgramManipulator 
+from meta_mutant import MetaMutantHarness
+from shared_object_evaluator import SharedObjectEvaluator
+from output_comparator import OutputComparator
+from build_cache import BuildCache
+from mutant_triage import MutantTriage
+from mutant_store import MutantStore
+from oracle_output_cache import OracleOutputCache
+from cpu_budget import CPUBudget
 import subprocess
 import os
 import time
-import copy
 from os.path import isfile, join
 import multiprocessing as mp
-import math
+import json
+import re
+import numpy
+import csv
+import difflib
+import glob
+import random
 
 # TODO: try killing mutants with new test set
 
 class Mutator(object):
 
-    def __init__(self, program_name, function_name, mutated_program_dir_name, compilation_info=None, compilation_pre_flags=None ,MUSIC_executable="./MUSIC/music", working_dir_name="working_directory/", file_dependencies=[]):
+    kill_manifest_filename = "kill_manifest.json"
+    sample_filename = "sample.json"
+    sample_strata = ["operator", "line"]
+    kill_modes = ["per_mutant", "meta_mutant", "shared_object"]
+    meta_mutant_compile_attempts = 3
+    meta_mutant_timeout = 60
+    # with early exit, the test suite is run in chunks ending at these rows, stopping at the first chunk that kills
+    early_exit_chunk_ends = [16, 256]
+
+    def __init__(self, program_name, function_name, mutated_program_dir_name, compilation_info=None, compilation_pre_flags=None ,MUSIC_executable="./MUSIC/music", working_dir_name="working_directory/", file_dependencies=[], path_to_fakeheaders="pycparser/utils/fake_libc_include", kill_mode="per_mutant", signed_zeros=False, nan_payloads=False, early_exit=False, num_processes=None, build_cache_dir=None, mutation_operators=None, sample_size=None, sample_strata="operator", sample_seed=0, mutant_store_dir=None, oracle_cache_dir=None):
         """
         Args:
         program_name = Name of program to mutate
         function_name = Name of function to mutate
+        kill_mode = "per_mutant" compiles and runs every mutation on its own.
+                    "meta_mutant" compiles all mutations into one program and runs the test suite once.
+                    "shared_object" compiles every mutation into a shared object and evaluates it in-process via ctypes.
+                    Mutations the meta-mutant or shared objects cannot handle fall back to "per_mutant".
+        signed_zeros = if True, +0 and -0 outputs are different
+        nan_payloads = if True, NaN outputs must have identical bit patterns (shared_object mode only, printed NaNs carry no payload)
+        early_exit = if True, stop testing a mutation at the first differing row. The kill matrix then only holds that row.
+        num_processes = size of the worker pools. Defaults to all cores.
+        build_cache_dir = directory of the persistent cache of compiled executables. Everything is compiled if None.
+        mutation_operators = MUSIC mutation operators to apply, e.g. ["ORRN", "OAAN"]. All of them if None.
+        sample_size = number of generated mutations kept, sampled evenly across strata. All are kept if None.
+        sample_strata = "operator" or "line", what the generated mutations are grouped by for sampling
+        sample_seed = seed of the sampling, so the same mutations are sampled again
+        mutant_store_dir = directory of the content-addressed store of generated mutations. MUSIC always runs if None.
+        oracle_cache_dir = directory of the persistent cache of oracle outputs per test suite. The oracle always runs if None.
         """
+        if kill_mode not in Mutator.kill_modes:
+            raise Exception(f"Unknown kill mode {kill_mode}. Choose from {Mutator.kill_modes}.")
+        if sample_strata not in Mutator.sample_strata:
+            raise Exception(f"Unknown sample strata {sample_strata}. Choose from {Mutator.sample_strata}.")
         self.program_name = program_name
         self.function_name = function_name
         self.MUSIC_executable = MUSIC_executable
@@ -28,6 +69,33 @@ class Mutator(object):
         self.compilation_pre_flags = compilation_pre_flags
         self.working_dir_name = working_dir_name
         self.file_dependencies = file_dependencies
+        self.path_to_fakeheaders = path_to_fakeheaders
+        self.kill_mode = kill_mode
+        self.signed_zeros = signed_zeros
+        self.nan_payloads = nan_payloads
+        self.early_exit = early_exit
+        self.num_processes = num_processes if num_processes is not None else mp.cpu_count()
+        self.build_cache = BuildCache(build_cache_dir) if build_cache_dir is not None else None
+        self.mutation_operators = mutation_operators
+        self.sample_size = sample_size
+        self.sample_strata = sample_strata
+        self.sample_seed = sample_seed
+        self.mutant_store = MutantStore(mutant_store_dir, MUSIC_executable) if mutant_store_dir is not None else None
+        # how the last generation went, for the run data
+        self.generation_data = None
+        self.oracle_cache = OracleOutputCache(oracle_cache_dir) if oracle_cache_dir is not None else None
+        # how the oracle outputs of the last kill pass were obtained, for the run data
+        self.oracle_output_data = None
+        # build cache hits and misses of the last kill pass, for the run data
+        self.build_cache_data = None
+        # statistics of the last incremental kill pass, for the run data
+        self.incremental_data = None
+        # description of the last sampling, for the run data
+        self.sample_data = None
+        # results of the last kill pass. mutation -> differing test rows, None if killed without a row (crash, compile error)
+        self.kill_rows = {}
+        self.num_test_rows = 0
+        self.kill_test_suite = None
     
     def generate_mutations(self):
         filename = ProgramManipulator.extract_last_file_from_prog_path(self.program_name)
@@ -37,74 +105,239 @@ class Mutator(object):
         else:
 	        os.system(f"rm -rf {self.mutated_program_dir_name}")
 	        os.mkdir(f"./{self.mutated_program_dir_name}")
-        subprocess.call(f"{self.MUSIC_executable} {self.program_name} -o {self.mutated_program_dir_name} -rs {filename}:{self.function_lines[0]} -re {filename}:{self.function_lines[1]} --", shell=True)
-        print(f"Mutated Programs generated at {self.mutated_program_dir_name} successfully")
+        if self.mutant_store is not None:
+            start = time.perf_counter()
+            key, hit = self.mutant_store.generate(self.program_name, self.function_lines, self.mutation_operators)
+            if key is not None:
+                self.mutant_store.populate(key, self.mutated_program_dir_name)
+            self.generation_data = {"store_key" : key, "store_hit" : hit, "wall_time" : time.perf_counter() - start}
+            print(f"Mutated Programs {'linked from' if hit else 'generated into'} {self.mutant_store.store_dir}/{key} at {self.mutated_program_dir_name}")
+        else:
+            operators = "".join([f" -m {op}" for op in self.mutation_operators]) if self.mutation_operators else ""
+            subprocess.call(f"{self.MUSIC_executable} {self.program_name} -o {self.mutated_program_dir_name} -rs {filename}:{self.function_lines[0]} -re {filename}:{self.function_lines[1]}{operators} --", shell=True)
+            print(f"Mutated Programs generated at {self.mutated_program_dir_name} successfully")
+        if self.sample_size is not None:
+            self.sample_data = self.sample_mutations()
+
+    def get_mutation_strata(self, mutations):
+        """
+        Dictionary of mutation to its stratum: its operator or its first mutated line.
+        Both are read from MUSIC's mutant database. Lines of mutations missing from it are found by diffing against the oracle.
+        """
+        database = {}
+        for db_filename in glob.glob(join(self.mutated_program_dir_name, "*_mut_db.csv")):
+            f = open(db_filename, "r", newline="")
+            for row in csv.reader(f):
+                if len(row) >= 3 and row[0].endswith(".c"):
+                    database[row[0]] = {"operator" : row[1].strip(), "line" : row[2].strip()}
+            f.close()
+        oracle_lines = None
+        strata = {}
+        for m in mutations:
+            if m in database:
+                strata[m] = database[m][self.sample_strata]
+                continue
+            if self.sample_strata == "operator":
+                strata[m] = "unknown"
+                continue
+            if oracle_lines is None:
+                oracle_lines = open(self.program_name, "r").readlines()
+            mutation_lines = open(join(self.mutated_program_dir_name, m), "r").readlines()
+            opcodes = [o for o in difflib.SequenceMatcher(None, oracle_lines, mutation_lines, autojunk=False).get_opcodes() if o[0] != "equal"]
+            strata[m] = str(opcodes[0][1] + 1) if len(opcodes) > 0 else "unknown"
+        return strata
+
+    def sample_mutations(self):
+        """
+        Keeps sample_size of the generated mutations: every stratum is shuffled with the seed, then mutations are taken
+        from the strata in turn, so small strata are kept whole and large ones are cut down.
+        Writes sample.json, which get_mutations honours. Returns the description of the sample for the run data.
+        """
+        mutations = self.get_mutations()
+        strata = self.get_mutation_strata(mutations)
+        rng = random.Random(self.sample_seed)
+        groups = {}
+        for m in mutations:
+            groups.setdefault(strata[m], []).append(m)
+        for key in sorted(groups):
+            rng.shuffle(groups[key])
+        sampled = []
+        while len(sampled) < min(self.sample_size, len(mutations)):
+            for key in sorted(groups):
+                if len(groups[key]) > 0 and len(sampled) < self.sample_size:
+                    sampled.append(groups[key].pop(0))
+        sample = {
+            "num_generated" : len(mutations),
+            "sample_size" : len(sampled),
+            "strata" : self.sample_strata,
+            "seed" : self.sample_seed,
+            "operators" : self.mutation_operators,
+            "num_strata" : len(set(strata.values())),
+            "sampled" : sorted(sampled)
+        }
+        f = open(join(self.mutated_program_dir_name, Mutator.sample_filename), "w+")
+        f.write(json.dumps(sample, indent=4))
+        f.close()
+        print(f"Sampled {len(sampled)} of {len(mutations)} mutations from {sample['num_strata']} strata by {self.sample_strata}")
+        return sample
+
+    def read_sample(self):
+        path = join(self.mutated_program_dir_name, Mutator.sample_filename)
+        if not isfile(path):
+            return None
+        f = open(path, "r")
+        sample = json.loads(f.read())
+        f.close()
+        return sample
         
 
     @staticmethod
-    def outputs_equal(o1, o2):
+    def outputs_equal(o1, o2, signed_zeros=False, nan_payloads=False):
+        """
+        Outputs may be lines of hex floats or already parsed arrays.
+        NaNs compare equal to each other. See OutputComparator.differing_rows for the optional strictness flags.
+        """
+        o1 = OutputComparator.parse_outputs(o1)
+        o2 = OutputComparator.parse_outputs(o2)
         if len(o1) != len(o2):
             print("Outputs are not the same length. They are not equal.")
             return False
-        for i in range(len(o1)):
-            v1 = float.fromhex(o1[i])
-            v2 = float.fromhex(o2[i])
-            # nans never compare equal, but we need them to 
-            if v1 != v2 and not (math.isnan(v1) and math.isnan(v2)):
-                print(f"Outputs at row {i+1} are not the same.\n{v1} vs {v2}. ({o1[i].strip()} vs {o2[i].strip()})")
-                return False
+        differing = OutputComparator.differing_rows(o1, o2, signed_zeros, nan_payloads)
+        if len(differing) > 0:
+            i = differing[0]
+            print(f"Outputs at row {i+1} are not the same.\n{o1[i]} vs {o2[i]}. ({len(differing)} rows differ)")
+            return False
         return True
 
-    def compile_test_and_compare_mutation(self, mutation, working_dir, oracle_outputs, test_suite):
-        mutation_executable = f"{ProgramManipulator.extract_last_file_from_prog_path(mutation)}.exe"
-        mutation_output_file = f"{ProgramManipulator.extract_last_file_from_prog_path(mutation)}.txt"
+    def differing_rows(self, oracle_outputs, mutation_outputs, mutation):
+        """ Rows where the mutation's outputs differ from the oracle's, printing the first one. """
+        differing = OutputComparator.differing_rows(oracle_outputs, mutation_outputs, self.signed_zeros, self.nan_payloads)
+        if len(differing) > 0:
+            i = differing[0]
+            if i < min(len(oracle_outputs), len(mutation_outputs)):
+                print(f"{mutation}: outputs at row {i+1} are not the same.\n{oracle_outputs[i]} vs {mutation_outputs[i]}. ({len(differing)} rows differ)")
+            else:
+                print(f"{mutation}: outputs are not the same length. They are not equal.")
+        return differing
 
-        subprocess.call(f"cp {self.mutated_program_dir_name}/{mutation} {working_dir}", shell=True, timeout=5)
+    @staticmethod
+    def is_killed(rows):
+        return rows is None or len(rows) > 0
 
-        subprocess.call(f"gcc {self.compilation_pre_flags} {mutation} {self.compilation_info} -o {mutation_executable}", shell=True, cwd=working_dir, timeout=5)
-        # run on test suite
-        ts_ = os.path.join('..', test_suite)
-        result = subprocess.call(f"./{mutation_executable} {ts_} {mutation_output_file}", shell=True, cwd=working_dir, timeout=5)
-        
-        diff = False
-        if result == 137:  # 137 is SIGKILL code.
-            print(f"Unuseful mutation {mutation}. (Thread killed). Deleting.")
-            subprocess.call(f"rm {self.mutated_program_dir_name}/{mutation}", shell=True, timeout=5)
-        else:
+    @staticmethod
+    def count_test_rows(test_suite):
+        f = open(test_suite, "r")
+        num_rows = len([l for l in f.readlines() if l.strip() != ""])
+        f.close()
+        return num_rows
+
+    def split_test_suite(self, test_suite):
+        """
+        Returns list of (test suite, first row, number of rows) to run in order.
+        Without early exit this is the whole suite. With early exit, the suite is split into growing chunks
+        written to the working directory, so most killed mutations only run the first few rows.
+        """
+        num_rows = Mutator.count_test_rows(test_suite)
+        if not self.early_exit:
+            return [(test_suite, 0, num_rows)]
+        rows = [l for l in open(test_suite, "r").readlines() if l.strip() != ""]
+        chunk_ends = [e for e in Mutator.early_exit_chunk_ends if e < num_rows] + [num_rows]
+        chunks = []
+        start = 0
+        for n, end in enumerate(chunk_ends):
+            chunk_name = join(self.working_dir_name, f"{ProgramManipulator.extract_last_file_from_prog_path(test_suite)}.chunk{n}")
+            f = open(chunk_name, "w+")
+            f.write("".join(rows[start:end]))
+            f.close()
+            chunks.append((chunk_name, start, end-start))
+            start = end
+        return chunks
+
+    def compile_program(self, program, executable, working_dir, timeout=5, capture_output=False):
+        """
+        Compiles program (relative to working_dir) with the compilation flags, through the build cache if there is one.
+        Returns the subprocess.CompletedProcess of the compilation.
+        """
+        arguments = f"{self.compilation_pre_flags} {program} {self.compilation_info}"
+        if self.build_cache is not None:
+            return self.build_cache.compile(arguments, executable, working_dir, timeout=timeout, capture_output=capture_output)
+        return subprocess.run(f"gcc {arguments} -o {executable}", shell=True, cwd=working_dir, timeout=timeout, capture_output=capture_output, text=True)
+
+    def compile_test_and_compare_mutation(self, mutation, working_dir, oracle_outputs, test_chunks):
+        """
+        Args:
+        test_chunks = list of (test suite, first row, number of rows) from split_test_suite
+        Returns (mutation, differing rows, build cache counts of the call).
+        Differing rows is None for mutations that fail to compile, crash or time out, which count as killed.
+        The build cache counts are those of this process's copy of the cache, for merging in the parent of a pool worker.
+        """
+        build_counts = dict(self.build_cache.counts) if self.build_cache is not None else None
+        with CPUBudget.token():
+            mutation_executable = f"{ProgramManipulator.extract_last_file_from_prog_path(mutation)}.exe"
+            mutation_output_file = f"{ProgramManipulator.extract_last_file_from_prog_path(mutation)}.txt"
+
+            differing = numpy.array([], dtype=numpy.int64)
             try:
-                mutation_outputs = open(f"{working_dir}{mutation_output_file}", "r").readlines()
-                # compare output to oracle output
-                # if same, kill
-                # else, keep
-                if not Mutator.outputs_equal(oracle_outputs,mutation_outputs):
-                    subprocess.call(f"rm {self.mutated_program_dir_name}/{mutation}", shell=True, timeout=5)
-                    print(f"Test suite covers {mutation}. Deleting file.")
-                else:
-                    diff = True
-                    print(f"{mutation} has not been killed. No differentiating test case found.")
+                # -f replaces a read-only copy left by an earlier pass, mutations linked from the store are read-only
+                if subprocess.call(f"cp -f {self.mutated_program_dir_name}/{mutation} {working_dir}", shell=True, timeout=5) != 0:
+                    raise Exception(f"Could not copy {mutation} to {working_dir}")
+
+                self.compile_program(mutation, mutation_executable, working_dir)
+                for chunk_suite, first_row, chunk_rows in test_chunks:
+                    # run on test suite
+                    ts_ = os.path.join('..', chunk_suite)
+                    if isfile(f"{working_dir}{mutation_output_file}"):
+                        os.remove(f"{working_dir}{mutation_output_file}")
+                    result = subprocess.call(f"./{mutation_executable} {ts_} {mutation_output_file}", shell=True, cwd=working_dir, timeout=5)
+                    if result == 137:  # 137 is SIGKILL code.
+                        print(f"Unuseful mutation {mutation}. (Thread killed). Killing.")
+                        differing = None
+                        break
+                    # compare output to oracle output
+                    # if same, kill
+                    # else, keep
+                    mutation_outputs = OutputComparator.read_outputs(f"{working_dir}{mutation_output_file}")
+                    chunk_differing = self.differing_rows(oracle_outputs[first_row:first_row+chunk_rows], mutation_outputs, mutation)
+                    differing = numpy.concatenate([differing, chunk_differing + first_row])
+                    if self.early_exit and len(differing) > 0:
+                        differing = differing[:1]
+                        break
+            except subprocess.TimeoutExpired:
+                print(f"Unuseful mutation {mutation}. (Timed out). Killing.")
+                differing = None
             except Exception as e:
                 print(e)
                 print(f"Unuseful mutation {mutation}. Killing. In exception")
-                subprocess.call(f"rm {self.mutated_program_dir_name}/{mutation}", shell=True, timeout=5)
-        # clean up
-        if not diff:
-            subprocess.call(f"rm {mutation_output_file} {mutation} {mutation_executable}", shell=True, cwd=working_dir, timeout=5)
-        # return mutation, open(test_suite, "r").readlines(), mutation_outputs
+                differing = None
+
+            if differing is not None and len(differing) > 0:
+                print(f"Test suite covers {mutation}. Killing.")
+            elif differing is not None:
+                print(f"{mutation} has not been killed. No differentiating test case found.")
+            # clean up
+            if Mutator.is_killed(differing):
+                subprocess.call(f"rm -f {mutation_output_file} {mutation} {mutation_executable}", shell=True, cwd=working_dir, timeout=5)
+        return mutation, differing, self.build_cache.counts_since(build_counts) if self.build_cache is not None else None
 
-    def test_and_compare_mutation(self, test_suite, oracle_outputs, mutation_executable, survived_mutations, working_dir):
+    def test_mutation_binary(self, mutation_executable, test_suite, oracle_outputs, working_dir):
+        """ Differing test rows of a mutated binary, None if it crashes, times out or prints something else than outputs. """
         mutation_output_file = f"{ProgramManipulator.extract_last_file_from_prog_path(mutation_executable)}.txt"
         mutation_output = Mutator.get_program_output(mutation_executable, test_suite, mutation_output_file, working_dir)
         if mutation_output is None:
-            print(f"Unuseful mutation {mutation_executable}. Deleting.")
-            survived_mutations.remove(mutation_executable)
+            print(f"Unuseful mutation {mutation_executable}. Killing.")
+            return None
+        try:
+            differing = self.differing_rows(oracle_outputs, [o for o in mutation_output if o.strip() != ""], mutation_executable)
+        except ValueError as e:
+            print(f"Unuseful mutation {mutation_executable}. Unreadable output: {e}. Killing.")
+            return None
+        if len(differing) > 0:
+            print(f"Test suite covers {mutation_executable}. Killing.")
+            differing = differing[:1] if self.early_exit else differing
         else:
-            if not Mutator.outputs_equal(oracle_outputs, mutation_output):
-                survived_mutations.remove(mutation_executable)
-                print(f"Test suite covers {mutation_executable}. Deleting.")
-            else:
-                print(f"{mutation_executable} has not been killed. No differentiating test case found.")
+            print(f"{mutation_executable} has not been killed. No differentiating test case found.")
+        return differing
 
- 
     @staticmethod
     def get_program_output(program_executable, test_suite, output_filename, working_dir):
         try:
@@ -123,85 +356,486 @@ class Mutator(object):
             print(f"In get program output: {e}")
             return None
 
+    @staticmethod
+    def mutation_id(name):
+        """ MUSIC's id of a mutation in a source or binary filename, e.g. MUT2 for add_f32_copy.MUT2.c and add_f32_MUT2.exe. """
+        ids = re.findall(r'MUT\d+', ProgramManipulator.extract_last_file_from_prog_path(name))
+        return ids[-1] if len(ids) > 0 else None
+
     def kill_mutations_with_binary(self, test_suite, oracle_binary, mutated_binary_folder):
-        mutated_binaries = [join(mutated_binary_folder,f) for f in os.listdir(mutated_binary_folder) if isfile(join(mutated_binary_folder, f))]
-        print(f"Total mutated binaries before copy: {len(mutated_binaries)}")
+        """
+        Tests prebuilt mutated binaries. Binaries are matched to the generated mutations by MUSIC's MUTn id, so
+        results, the kill manifest and the survivors are those of the mutation sources, as after a compiled pass.
+        Mutations without a binary failed to build and count as killed.
+        Without generated mutations, results are recorded per binary and no manifest is written.
+        """
+        mutated_binaries = sorted([join(mutated_binary_folder,f) for f in os.listdir(mutated_binary_folder) if isfile(join(mutated_binary_folder, f))])
+        print(f"Total mutated binaries: {len(mutated_binaries)}")
         start = time.perf_counter()
-        survived_mutations = copy.deepcopy(mutated_binaries)
-        total_mutations = len(mutated_binaries)
-        print(f"Total mutated binaries: {total_mutations}")
+        mutations = self.get_mutations() if os.path.isdir(self.mutated_program_dir_name) else []
+        write_manifest = len(mutations) > 0
+        if write_manifest:
+            binaries = {Mutator.mutation_id(b) : b for b in mutated_binaries}
+            targets = {m : binaries.get(Mutator.mutation_id(m)) for m in mutations}
+            print(f"{len([m for m in targets if targets[m] is None])} mutations failed to build")
+        else:
+            targets = {ProgramManipulator.extract_last_file_from_prog_path(b) : b for b in mutated_binaries}
 
         oracle_output_file = "oracle_output.txt"
         working_directory = self.working_dir_name
-        for command in self.compilation_info:
-            subprocess.call(command, shell=True, timeout=5)
-        oracle_outputs = Mutator.get_program_output(oracle_binary, test_suite, oracle_output_file, working_directory)
+        # commands preparing the working directory, compilation_info holds compiler flags otherwise
+        if isinstance(self.compilation_info, list):
+            for command in self.compilation_info:
+                subprocess.call(command, shell=True, timeout=5)
+        def run_suite(suite):
+            outputs = Mutator.get_program_output(oracle_binary, suite, oracle_output_file, working_directory)
+            return OutputComparator.parse_outputs([o for o in outputs if o.strip() != ""]) if outputs is not None else None
+        if self.oracle_cache is not None:
+            oracle_outputs, self.oracle_output_data = self.oracle_cache.get_outputs(oracle_binary, test_suite, run_suite, self.get_tail_suite_name(test_suite))
+        else:
+            oracle_outputs = run_suite(test_suite)
+        if oracle_outputs is None:
+            raise Exception(f"Could not run the oracle binary {oracle_binary} on {test_suite}.")
         print("Generated oracle outputs.")
-        #pool = mp.Pool(mp.cpu_count())
-        for mutation in mutated_binaries:
-            self.test_and_compare_mutation(test_suite, oracle_outputs, mutation, survived_mutations, working_directory)
-            
-        #pool.close()
-        #pool.join()
-        stop = time.perf_counter()
-
-
-        print(f"Total Killed Mutations: {total_mutations-len(survived_mutations)} out of {total_mutations} total mutations")
-        print(f"Kill ratio {(total_mutations-len(survived_mutations))/total_mutations}")
-        print(f"Run Statistics:\nTime Taken: {stop-start} seconds")
-        return start-stop, total_mutations, len(survived_mutations)
+        kill_results = {}
+        for mutation in sorted(targets):
+            kill_results[mutation] = self.test_mutation_binary(targets[mutation], test_suite, oracle_outputs, working_directory) if targets[mutation] is not None else None
+        return self.finish_kill_pass(kill_results, test_suite, start, len(kill_results), write_manifest)
 
+    def get_tail_suite_name(self, test_suite):
+        """ File in the working directory the rows of test_suite without cached oracle outputs are written to. """
+        return join(self.working_dir_name, f"{ProgramManipulator.extract_last_file_from_prog_path(test_suite)}.tail")
 
-    def kill_mutations(self, test_suite, oracle_binary=None, binary_folder=None):
+    def kill_mutations(self, test_suite, oracle_binary=None, binary_folder=None, mutations=None):
+        """
+        mutations = optional list of mutation filenames to test instead of all of them.
+                    Such a pass over a subset does not change the kill manifest.
+        """
+        self.oracle_output_data = None
+        build_counts = dict(self.build_cache.counts) if self.build_cache is not None else None
         if binary_folder is None or oracle_binary is None:
-            return self.kill_mutations_with_compile(test_suite)
+            result = self.kill_mutations_with_compile(test_suite, mutations)
         else:
-            return self.kill_mutations_with_binary(test_suite, oracle_binary, binary_folder)
+            result = self.kill_mutations_with_binary(test_suite, oracle_binary, binary_folder)
+        self.build_cache_data = self.build_cache.stats(since=build_counts) if self.build_cache is not None else None
+        return result
 
     
-    def kill_mutations_with_compile(self, test_suite):
+    def kill_mutations_with_compile(self, test_suite, mutations=None):
         working_dir = self.working_dir_name
-        oracle_executable = "oracle_exec"
-        oracle_output_file = "oracle_output.txt"
 
         # add file dependencies to working_dir
         for file in self.file_dependencies:
             subprocess.call(f"cp {file} {working_dir}", shell=True, timeout=5)
-        # compile oracle
-        subprocess.call(f"cp {self.program_name} {working_dir}", shell=True, timeout=5)
-        print(f"gcc {self.compilation_pre_flags} {ProgramManipulator.extract_last_file_from_prog_path(self.program_name)} {self.compilation_info} -o {oracle_executable}")
-        subprocess.call(f"gcc {self.compilation_pre_flags} {ProgramManipulator.extract_last_file_from_prog_path(self.program_name)} {self.compilation_info} -o {oracle_executable}", shell=True, cwd=working_dir, timeout=5)
-        # run oracle on test suite
-        time.sleep(2)
-        _ts = os.path.join('..', test_suite)
-        subprocess.call(f"./{oracle_executable} {_ts} {oracle_output_file}", shell=True, cwd=working_dir, timeout=5)
-        # get oracle output
-        oracle_outputs = open(f"{working_dir}{oracle_output_file}", "r").readlines()
         # for each mutation 
-        mutated_programs = [f for f in os.listdir(self.mutated_program_dir_name) if isfile(join(self.mutated_program_dir_name, f))]
-        mutated_programs = [m for m in mutated_programs if m.endswith(".c")]
+        mutated_programs = self.get_mutations() if mutations is None else sorted(mutations)
+        write_manifest = mutations is None
         total_mutations = len(mutated_programs)
         print(f"Total mutations: {total_mutations}")
-        
+
         start = time.perf_counter()
-        pool = mp.Pool(mp.cpu_count())
-        for mutation in mutated_programs:
-            pool.apply_async(self.compile_test_and_compare_mutation, (mutation, working_dir, oracle_outputs, test_suite))
+        kill_results = self.test_mutations(mutated_programs, test_suite)
+        return self.finish_kill_pass(kill_results, test_suite, start, total_mutations, write_manifest)
+
+    def test_mutations(self, mutated_programs, test_suite, first_rows=None):
+        """
+        Runs the mutations on test_suite with the kill mode, falling back to testing them one at a time.
+        Args:
+        first_rows = optional dictionary of mutation to a row of test_suite. With early exit, a mutation runs on its row first.
+        Returns dictionary of mutation filename to differing test rows (None if killed without a row).
+        """
+        working_dir = self.working_dir_name
+        oracle_executable = "oracle_exec"
+        oracle_output_file = "oracle_output.txt"
+        kill_results = {}
+        if self.kill_mode == "meta_mutant":
+            kill_results = self.kill_mutations_with_meta_mutant(mutated_programs, test_suite)
+        elif self.kill_mode == "shared_object":
+            kill_results = self.kill_mutations_with_shared_objects(mutated_programs, test_suite)
+        remaining_programs = [m for m in mutated_programs if m not in kill_results]
+        if len(remaining_programs) == 0:
+            return kill_results
+        print(f"Testing {len(remaining_programs)} mutations one at a time.")
+
+        # compile oracle
+        subprocess.call(f"cp {self.program_name} {working_dir}", shell=True, timeout=5)
+        print(f"gcc {self.compilation_pre_flags} {ProgramManipulator.extract_last_file_from_prog_path(self.program_name)} {self.compilation_info} -o {oracle_executable}")
+        self.compile_program(ProgramManipulator.extract_last_file_from_prog_path(self.program_name), oracle_executable, working_dir)
+        # run oracle on test suite
+        def run_suite(suite):
+            if isfile(f"{working_dir}{oracle_output_file}"):
+                os.remove(f"{working_dir}{oracle_output_file}")
+            _ts = os.path.join('..', suite)
+            subprocess.call(f"./{oracle_executable} {_ts} {oracle_output_file}", shell=True, cwd=working_dir, timeout=5)
+            # get oracle output, None if the oracle did not write one or printed a line that is not a hex float
+            try:
+                return OutputComparator.read_outputs(f"{working_dir}{oracle_output_file}")
+            except (OSError, ValueError) as e:
+                print(f"Could not read the oracle outputs on {suite}: {e}")
+                return None
+        if self.oracle_cache is not None:
+            oracle_outputs, self.oracle_output_data = self.oracle_cache.get_outputs(f"{working_dir}{oracle_executable}", test_suite, run_suite, self.get_tail_suite_name(test_suite))
+        else:
+            oracle_outputs = run_suite(test_suite)
+        if oracle_outputs is None:
+            # nothing to compare against, every remaining mutation counts as killed without a test row
+            print(f"Oracle run on {test_suite} failed. Killing {len(remaining_programs)} mutations without a test row.")
+            for mutation in remaining_programs:
+                kill_results[mutation] = None
+            return kill_results
+        test_chunks = self.split_test_suite(test_suite)
+        row_suites = self.split_first_rows(test_suite, first_rows) if self.early_exit and first_rows else {}
+        pool = mp.Pool(self.num_processes)
+        async_results = []
+        for mutation in remaining_programs:
+            chunks = test_chunks
+            if first_rows is not None and first_rows.get(mutation) in row_suites:
+                chunks = [(row_suites[first_rows[mutation]], first_rows[mutation], 1)] + test_chunks
+            async_results.append(pool.apply_async(self.compile_test_and_compare_mutation, (mutation, working_dir, oracle_outputs, chunks)))
         pool.close()
         pool.join()
-        # for mutation in mutated_programs:
-        #     self.test_and_compare_mutation(mutation, working_dir, oracle_outputs, test_suite)
-        stop = time.perf_counter()
+        for mutation, async_result in zip(remaining_programs, async_results):
+            try:
+                _, kill_results[mutation], build_counts = async_result.get()
+                if build_counts is not None:
+                    self.build_cache.merge(build_counts)
+            except Exception as e:
+                print(f"Exception while testing {mutation}: {e}. Killing.")
+                kill_results[mutation] = None
         #subprocess.call(f"rm {oracle_executable} {oracle_output_file}", shell=True, cwd=working_dir, timeout=5)
+        return kill_results
+
+    def split_first_rows(self, test_suite, first_rows):
+        """ Writes every row of test_suite in first_rows to its own suite in the working directory. Returns dictionary of row to suite. """
+        rows = [l for l in open(test_suite, "r").readlines() if l.strip() != ""]
+        row_suites = {}
+        for row in sorted(set(first_rows.values())):
+            if 0 <= row < len(rows):
+                row_suites[row] = join(self.working_dir_name, f"{ProgramManipulator.extract_last_file_from_prog_path(test_suite)}.row{row}")
+                f = open(row_suites[row], "w+")
+                f.write(rows[row])
+                f.close()
+        return row_suites
+
+    @staticmethod
+    def load_kill_rows(kill_matrix_filename):
+        """ Kill rows of a pass from its kill matrix, as (dictionary of mutation to differing rows, test suite). """
+        mutations, matrix, unattributed, test_suite, _ = Mutator.read_kill_matrix(kill_matrix_filename)
+        kill_rows = {m : None if unattributed[i] else numpy.flatnonzero(matrix[i]) for i, m in enumerate(mutations)}
+        return kill_rows, test_suite
+
+    @staticmethod
+    def read_row_values(test_suite, num_rows):
+        """ Values of the first num_rows non-empty rows of a test suite, for comparing suites regardless of spacing. """
+        f = open(test_suite, "r")
+        rows = [l.split() for l in f.readlines() if l.strip() != ""]
+        f.close()
+        return rows[:num_rows]
+
+    def kill_new_rows(self, test_suite, first_new_row, previous_kill_matrix=None, counterexample_rows=None):
+        """
+        Incremental kill pass over a suite that extends the suite of the previous pass with new rows from first_new_row on.
+        Mutations the previous pass killed stay killed with their rows. The survivors only run on the new rows,
+        and with early exit first on the row of their own counterexample. Differing rows are rows of the whole suite,
+        so the kill rows and the manifest look like those of a full pass, except that killed mutations are not run on the new rows.
+        Falls back to a full pass if the previous pass is not known or its suite is not a prefix of test_suite.
+        Args:
+        previous_kill_matrix = kill matrix of the previous pass. The kill rows in memory are used if None.
+        counterexample_rows = dictionary of mutation to the row of its first counterexample in test_suite
+        """
+        if previous_kill_matrix is not None and isfile(previous_kill_matrix):
+            previous_rows, previous_suite = Mutator.load_kill_rows(previous_kill_matrix)
+        else:
+            previous_rows, previous_suite = self.kill_rows, self.kill_test_suite
+        if len(previous_rows) == 0 or previous_suite is None or not isfile(previous_suite) \
+                or Mutator.count_test_rows(previous_suite) != first_new_row \
+                or Mutator.read_row_values(previous_suite, first_new_row) != Mutator.read_row_values(test_suite, first_new_row):
+            print(f"{test_suite} does not extend the suite of the previous kill pass. Running all of it.")
+            self.incremental_data = {"fallback" : True}
+            return self.kill_mutations(test_suite)
+        self.oracle_output_data = None
+        build_counts = dict(self.build_cache.counts) if self.build_cache is not None else None
+        for file in self.file_dependencies:
+            subprocess.call(f"cp {file} {self.working_dir_name}", shell=True, timeout=5)
+        start = time.perf_counter()
+        mutated_programs = self.get_mutations()
+        survivors = [m for m in mutated_programs if not Mutator.is_killed(previous_rows.get(m, numpy.array([], dtype=numpy.int64)))]
+        num_rows = Mutator.count_test_rows(test_suite)
+        kill_results = {m : previous_rows[m] for m in previous_rows if Mutator.is_killed(previous_rows[m])}
+        print(f"Testing {len(survivors)} surviving mutations on rows {first_new_row+1} to {num_rows} of {test_suite}.")
+        if len(survivors) > 0 and num_rows > first_new_row:
+            new_suite = join(self.working_dir_name, f"{ProgramManipulator.extract_last_file_from_prog_path(test_suite)}.new")
+            rows = [l for l in open(test_suite, "r").readlines() if l.strip() != ""]
+            f = open(new_suite, "w+")
+            f.write("".join(rows[first_new_row:]))
+            f.close()
+            first_rows = None
+            if counterexample_rows is not None:
+                first_rows = {m : counterexample_rows[m] - first_new_row for m in survivors if m in counterexample_rows and counterexample_rows[m] >= first_new_row}
+            new_results = self.test_mutations(survivors, new_suite, first_rows)
+            for m in survivors:
+                kill_results[m] = new_results[m] + first_new_row if new_results.get(m) is not None else None
+        else:
+            for m in survivors:
+                kill_results[m] = numpy.array([], dtype=numpy.int64)
+        killed = len([m for m in survivors if Mutator.is_killed(kill_results[m])])
+        self.incremental_data = {
+            "fallback" : False,
+            "first_new_row" : first_new_row,
+            "new_rows" : max(0, num_rows - first_new_row),
+            "previously_killed" : len(mutated_programs) - len(survivors),
+            "survivors_tested" : len(survivors),
+            "survivors_killed" : killed
+        }
+        self.build_cache_data = self.build_cache.stats(since=build_counts) if self.build_cache is not None else None
+        return self.finish_kill_pass(kill_results, test_suite, start, len(mutated_programs))
 
-        survived_mutations = [f for f in os.listdir(self.mutated_program_dir_name) if isfile(join(self.mutated_program_dir_name, f))]
-        survived_mutations = len([m for m in survived_mutations if m.endswith(".c")])
-        print(survived_mutations)
-        print(f"Total Killed Mutations: {total_mutations-survived_mutations} out of {total_mutations} total mutations")
-        print(f"Kill ratio {(total_mutations-survived_mutations)/total_mutations}")
+    def finish_kill_pass(self, kill_results, test_suite, start, total_mutations, write_manifest=True):
+        """
+        Args:
+        kill_results = dictionary of mutation filename to differing test rows (None if killed without a row)
+        write_manifest = if False, the kill manifest of the previous pass is kept
+        """
+        stop = time.perf_counter()
+        triage = MutantTriage.read(self.mutated_program_dir_name)
+        if write_manifest and triage is not None:
+            # duplicates are killed or survive with their representative
+            kill_results = MutantTriage.inherit(triage, kill_results)
+            total_mutations = len(kill_results)
+        self.kill_rows = kill_results
+        self.num_test_rows = Mutator.count_test_rows(test_suite)
+        self.kill_test_suite = test_suite
+        if write_manifest:
+            self.write_kill_manifest({m : Mutator.is_killed(kill_results[m]) for m in kill_results}, test_suite)
+        killed_mutations = len([m for m in kill_results if Mutator.is_killed(kill_results[m])])
+        print(f"Total Killed Mutations: {killed_mutations} out of {total_mutations} total mutations")
+        print(f"Kill ratio {killed_mutations/total_mutations if total_mutations > 0 else 0.0}")
         print(f"Run Statistics:\nTime Taken: {stop-start} seconds")
         
-        return stop-start, total_mutations, total_mutations - survived_mutations
+        return stop-start, total_mutations, killed_mutations
+
+    def kill_mutations_with_meta_mutant(self, mutated_programs, test_suite):
+        """
+        Compiles all mutations into a single meta-mutant program and runs the test suite once.
+        Mutations that do not compile together are left out and retried without them.
+        Returns:
+        dictionary of mutation to differing test rows, for the mutations the meta-mutant decided.
+        An empty dictionary if the meta-mutant could not be built or run.
+        """
+        working_dir = self.working_dir_name
+        meta_program = f"meta_mutant_{ProgramManipulator.extract_last_file_from_prog_path(self.program_name)}"
+        meta_executable = "meta_mutant_exec"
+        meta_output_file = "meta_mutant_output.txt"
+        for file in self.file_dependencies:
+            subprocess.call(f"cp {file} {working_dir}", shell=True, timeout=5)
+        try:
+            harness = MetaMutantHarness(self.program_name, self.function_name, self.path_to_fakeheaders, other_headers=[f"-I{working_dir}"])
+        except Exception as e:
+            print(f"Could not parse {self.program_name} for the meta-mutant: {e}")
+            return {}
+        if not harness.supported():
+            print(f"Meta-mutant does not support {self.function_name}. Falling back to testing mutations one at a time.")
+            return {}
+
+        mutations = [join(self.mutated_program_dir_name, m) for m in mutated_programs]
+        for attempt in range(Mutator.meta_mutant_compile_attempts):
+            program, included = harness.create_program(mutations, self.signed_zeros, self.early_exit)
+            if len(included) == 0:
+                return {}
+            f = open(join(working_dir, meta_program), "w+")
+            f.write(program)
+            f.close()
+            try:
+                compilation = self.compile_program(meta_program, meta_executable, working_dir, timeout=Mutator.meta_mutant_timeout, capture_output=True)
+            except subprocess.TimeoutExpired:
+                print("Meta-mutant compilation timed out.")
+                return {}
+            if compilation.returncode == 0:
+                break
+            error_lines = [int(l) for l in re.findall(rf"{re.escape(meta_program)}:(\d+):\d+: error", compilation.stderr)]
+            failed = harness.mutations_at_lines(error_lines)
+            if len(failed) == 0:
+                print(f"Meta-mutant failed to compile outside of the mutated functions:\n{compilation.stderr}")
+                return {}
+            print(f"{len(failed)} mutations do not compile in the meta-mutant. Leaving them out.")
+            mutations = [m for m in included if m not in failed]
+        else:
+            return {}
+
+        report_path = join(working_dir, MetaMutantHarness.report_filename)
+        if os.path.isfile(report_path):
+            os.remove(report_path)
+        _ts = os.path.join('..', test_suite)
+        try:
+            result = subprocess.call(f"./{meta_executable} {_ts} {meta_output_file}", shell=True, cwd=working_dir, timeout=Mutator.meta_mutant_timeout)
+        except subprocess.TimeoutExpired:
+            print("Meta-mutant timed out. Falling back to testing mutations one at a time.")
+            return {}
+        report = MetaMutantHarness.read_report(report_path, included)
+        if result < 0 or result > 128 or report is None:
+            print(f"Meta-mutant did not finish (exit code {result}). Falling back to testing mutations one at a time.")
+            return {}
+        kill_results = {}
+        for mutation in included:
+            kill_results[ProgramManipulator.extract_last_file_from_prog_path(mutation)] = report[mutation]
+            print(f"{'Test suite covers' if len(report[mutation]) > 0 else 'Not killed:'} {mutation} (meta-mutant)")
+        return kill_results
+
+    def kill_mutations_with_shared_objects(self, mutated_programs, test_suite):
+        """
+        Compiles the oracle and every mutation into shared objects and compares their results on the whole test suite in-process.
+        Returns:
+        dictionary of mutation to differing test rows. An empty dictionary if the function cannot be evaluated this way.
+        """
+        working_dir = self.working_dir_name
+        oracle_shared_object = "oracle.so"
+        for file in self.file_dependencies:
+            subprocess.call(f"cp {file} {working_dir}", shell=True, timeout=5)
+        try:
+            evaluator = SharedObjectEvaluator(self.program_name, self.function_name, self.path_to_fakeheaders, working_dir, self.compilation_pre_flags, self.compilation_info)
+        except Exception as e:
+            print(f"Could not parse {self.program_name} for shared object evaluation: {e}")
+            return {}
+        if not evaluator.supported():
+            print(f"Shared object evaluation does not support {self.function_name}. Falling back to testing mutations one at a time.")
+            return {}
+        evaluator.write_batch_source()
+
+        subprocess.call(f"cp {self.program_name} {working_dir}", shell=True, timeout=5)
+        if not evaluator.compile_shared_object(ProgramManipulator.extract_last_file_from_prog_path(self.program_name), oracle_shared_object):
+            print("Could not compile the oracle into a shared object.")
+            return {}
+        columns = evaluator.load_test_suite(test_suite)
+        num_rows = len(columns[0])
+        chunk_ends = [e for e in Mutator.early_exit_chunk_ends if e < num_rows] + [num_rows] if self.early_exit else [num_rows]
+        oracle_outputs = evaluator.evaluate(oracle_shared_object, columns)
+        if oracle_outputs is None:
+            print("Oracle shared object did not finish.")
+            return {}
+        print("Generated oracle outputs.")
+
+        for mutation in mutated_programs:
+            # -f replaces a read-only copy left by an earlier pass. A mutation that can not be copied fails to compile
+            # instead of compiling a stale copy.
+            if subprocess.call(f"cp -f {self.mutated_program_dir_name}/{mutation} {working_dir}", shell=True, timeout=5) != 0:
+                print(f"Could not copy {mutation} to {working_dir}")
+                subprocess.call(f"rm -f {mutation}", shell=True, cwd=working_dir, timeout=5)
+        pool = mp.Pool(self.num_processes)
+        compiled = pool.starmap(evaluator.compile_shared_object, [(m, f"{m}.so") for m in mutated_programs])
+        pool.close()
+        pool.join()
+
+        kill_results = {}
+        for mutation, mutation_compiled in zip(mutated_programs, compiled):
+            differing = numpy.array([], dtype=numpy.int64) if mutation_compiled else None
+            start = 0
+            for end in chunk_ends:
+                if differing is None or (self.early_exit and len(differing) > 0):
+                    break
+                mutation_outputs = evaluator.evaluate(f"{mutation}.so", [c[start:end] for c in columns])
+                if mutation_outputs is None:
+                    differing = None
+                else:
+                    differing = numpy.concatenate([differing, self.differing_rows(oracle_outputs[start:end], mutation_outputs, mutation) + start])
+                start = end
+            if differing is None:
+                print(f"Unuseful mutation {mutation}. Killing.")
+            elif len(differing) > 0:
+                print(f"Test suite covers {mutation}. Killing.")
+                differing = differing[:1] if self.early_exit else differing
+            else:
+                print(f"{mutation} has not been killed. No differentiating test case found.")
+            kill_results[mutation] = differing
+            subprocess.call(f"rm -f {mutation} {mutation}.so", shell=True, cwd=working_dir, timeout=5)
+        return kill_results
+
+    def write_kill_matrix(self, filename):
+        """
+        Saves the mutation x test row kill matrix of the last kill pass as a compressed .npz file.
+        Rows of kill_matrix are bit-packed (numpy.packbits along axis 1), one row per entry of mutations.
+        unattributed marks mutations that were killed without a test row, e.g. by failing to compile.
+        """
+        mutations = sorted(self.kill_rows)
+        matrix = numpy.zeros((len(mutations), self.num_test_rows), dtype=bool)
+        unattributed = numpy.zeros(len(mutations), dtype=bool)
+        for i, mutation in enumerate(mutations):
+            rows = self.kill_rows[mutation]
+            if rows is not None:
+                rows = rows[rows < self.num_test_rows]
+                matrix[i, rows] = True
+            unattributed[i] = Mutator.is_killed(self.kill_rows[mutation]) and (rows is None or len(rows) == 0)
+        numpy.savez_compressed(filename, mutations=numpy.array(mutations, dtype=str), kill_matrix=numpy.packbits(matrix, axis=1),
+                               num_rows=self.num_test_rows, unattributed=unattributed, early_exit=self.early_exit, test_suite=str(self.kill_test_suite))
+        print(f"Wrote kill matrix at: {filename}")
+        return filename
+
+    @staticmethod
+    def read_kill_matrix(filename):
+        """
+        Returns (mutations, boolean kill matrix, unattributed, test suite, early exit)
+        """
+        data = numpy.load(filename)
+        num_rows = int(data["num_rows"])
+        matrix = numpy.unpackbits(data["kill_matrix"], axis=1, count=num_rows).astype(bool)
+        return list(data["mutations"]), matrix, data["unattributed"], str(data["test_suite"]), bool(data["early_exit"])
+
+    def get_mutations(self):
+        """
+        Filenames (not paths) of all generated mutations.
+        If the mutations have been sampled, only the sampled ones.
+        If the mutations have been triaged, only the ones still to be tested: no equivalent mutations or duplicates.
+        """
+        mutated_programs = [f for f in os.listdir(self.mutated_program_dir_name) if isfile(join(self.mutated_program_dir_name, f))]
+        mutated_programs = sorted([m for m in mutated_programs if m.endswith(".c")])
+        sample = self.read_sample()
+        if sample is not None:
+            sampled = set(sample["sampled"])
+            mutated_programs = [m for m in mutated_programs if m in sampled]
+        triage = MutantTriage.read(self.mutated_program_dir_name)
+        if triage is not None:
+            mutated_programs = MutantTriage.representatives(triage, mutated_programs)
+        return mutated_programs
+
+    def triage_mutations(self):
+        """ Triages the generated mutations by the hash of their compiled code. Returns the statistics of the triage. """
+        triage = MutantTriage(self.program_name, self.function_name, self.mutated_program_dir_name, compilation_pre_flags=self.compilation_pre_flags, working_dir_name=self.working_dir_name, num_processes=self.num_processes)
+        return triage.run(self.get_mutations())
+
+    def get_kill_manifest_path(self):
+        return join(self.mutated_program_dir_name, Mutator.kill_manifest_filename)
+
+    def write_kill_manifest(self, kill_results, test_suite):
+        """
+        Records which mutations the last kill pass killed, so later stages only look at the survivors.
+        Args:
+        kill_results = dictionary of mutation filename to True if killed
+        """
+        manifest = {
+            "test_suite" : test_suite,
+            "mutations" : {m : {"killed" : kill_results[m]} for m in sorted(kill_results)}
+        }
+        f = open(self.get_kill_manifest_path(), "w+")
+        f.write(json.dumps(manifest, indent=4))
+        f.close()
+
+    def read_kill_manifest(self):
+        if not isfile(self.get_kill_manifest_path()):
+            return None
+        f = open(self.get_kill_manifest_path(), "r")
+        manifest = json.loads(f.read())
+        f.close()
+        return manifest
+
+    def get_survived_mutations(self):
+        """
+        Paths of the mutations that survived the last kill pass.
+        All mutations survive if no kill pass has been run on them yet.
+        """
+        manifest = self.read_kill_manifest()
+        mutations = self.get_mutations()
+        if manifest is not None:
+            mutations = [m for m in mutations if not manifest["mutations"].get(m, {"killed" : False})["killed"]]
+        return [join(self.mutated_program_dir_name, m) for m in mutations]
 
     @staticmethod
     def write_survived_outputs(surv, filename):
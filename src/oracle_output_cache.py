@@ -0,0 +1,134 @@
+# This component is a persistent cache of the oracle's outputs on test suites.
+# Outputs are stored as packed bit patterns (float32 when that is exact) in one .npz per (oracle build, test suite),
+# keyed by the hash of the oracle executable and the hash of the suite's rows. Every row of a suite is hashed on its own, so a suite that
+# starts with the rows of a cached one (e.g. an existing suite with generated inputs appended) reuses those
+# outputs and only the rows after the common prefix are run.
+import glob
+import hashlib
+import numpy
+import os
+from os.path import isfile, join
+
+
+class OracleOutputCache(object):
+
+    def __init__(self, cache_dir="oracle-cache"):
+        """
+        Args:
+        cache_dir = directory the outputs are stored in, one .npz per oracle executable and test suite
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_file(path):
+        h = hashlib.sha256()
+        f = open(path, "rb")
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+        f.close()
+        return h.hexdigest()
+
+    @staticmethod
+    def read_rows(test_suite):
+        """ Non-empty rows of a test suite, one output is printed per row. """
+        f = open(test_suite, "rb")
+        rows = [l for l in f.read().splitlines() if l.strip() != b""]
+        f.close()
+        return rows
+
+    @staticmethod
+    def row_digests(rows):
+        return numpy.array([int.from_bytes(hashlib.blake2b(r, digest_size=8).digest(), "little") for r in rows], dtype=numpy.uint64)
+
+    def entry_path(self, build_hash, digests):
+        return join(self.cache_dir, f"{build_hash}-{hashlib.sha256(digests.tobytes()).hexdigest()}.npz")
+
+    @staticmethod
+    def load(path):
+        """ (row digests, outputs) of a cache entry, None if it can not be read. """
+        try:
+            entry = numpy.load(path)
+            digests = entry["row_digests"]
+            outputs = entry["bits"].view(entry["packed_dtype"].item()).astype(entry["dtype"].item())
+            entry.close()
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(digests) != len(outputs):
+            return None
+        return digests, outputs
+
+    def lookup(self, build_hash, digests):
+        """
+        Cached outputs of the longest prefix of the rows with these digests, as (outputs, number of rows).
+        The whole suite if it is cached itself, otherwise the longest common prefix with any suite cached for this build.
+        """
+        exact = self.entry_path(build_hash, digests)
+        if isfile(exact):
+            entry = OracleOutputCache.load(exact)
+            if entry is not None:
+                return entry[1], len(digests)
+        best_outputs, best_rows = None, 0
+        for path in glob.glob(join(self.cache_dir, f"{build_hash}-*.npz")):
+            entry = OracleOutputCache.load(path)
+            if entry is None:
+                continue
+            cached_digests, outputs = entry
+            common = min(len(cached_digests), len(digests))
+            mismatches = numpy.flatnonzero(cached_digests[:common] != digests[:common])
+            rows = mismatches[0] if len(mismatches) > 0 else common
+            if rows > best_rows:
+                best_outputs, best_rows = outputs[:rows], rows
+        return best_outputs, best_rows
+
+    @staticmethod
+    def pack(outputs):
+        """ float32 bit patterns of float64 outputs if all of them convert back exactly (NaN payloads included), else the outputs. """
+        if outputs.dtype == numpy.float64:
+            packed = outputs.astype(numpy.float32)
+            if numpy.array_equal(packed.astype(numpy.float64).view(numpy.uint64), outputs.view(numpy.uint64)):
+                return packed
+        return outputs
+
+    def store(self, build_hash, digests, outputs):
+        outputs = numpy.ascontiguousarray(outputs)
+        packed = OracleOutputCache.pack(outputs)
+        path = self.entry_path(build_hash, digests)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        f = open(tmp_path, "wb")
+        numpy.savez(f, row_digests=digests, bits=packed.view(numpy.dtype(f"u{packed.dtype.itemsize}")), packed_dtype=numpy.array(packed.dtype.str), dtype=numpy.array(outputs.dtype.str))
+        f.close()
+        os.replace(tmp_path, path)
+
+    def get_outputs(self, oracle_executable, test_suite, run_suite, tail_suite):
+        """
+        Outputs of the oracle on test_suite, running it only on the rows that are not cached.
+        Args:
+        oracle_executable = path to the oracle executable, its hash identifies the build
+        run_suite = function running the oracle on a test suite file, returning its outputs as an array (or None if it failed)
+        tail_suite = file the uncached rows are written to when a prefix of the suite is cached
+        Returns (outputs, statistics), outputs is None if the oracle failed.
+        """
+        build_hash = OracleOutputCache.hash_file(oracle_executable)
+        rows = OracleOutputCache.read_rows(test_suite)
+        digests = OracleOutputCache.row_digests(rows)
+        cached, num_cached = self.lookup(build_hash, digests)
+        stats = {"num_rows" : len(rows), "rows_reused" : int(num_cached), "rows_run" : len(rows) - int(num_cached)}
+        if num_cached > 0 and num_cached == len(rows):
+            stats["status"] = "hit"
+            return cached, stats
+        if num_cached == 0:
+            stats["status"] = "miss"
+            outputs = run_suite(test_suite)
+        else:
+            stats["status"] = "prefix"
+            f = open(tail_suite, "wb")
+            f.write(b"\n".join(rows[num_cached:]) + b"\n")
+            f.close()
+            tail_outputs = run_suite(tail_suite)
+            os.remove(tail_suite)
+            outputs = numpy.concatenate([cached, tail_outputs.astype(cached.dtype)]) if tail_outputs is not None else None
+        # only complete outputs are cached, a short output means the oracle failed on a row
+        if outputs is not None and len(outputs) == len(rows):
+            self.store(build_hash, digests, outputs)
+        return outputs, stats
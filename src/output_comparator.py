@@ -0,0 +1,65 @@
+# This is a helper file to compare oracle and mutation outputs.
+# Outputs are parsed into NumPy arrays in bulk and compared vectorized, returning every row that differs.
+import numpy
+
+
+class OutputComparator(object):
+
+    @staticmethod
+    def parse_outputs(outputs):
+        """
+        Parses output lines (one hex float per line, as printed with %a) into a float64 array.
+        Arrays are returned as is, so callers may pass either.
+        """
+        if isinstance(outputs, numpy.ndarray):
+            return outputs
+        return numpy.fromiter(map(float.fromhex, outputs), dtype=numpy.float64, count=len(outputs))
+
+    @staticmethod
+    def read_outputs(output_filename):
+        f = open(output_filename, "r")
+        outputs = f.read().splitlines()
+        f.close()
+        return OutputComparator.parse_outputs([o for o in outputs if o.strip() != ""])
+
+    @staticmethod
+    def bits(values):
+        """ Reinterprets a floating point array as unsigned integers of the same width. """
+        return values.view(numpy.dtype(f"u{values.dtype.itemsize}"))
+
+    @staticmethod
+    def differing_rows(o1, o2, signed_zeros=False, nan_payloads=False):
+        """
+        Indices of all rows where the two outputs differ.
+        NaNs compare equal to each other, as do +0 and -0 unless signed_zeros is set.
+        With nan_payloads, NaNs must have identical bit patterns (sign and payload), which is only
+        meaningful for binary outputs since printed NaNs carry no payload.
+        Rows past the end of the shorter output always differ.
+        """
+        o1 = OutputComparator.parse_outputs(o1)
+        o2 = OutputComparator.parse_outputs(o2)
+        common = min(len(o1), len(o2))
+        a = o1[:common]
+        b = o2[:common]
+        if numpy.issubdtype(a.dtype, numpy.floating) and numpy.issubdtype(b.dtype, numpy.floating):
+            if a.dtype != b.dtype:
+                a = a.astype(numpy.float64)
+                b = b.astype(numpy.float64)
+            equal = a == b
+            both_nan = numpy.isnan(a) & numpy.isnan(b)
+            if nan_payloads:
+                equal = equal | (both_nan & (OutputComparator.bits(a) == OutputComparator.bits(b)))
+            else:
+                equal = equal | both_nan
+            if signed_zeros:
+                equal = equal & ~((a == 0) & (b == 0) & (numpy.signbit(a) != numpy.signbit(b)))
+        else:
+            equal = a == b
+        differing = numpy.flatnonzero(~equal)
+        if len(o1) != len(o2):
+            differing = numpy.concatenate([differing, numpy.arange(common, max(len(o1), len(o2)))])
+        return differing
+
+    @staticmethod
+    def outputs_equal(o1, o2, signed_zeros=False, nan_payloads=False):
+        return len(OutputComparator.differing_rows(o1, o2, signed_zeros, nan_payloads)) == 0
@@ -5,14 +5,19 @@ sys.path.append('../')
 sys.path.extend(['.', '..'])
 
 try:
-    from pycparser.pycparser import parse_file, c_generator, c_ast, c_parser
+    from pycparser.pycparser import parse_file, preprocess_file, c_generator, c_ast, c_parser
 except:
-    from pycparser import parse_file, c_generator, c_ast, c_parser
+    from pycparser import parse_file, preprocess_file, c_generator, c_ast, c_parser
 import os
+import hashlib
+import pickle
+from collections import OrderedDict
 import tempfile
 import random
 import string
 import pathlib
+import json
+import mmap
 from os.path import isfile, join
 
 
@@ -23,8 +28,108 @@ class FuncDefVisitor(c_ast.NodeVisitor):
     def visit_FuncDef(self, node):
         self.bodies.append(node)
 
+class ParseCache(object):
+    """
+    Content-addressed cache of preprocessed program text and parsed ASTs, so identical programs are only parsed once.
+    Preprocessed text is keyed by the program's contents and the preprocessor arguments, and kept in memory only,
+    since it depends on headers that are not part of the key.
+    ASTs are keyed by the preprocessed text itself, kept pickled in memory with LRU eviction and optionally on disk.
+    """
+
+    def __init__(self, max_entries=64, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        self.preprocessed = OrderedDict()
+        self.asts = OrderedDict()
+        # function_parses and function_fallbacks count MutantSet extractions from a parse of the mutated function alone
+        # and from a full parse of the mutated program
+        self.counts = {"preprocess_hits" : 0, "preprocess_misses" : 0, "memory_hits" : 0, "disk_hits" : 0, "parse_misses" : 0, "function_parses" : 0, "function_fallbacks" : 0}
+
+    @staticmethod
+    def hash(*parts):
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def remember(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def preprocess(self, filename, cpp_path, cpp_args):
+        contents = open(filename, "r").read()
+        key = ParseCache.hash(os.path.abspath(filename), contents, cpp_path, *cpp_args)
+        if key in self.preprocessed:
+            self.counts["preprocess_hits"] += 1
+            self.preprocessed.move_to_end(key)
+            return self.preprocessed[key]
+        self.counts["preprocess_misses"] += 1
+        text = preprocess_file(filename, cpp_path=cpp_path, cpp_args=cpp_args)
+        self.remember(self.preprocessed, key, text)
+        return text
+
+    def parse(self, text, filename):
+        """
+        Returns a fresh copy of the AST of the preprocessed text, so callers may modify it.
+        """
+        key = ParseCache.hash(text)
+        if key in self.asts:
+            self.counts["memory_hits"] += 1
+            self.asts.move_to_end(key)
+            return pickle.loads(self.asts[key])
+        disk_path = os.path.join(self.cache_dir, f"{key}.pickle") if self.cache_dir is not None else None
+        if disk_path is not None and os.path.isfile(disk_path):
+            try:
+                pickled = open(disk_path, "rb").read()
+                ast = pickle.loads(pickled)
+                self.counts["disk_hits"] += 1
+                self.remember(self.asts, key, pickled)
+                return ast
+            except Exception as e:
+                print(f"Ignoring unreadable parse cache entry {disk_path}: {e}")
+        self.counts["parse_misses"] += 1
+        ast = c_parser.CParser().parse(text, filename)
+        # pickling recurses per AST level. Deep ASTs are not cached rather than raising the process-wide recursion limit.
+        try:
+            pickled = pickle.dumps(ast, protocol=pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            print(f"AST of {filename} is too deep to cache.")
+            return ast
+        self.remember(self.asts, key, pickled)
+        if disk_path is not None:
+            tmp_path = f"{disk_path}.{os.getpid()}.tmp"
+            f = open(tmp_path, "wb")
+            f.write(pickled)
+            f.close()
+            os.replace(tmp_path, disk_path)
+        return ast
+
+    def merge(self, counts):
+        """ Adds the counts of another process's cache, e.g. of a pool worker. """
+        for k in counts:
+            self.counts[k] = self.counts.get(k, 0) + counts[k]
+
+    def stats(self):
+        parses = self.counts["memory_hits"] + self.counts["disk_hits"] + self.counts["parse_misses"]
+        preprocesses = self.counts["preprocess_hits"] + self.counts["preprocess_misses"]
+        stats = dict(self.counts)
+        stats["parse_hit_rate"] = (self.counts["memory_hits"] + self.counts["disk_hits"]) / parses if parses > 0 else 0.0
+        stats["preprocess_hit_rate"] = self.counts["preprocess_hits"] / preprocesses if preprocesses > 0 else 0.0
+        functions = self.counts["function_parses"] + self.counts["function_fallbacks"]
+        stats["function_parse_rate"] = self.counts["function_parses"] / functions if functions > 0 else 0.0
+        return stats
+
+
 class ProgramManipulator(object):
 
+    # shared by all manipulators in a process, see configure_parse_cache
+    parse_cache = ParseCache()
+
     def __init__(self, program, path_to_fakeheaders, other_headers=[]):
         self.program_filename  = program
 
@@ -70,9 +175,27 @@ class ProgramManipulator(object):
         include_lines = [l for l in lines if "#include" in l]
         return include_lines
 
+    @staticmethod
+    def configure_parse_cache(max_entries=64, cache_dir=None):
+        """ Replaces the shared parse cache, e.g. to keep parsed ASTs on disk across runs. """
+        ProgramManipulator.parse_cache = ParseCache(max_entries=max_entries, cache_dir=cache_dir)
+
+    @staticmethod
+    def call_counting_parses(function, *args):
+        """
+        Calls function and returns (its result, the shared parse cache's counts during the call).
+        Pool workers have their own copy of the cache, so their tasks run through this and the parent
+        adds the counts with ProgramManipulator.parse_cache.merge.
+        """
+        before = dict(ProgramManipulator.parse_cache.counts)
+        result = function(*args)
+        counts = ProgramManipulator.parse_cache.counts
+        return result, {k : counts[k] - before.get(k, 0) for k in counts}
+
     def parse_program(self, path_to_fakeheaders):
         try:
-            ast = parse_file(self.program_filename, use_cpp=True, cpp_path=self.cpp_path, cpp_args=self.cpp_args)
+            text = ProgramManipulator.parse_cache.preprocess(self.program_filename, self.cpp_path, self.cpp_args)
+            ast = ProgramManipulator.parse_cache.parse(text, self.program_filename)
             return ast
         except Exception as e:
             raise(e)
@@ -182,7 +305,8 @@ class ProgramManipulator(object):
     def create_string_from_program(self):
         function_bodies = [self.get_function(self.get_function_name(body)) for body in self.function_nodes]
         #print(f"Length of function bodies: {len(function_bodies)}")
-        function_bodies = set(function_bodies)
+        # remove duplicates, keeping program order
+        function_bodies = dict.fromkeys(function_bodies)
         #print(f"Length of function bodies: {len(function_bodies)}")
         program = ""
         program += "".join(self.all_includes)
@@ -228,6 +352,102 @@ class ProgramManipulator(object):
 
 
 
+
+class FunctionChunkStore(object):
+    """
+    Read-only rendering of a program: its includes followed by the generated source of every function, in program order.
+    Programs with one function replaced are stitched together from the surrounding text instead of being generated
+    from the AST again. The text can be saved to a file and memory-mapped, so worker processes share one copy.
+    """
+
+    def __init__(self, data, index, filename=None):
+        """
+        Args:
+        data = program text as bytes (or a memory map of it)
+        index = {"header" : [start, end], "functions" : {name : [start, end]}}, byte offsets into data
+        filename = file data is mapped from, if any
+        """
+        self.data = data
+        self.index = index
+        self.filename = filename
+
+    @staticmethod
+    def from_program_manipulator(pm):
+        """ Renders every function of pm once, the same way create_string_from_program does. """
+        generator = c_generator.CGenerator()
+        chunks = OrderedDict()
+        for node in pm.function_nodes:
+            # only the first function of a name is rendered, as in create_string_from_program
+            if node.decl.name not in chunks:
+                chunks[node.decl.name] = generator.visit(node).encode()
+        header = "".join(pm.all_includes).encode()
+        data = header
+        index = {"header" : [0, len(header)], "functions" : {}}
+        for name in chunks:
+            index["functions"][name] = [len(data), len(data) + len(chunks[name])]
+            data += chunks[name]
+        return FunctionChunkStore(data, index)
+
+    def save(self, filename):
+        """
+        Writes the text to filename and the index to filename.json.
+        Both are replaced rather than overwritten, so processes that mapped an earlier store keep reading it.
+        """
+        f = open(f"{filename}.{os.getpid()}.tmp", "wb")
+        f.write(self.data)
+        f.close()
+        os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+        f = open(f"{filename}.json.{os.getpid()}.tmp", "w+")
+        f.write(json.dumps(self.index))
+        f.close()
+        os.replace(f"{filename}.json.{os.getpid()}.tmp", f"{filename}.json")
+
+    @staticmethod
+    def load(filename):
+        f = open(filename, "rb")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+        index = json.loads(open(f"{filename}.json", "r").read())
+        return FunctionChunkStore(data, index, filename=filename)
+
+    def __getstate__(self):
+        # a mapped store is sent to other processes by filename only
+        if self.filename is not None:
+            return {"filename" : self.filename}
+        return {"data" : self.data, "index" : self.index}
+
+    def __setstate__(self, state):
+        if "filename" in state:
+            loaded = FunctionChunkStore.load(state["filename"])
+            state = {"data" : loaded.data, "index" : loaded.index, "filename" : state["filename"]}
+        self.data = state["data"]
+        self.index = state["index"]
+        self.filename = state.get("filename")
+
+    def get_function(self, function_name):
+        """ Generated source of the function, the same as ProgramManipulator.get_function. None if it does not exist. """
+        if function_name not in self.index["functions"]:
+            return None
+        start, end = self.index["functions"][function_name]
+        return self.data[start:end].decode()
+
+    def get_header(self):
+        """ Include lines the program starts with. """
+        start, end = self.index["header"]
+        return self.data[start:end].decode()
+
+    def create_string_from_program(self):
+        return self.data[:].decode()
+
+    def create_string_with_function(self, function_name, new_function):
+        """
+        Program text with the source of function_name replaced by new_function (a string).
+        """
+        if function_name not in self.index["functions"]:
+            raise Exception(f"Cannot find function {function_name} in chunk store.")
+        start, end = self.index["functions"][function_name]
+        return (self.data[:start] + new_function.encode() + self.data[end:]).decode()
+
 if __name__ == "__main__":
     sys.path.extend(['.', '..'])
     # oracle_program, function_name, survived_mutations, checker
@@ -0,0 +1,123 @@
+# This component builds mutated instruction binaries without recompiling all of ptxc.c for every mutation.
+# The parts of ptxc.c a mutation does not touch are compiled once per instruction into a static library together
+# with testutils.c. Each mutation then only compiles its own execute_<insn> translation unit and links against it.
+# Every mutation is built under its own paths, so builds can run in parallel.
+import multiprocessing as mp
+import os
+import subprocess
+from cpu_budget import CPUBudget
+
+
+class PtxcBuilder(object):
+
+    library_timeout = 600
+    mutant_timeout = 60
+
+    def __init__(self, ptxc_chunks, path_to_ptx_semantics, build_dir="ptxc-build", cflags="-g -O3", libs="-lm", num_processes=None):
+        """
+        Args:
+        ptxc_chunks = FunctionChunkStore of ptxc.c
+        path_to_ptx_semantics = directory containing c/ptxc.c, c/testutils.c and the instruction test programs
+        build_dir = directory for objects and libraries. testutils.o is shared by all instructions built in it.
+        """
+        self.ptxc_chunks = ptxc_chunks
+        self.c_dir = os.path.abspath(os.path.join(path_to_ptx_semantics, "c"))
+        self.build_dir = os.path.abspath(build_dir)
+        self.cflags = cflags
+        self.libs = libs
+        self.num_processes = num_processes if num_processes is not None else mp.cpu_count()
+        os.makedirs(self.build_dir, exist_ok=True)
+
+    def compile(self, source, output, flags="-c", timeout=None, libs=""):
+        """ Returns True if gcc succeeded. Compiles to a temporary file first, so concurrent builds never see partial outputs. """
+        tmp_output = f"{output}.{os.getpid()}.tmp"
+        try:
+            with CPUBudget.token():
+                result = subprocess.run(f"gcc {self.cflags} -I{self.c_dir} {flags} {source} {libs} -o {tmp_output}", shell=True, timeout=timeout, capture_output=True, text=True)
+        except subprocess.TimeoutExpired:
+            return False
+        if result.returncode != 0:
+            print(f"Could not compile {source}: {result.stderr}")
+            if os.path.isfile(tmp_output):
+                os.remove(tmp_output)
+            return False
+        os.replace(tmp_output, output)
+        return True
+
+    @staticmethod
+    def prototype(function_source):
+        return function_source[:function_source.index("{")].strip() + ";\n"
+
+    def insn_dir(self, insn):
+        return os.path.join(self.build_dir, insn)
+
+    def prepare(self, insn, function_name):
+        """
+        Compiles everything a mutation of function_name is linked against: the instruction's test program,
+        testutils.c, and ptxc.c with function_name replaced by its prototype.
+        Returns True if all of it compiled.
+        """
+        insn_dir = self.insn_dir(insn)
+        os.makedirs(insn_dir, exist_ok=True)
+        testutils_object = os.path.join(self.build_dir, "testutils.o")
+        if not os.path.isfile(testutils_object) and not self.compile(os.path.join(self.c_dir, "testutils.c"), testutils_object, timeout=PtxcBuilder.library_timeout):
+            return False
+        if not self.compile(os.path.join(self.c_dir, f"{insn}.c"), os.path.join(insn_dir, f"{insn}.o"), timeout=PtxcBuilder.library_timeout):
+            return False
+        rest_source = os.path.join(insn_dir, "ptxc_rest.c")
+        f = open(rest_source, "w+")
+        f.write(self.ptxc_chunks.create_string_with_function(function_name, PtxcBuilder.prototype(self.ptxc_chunks.get_function(function_name))))
+        f.close()
+        rest_object = os.path.join(insn_dir, "ptxc_rest.o")
+        if not self.compile(rest_source, rest_object, timeout=PtxcBuilder.library_timeout):
+            return False
+        result = subprocess.call(f"ar rcs libptxc_rest.a ptxc_rest.o {testutils_object}", shell=True, cwd=insn_dir)
+        return result == 0
+
+    def build(self, insn, function_name, function_source, name, output):
+        """
+        Builds the instruction's test program with function_source in place of function_name into output.
+        Falls back to compiling all of ptxc.c with the function stitched in if the function does not compile on its own,
+        e.g. because it calls static helpers of ptxc.c.
+        Returns True if output was built.
+        """
+        insn_dir = self.insn_dir(insn)
+        source = os.path.join(insn_dir, f"{name}.c")
+        f = open(source, "w+")
+        f.write(self.ptxc_chunks.get_header() + "\n" + function_source)
+        f.close()
+        mutant_object = os.path.join(insn_dir, f"{name}.o")
+        insn_object = os.path.join(insn_dir, f"{insn}.o")
+        if self.compile(source, mutant_object, timeout=PtxcBuilder.mutant_timeout):
+            built = self.compile(f"{insn_object} {mutant_object} {os.path.join(insn_dir, 'libptxc_rest.a')}", output, flags="", timeout=PtxcBuilder.mutant_timeout, libs=self.libs)
+        else:
+            f = open(source, "w+")
+            f.write(self.ptxc_chunks.create_string_with_function(function_name, function_source))
+            f.close()
+            built = self.compile(f"{insn_object} {source} {os.path.join(self.build_dir, 'testutils.o')}", output, flags="", timeout=PtxcBuilder.library_timeout, libs=self.libs)
+        for intermediate in [source, mutant_object]:
+            if os.path.isfile(intermediate):
+                os.remove(intermediate)
+        return built
+
+    def build_all(self, insn, function_name, mutated_functions, output_dir):
+        """
+        Builds the oracle and every mutation in parallel.
+        Args:
+        mutated_functions = dictionary of name to mutated function source
+        output_dir = directory the mutated binaries are written to, as <insn>_<name>.exe. The oracle is built in the build directory.
+        Returns:
+        (path to the oracle binary, list of paths to the mutated binaries that were built)
+        """
+        if not self.prepare(insn, function_name):
+            raise Exception(f"Could not compile ptxc.c without {function_name}.")
+        os.makedirs(output_dir, exist_ok=True)
+        oracle_binary = os.path.join(self.insn_dir(insn), f"{insn}_oracle.exe")
+        if not self.build(insn, function_name, self.ptxc_chunks.get_function(function_name), "oracle", oracle_binary):
+            raise Exception(f"Could not build the oracle binary of {insn}.")
+        names = sorted(mutated_functions)
+        outputs = [os.path.join(output_dir, f"{insn}_{name}.exe") for name in names]
+        with mp.Pool(self.num_processes) as pool:
+            built = pool.starmap(self.build, [(insn, function_name, mutated_functions[name], name, output) for name, output in zip(names, outputs)])
+        print(f"Built {sum(built)} of {len(names)} mutated binaries for {insn}")
+        return oracle_binary, [o for o, b in zip(outputs, built) if b]
@@ -0,0 +1,79 @@
+# This component is an append-only journal of pipeline progress, one JSON record per line.
+# Every finished stage of an instruction (mutation, kill, cbmc, rekill) and every finished instruction is recorded,
+# so an interrupted sweep can be resumed: finished instructions are skipped and the others restart at their first
+# stage without a record.
+import json
+import os
+import time
+
+
+class RunJournal(object):
+
+    stages = ["mutation", "kill", "cbmc", "rekill", "done"]
+
+    def __init__(self, journal_filename="run_journal.jsonl", resume=False):
+        """
+        Args:
+        journal_filename = path to the journal. Records are only ever appended to it.
+        resume = if True, continue the last run in the journal. Otherwise a new run is started.
+        """
+        self.journal_filename = journal_filename
+        self.resume = resume
+        # key -> stage -> data of the run being continued
+        self.completed_stages = {}
+        RunJournal.terminate_last_line(journal_filename)
+        if resume:
+            self.completed_stages = RunJournal.read_last_run(journal_filename)
+        else:
+            self.append({"run_start" : time.time()})
+
+    @staticmethod
+    def terminate_last_line(journal_filename):
+        """ Ends a line cut short by a crash, so the next record starts on a line of its own. """
+        if not os.path.isfile(journal_filename) or os.path.getsize(journal_filename) == 0:
+            return
+        f = open(journal_filename, "rb+")
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+        f.close()
+
+    @staticmethod
+    def read_last_run(journal_filename):
+        completed_stages = {}
+        if not os.path.isfile(journal_filename):
+            return completed_stages
+        for line in open(journal_filename, "r").readlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # the last line may be cut short by a crash
+                continue
+            if "run_start" in record:
+                completed_stages = {}
+            elif record.get("stage") in RunJournal.stages:
+                completed_stages.setdefault(record["key"], {})[record["stage"]] = record["data"]
+        return completed_stages
+
+    def append(self, record):
+        # a single write of a whole line to a file opened for appending, so processes can share the journal
+        line = (json.dumps(record) + "\n").encode()
+        fd = os.open(self.journal_filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def record(self, key, stage, data):
+        if stage not in RunJournal.stages:
+            raise Exception(f"Unknown stage {stage}. Choose from {RunJournal.stages}.")
+        self.completed_stages.setdefault(key, {})[stage] = data
+        self.append({"key" : key, "stage" : stage, "time" : time.time(), "data" : data})
+
+    def completed(self, key, stage):
+        """ Data recorded for the stage of key, or None if it has not been completed. """
+        return self.completed_stages.get(key, {}).get(stage)
+
+    def is_done(self, key):
+        return self.completed(key, "done") is not None
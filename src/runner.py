@@ -9,6 +9,8 @@ import shutil
 from mutator import Mutator
 from equivalence_checker_cbmc import EquivalenceChecker
 from program_manipulation import ProgramManipulator 
+from suite_minimizer import SuiteMinimizer
+from fuzz_prefilter import FuzzPrefilter
 
 
 def copy_dependencies(dstdir, file_dependencies):
@@ -17,52 +19,152 @@ def copy_dependencies(dstdir, file_dependencies):
         if not os.path.exists(dst):
             shutil.copyfile(f, dst)
 
-def L1_runner(oracle_program, func_name, test_suite, mutation_directory, compilation_info, solver, new_input_filename, music_exec, fakeheader_path, working_dir_name="working_directory/",  file_dependencies=[], pre_compile_flags=None,binary_folder=None, oracle_binary=None, equivalence_on_all_mutations=False):
+def L1_runner(oracle_program, func_name, test_suite, mutation_directory, compilation_info, solver, new_input_filename, music_exec, fakeheader_path, working_dir_name="working_directory/",  file_dependencies=[], pre_compile_flags=None,binary_folder=None, oracle_binary=None, equivalence_on_all_mutations=False, cbmc_cache_dir=None, kill_mode="per_mutant", early_exit=False, minimize_suite=None, analysis_dir="analysis", num_processes=None, journal=None, journal_key=None, build_cache_dir=None, cbmc_timeout=None, cbmc_max_rss=None, fuzz_prefilter=False, cbmc_batch_size=1, engine="cbmc", counterexamples_per_mutant=1, diversity_budget=60, triage=False, mutation_operators=None, sample_size=None, sample_strata="operator", sample_seed=0, mutant_store_dir=None, oracle_cache_dir=None, incremental_rekill=False):
+    """
+    journal = optional RunJournal. Every finished stage is recorded in it, and stages it already holds
+              for journal_key (defaults to the oracle program's filename) are skipped if their files are still on disk.
+    """
     run_data = {}
-    M = Mutator(oracle_program, func_name, mutation_directory, compilation_info=compilation_info, compilation_pre_flags=pre_compile_flags, MUSIC_executable=music_exec, working_dir_name=working_dir_name, file_dependencies=file_dependencies)
+    M = Mutator(oracle_program, func_name, mutation_directory, compilation_info=compilation_info, compilation_pre_flags=pre_compile_flags, MUSIC_executable=music_exec, working_dir_name=working_dir_name, file_dependencies=file_dependencies, path_to_fakeheaders=fakeheader_path, kill_mode=kill_mode, early_exit=early_exit, num_processes=num_processes, build_cache_dir=build_cache_dir, mutation_operators=mutation_operators, sample_size=sample_size, sample_strata=sample_strata, sample_seed=sample_seed, mutant_store_dir=mutant_store_dir, oracle_cache_dir=oracle_cache_dir)
+    journal_key = journal_key if journal_key is not None else ProgramManipulator.extract_last_file_from_prog_path(oracle_program)
+    # a stage is only skipped if all stages before it were skipped as well
+    resuming = journal is not None
+
+    def completed(stage, still_valid):
+        nonlocal resuming
+        data = journal.completed(journal_key, stage) if resuming else None
+        if data is not None and still_valid(data):
+            print(f"Resuming {journal_key}: skipping {stage} stage")
+            return data
+        resuming = False
+        return None
+
+    def record(stage, data):
+        if journal is not None:
+            journal.record(journal_key, stage, data)
 
     if binary_folder is None:
-        M.generate_mutations()
+        mutation_data = completed("mutation", lambda d: os.path.isdir(mutation_directory) and len(M.get_mutations()) == d["num_mutations"])
+        if mutation_data is None:
+            M.generate_mutations()
+            mutation_data = {}
+            if M.generation_data is not None:
+                mutation_data["generation"] = M.generation_data
+            if M.sample_data is not None:
+                mutation_data["sample"] = M.sample_data
+            if triage:
+                copy_dependencies(working_dir_name, file_dependencies)
+                mutation_data["triage"] = M.triage_mutations()
+            mutation_data["num_mutations"] = len(M.get_mutations())
+            record("mutation", mutation_data)
+        if "generation" in mutation_data:
+            run_data["mutant_generation"] = mutation_data["generation"]
+        if "sample" in mutation_data:
+            run_data["sample"] = mutation_data["sample"]
+        if "triage" in mutation_data:
+            run_data["triage"] = mutation_data["triage"]
     if test_suite is not None and not equivalence_on_all_mutations:
-        time_ran, total_mutations, mutations_killed = M.kill_mutations(test_suite, oracle_binary, binary_folder)
-        mutator_pass1_data = {
-                "wall_time" : time_ran,
-                "total_mutations" : total_mutations,
-                "mutations_killed" : mutations_killed,
-                "existing_test_suite_name" : test_suite
-        }
+        def kill_pass_valid(d):
+            if binary_folder is not None:
+                return True
+            manifest = M.read_kill_manifest()
+            return manifest is not None and manifest["test_suite"] == test_suite and os.path.isfile(d["kill_matrix"])
+        mutator_pass1_data = completed("kill", kill_pass_valid)
+        if mutator_pass1_data is None:
+            time_ran, total_mutations, mutations_killed = M.kill_mutations(test_suite, oracle_binary, binary_folder)
+            mutator_pass1_data = {
+                    "wall_time" : time_ran,
+                    "total_mutations" : total_mutations,
+                    "mutations_killed" : mutations_killed,
+                    "existing_test_suite_name" : test_suite
+            }
+            if M.oracle_output_data is not None:
+                mutator_pass1_data["oracle_outputs"] = M.oracle_output_data
+            if M.build_cache_data is not None:
+                mutator_pass1_data["build_cache"] = M.build_cache_data
+            if binary_folder is None:
+                mutator_pass1_data["kill_matrix"] = M.write_kill_matrix(kill_matrix_filename(oracle_program, "existing"))
+            record("kill", mutator_pass1_data)
         run_data["mutator_pass_on_existing"] = mutator_pass1_data
     else:
         print(f"Creating a test suite for all generated mutations")
-        M.generate_mutations()
 
     copy_dependencies(working_dir_name, file_dependencies)
 
-    EQC = EquivalenceChecker(oracle_program, func_name, mutation_directory, test_suite, new_input_filename=new_input_filename, backend=solver, path_to_fakeheaders=fakeheader_path, working_directory=working_dir_name)
-    time_ran, tests_original, tests_pre_dd, tests_pos_dd = EQC.runner()
-    eqc_data = {
-        "wall_time" : time_ran,
-        "num_tests_original": tests_original,
-        "num_tests_gen_pre_dd" : tests_pre_dd,
-        "num_tests_gen_post_dd" : tests_pos_dd,
-        "suite_filename" : new_input_filename
-    }
+    eqc_data = completed("cbmc", lambda d: new_input_filename is not None and os.path.isfile(new_input_filename))
+    if eqc_data is None:
+        # only the survivors of the kill pass need a counterexample
+        if equivalence_on_all_mutations:
+            survived_mutations = [os.path.join(mutation_directory, m) for m in M.get_mutations()]
+        else:
+            survived_mutations = M.get_survived_mutations()
+        # cheap fuzzing first, only the mutations it cannot kill go to CBMC
+        fuzz_results = []
+        fuzz_data = None
+        if fuzz_prefilter and binary_folder is None:
+            counterexamples, fuzz_data = FuzzPrefilter(M).run(survived_mutations, f"fuzz_inputs_{ProgramManipulator.extract_last_file_from_prog_path(oracle_program)}.ssv")
+            fuzz_results = [[counterexamples[m], m, "fuzz"] for m in survived_mutations if m in counterexamples]
+            survived_mutations = [m for m in survived_mutations if m not in counterexamples]
+        EQC = EquivalenceChecker(oracle_program, func_name, survived_mutations, test_suite, new_input_filename=new_input_filename, backend=solver, path_to_fakeheaders=fakeheader_path, working_directory=working_dir_name, cache_dir=cbmc_cache_dir, analysis_dir=analysis_dir, num_processes=num_processes, cbmc_timeout=cbmc_timeout, cbmc_max_rss=cbmc_max_rss, batch_size=cbmc_batch_size, engine=engine, counterexamples_per_mutant=counterexamples_per_mutant, diversity_budget=diversity_budget)
+        time_ran, tests_original, tests_pre_dd, tests_pos_dd = EQC.runner(extra_results=fuzz_results)
+        eqc_data = {
+            "wall_time" : time_ran,
+            "num_tests_original": tests_original,
+            "num_tests_gen_pre_dd" : tests_pre_dd,
+            "num_tests_gen_post_dd" : tests_pos_dd,
+            "num_mutations_checked" : EQC.num_mutations_checked,
+            "suite_filename" : new_input_filename
+        }
+        if EQC.cache_stats is not None:
+            eqc_data["cbmc_cache"] = EQC.cache_stats
+        if EQC.scheduler_stats is not None:
+            eqc_data["cbmc_scheduler"] = EQC.scheduler_stats
+        if EQC.batch_stats is not None:
+            eqc_data["cbmc_batches"] = EQC.batch_stats
+        if EQC.smt_stats is not None:
+            eqc_data["smt_engine"] = EQC.smt_stats
+        if EQC.diversity_stats is not None:
+            eqc_data["diversity"] = EQC.diversity_stats
+        if fuzz_data is not None:
+            eqc_data["fuzz_prefilter"] = fuzz_data
+        record("cbmc", eqc_data)
     run_data["equivalence_checker"] = eqc_data
-    print("Now will test newly generated inputs for mutation kill score.")
-    if binary_folder is None:
-        M.generate_mutations()
-
-    time_ran, total_mutations, mutations_killed = M.kill_mutations(new_input_filename, binary_folder=binary_folder)
-    mutator_pass2_data = {
-                "wall_time" : time_ran,
-                "total_mutations" : total_mutations,
-                "mutations_killed" : mutations_killed,
-                "new_test_suite_name" : new_input_filename
-    }
+    mutator_pass2_data = completed("rekill", lambda d: binary_folder is not None or os.path.isfile(d["kill_matrix"]))
+    if mutator_pass2_data is None:
+        print("Now will test newly generated inputs for mutation kill score.")
+        counterexample_rows = EquivalenceChecker.read_counterexample_rows(new_input_filename) if incremental_rekill else None
+        if counterexample_rows is not None and binary_folder is None and test_suite is not None and not equivalence_on_all_mutations:
+            # the new suite starts with the existing one, only its generated rows are run on the survivors
+            time_ran, total_mutations, mutations_killed = M.kill_new_rows(new_input_filename, counterexample_rows["first_new_row"], previous_kill_matrix=mutator_pass1_data.get("kill_matrix"), counterexample_rows=counterexample_rows["counterexample_rows"])
+        else:
+            time_ran, total_mutations, mutations_killed = M.kill_mutations(new_input_filename, oracle_binary=oracle_binary, binary_folder=binary_folder)
+        mutator_pass2_data = {
+                    "wall_time" : time_ran,
+                    "total_mutations" : total_mutations,
+                    "mutations_killed" : mutations_killed,
+                    "new_test_suite_name" : new_input_filename
+        }
+        if M.oracle_output_data is not None:
+            mutator_pass2_data["oracle_outputs"] = M.oracle_output_data
+        if M.build_cache_data is not None:
+            mutator_pass2_data["build_cache"] = M.build_cache_data
+        if M.incremental_data is not None:
+            mutator_pass2_data["incremental"] = M.incremental_data
+        if binary_folder is None:
+            mutator_pass2_data["kill_matrix"] = M.write_kill_matrix(kill_matrix_filename(oracle_program, "new"))
+        record("rekill", mutator_pass2_data)
     run_data["mutator_pass_on_new"] = mutator_pass2_data
+    run_data["parse_cache"] = ProgramManipulator.parse_cache.stats()
+    if minimize_suite is not None and binary_folder is None:
+        minimizer = SuiteMinimizer(mutator_pass2_data["kill_matrix"], new_input_filename, method=minimize_suite)
+        run_data["suite_minimization"] = minimizer.minimize(f"{new_input_filename}.min.ssv", mutator=M)
     write_run_data(run_data, oracle_program)
+    record("done", run_data)
     return run_data
 
+def kill_matrix_filename(oracle_program, pass_name):
+    return f"kill_matrix_{pass_name}_{ProgramManipulator.extract_last_file_from_prog_path(oracle_program)}.npz"
+
 def write_run_data(run_data, oracle_program):
     json_data = json.dumps(run_data)
     f = open(f"output_{ProgramManipulator.extract_last_file_from_prog_path(oracle_program)}.json", "w+")
@@ -102,6 +204,27 @@ def set_up_argparse():
     parser.add_argument("--path-to-MUSIC", help="Specifiy path to MUSIC executable.")
     parser.add_argument("--path-to-fakeheaders", help="Specify a path to fake standard header files.")
     parser.add_argument("--path-to-mutated-binaries", help="Specify a path to executables of all the mutation files")
+    parser.add_argument("--kill-mode", choices=Mutator.kill_modes, default="per_mutant", help="How mutations are tested: one executable each, one meta-mutant program, or in-process shared objects.")
+    parser.add_argument("--early-exit", action="store_true", help="Stop testing a mutation at its first differing test row. The kill matrix then records only that row.")
+    parser.add_argument("--minimize-suite", choices=SuiteMinimizer.methods, help="Write a minimized copy of the new test suite that kills the same mutations.")
+    parser.add_argument("--parse-cache-dir", help="Directory to keep parsed program ASTs in across runs. Only cached in memory if not given.")
+    parser.add_argument("--build-cache-dir", help="Directory of the persistent cache of compiled executables. Everything is compiled if not given.")
+    parser.add_argument("--fuzz-prefilter", action="store_true", help="Fuzz surviving mutations with generated edge case inputs before running CBMC on the rest.")
+    parser.add_argument("--cbmc-timeout", type=float, help="Seconds one CBMC run may take before it is killed and retried with another backend.")
+    parser.add_argument("--cbmc-max-rss", type=int, help="Megabytes of memory one CBMC run may use before it is killed.")
+    parser.add_argument("--engine", choices=["cbmc", "smt"], default="cbmc", help="Equivalence checking engine. smt checks mutations against one SMT encoding of the oracle on long-lived z3 processes.")
+    parser.add_argument("--counterexamples-per-mutant", type=int, default=1, help="Number of distinct counterexamples looked for per mutation, in different float classes first.")
+    parser.add_argument("--diversity-budget", type=float, default=60, help="Seconds of solver time per mutation spent on counterexamples after the first.")
+    parser.add_argument("--triage", action="store_true", help="Hash the -O2 code of every mutation first. Mutations with the oracle's code are equivalent, and of mutations with the same code only one is tested.")
+    parser.add_argument("--incremental-rekill", action="store_true", help="After CBMC, only run the surviving mutations on the generated rows of the new suite, each on its own counterexample first with --early-exit.")
+    parser.add_argument("--oracle-cache-dir", help="Directory of the persistent cache of oracle outputs per test suite. The oracle runs on every kill pass if not given.")
+    parser.add_argument("--mutant-store-dir", help="Directory of the content-addressed store of generated mutations. MUSIC runs on every generation if not given.")
+    parser.add_argument("--mutation-operators", nargs="+", help="MUSIC mutation operators to apply, e.g. ORRN OAAN. All operators if not given.")
+    parser.add_argument("--sample-size", type=int, help="Number of generated mutations to keep, sampled evenly across operators or lines.")
+    parser.add_argument("--sample-strata", choices=Mutator.sample_strata, default="operator", help="What the generated mutations are grouped by for sampling.")
+    parser.add_argument("--sample-seed", type=int, default=0, help="Seed of the mutation sampling.")
+    parser.add_argument("--cbmc-batch-size", type=int, default=1, help="Number of mutations checked together in one CBMC run, one assertion each.")
+    parser.add_argument("--cbmc-cache-dir", help="Directory of the persistent CBMC result cache. Results are not cached if not given.")
     
     # args to only run one action
     parser.add_argument("--only-gen-mutations", help="Will only generate mutations")
@@ -125,7 +248,9 @@ def set_up_argparse():
     MUSIC_path = args.path_to_MUSIC if args.path_to_MUSIC else "./MUSIC/music"
     fakeheader_path = args.path_to_fakeheaders if args.path_to_fakeheaders else "pycparser/utils/fake_libc_include"
     path_to_mutated_binaries = args.path_to_mutated_binaries if args.path_to_mutated_binaries else None
-    L1_runner(oracle_program, func_name, test_suite, mutation_directory, compilation_info, solver, new_input_filename, MUSIC_path, fakeheader_path, binary_folder=args.path_to_mutated_binaries)
+    if args.parse_cache_dir:
+        ProgramManipulator.configure_parse_cache(cache_dir=args.parse_cache_dir)
+    L1_runner(oracle_program, func_name, test_suite, mutation_directory, compilation_info, solver, new_input_filename, MUSIC_path, fakeheader_path, binary_folder=args.path_to_mutated_binaries, cbmc_cache_dir=args.cbmc_cache_dir, kill_mode=args.kill_mode, early_exit=args.early_exit, minimize_suite=args.minimize_suite, build_cache_dir=args.build_cache_dir, cbmc_timeout=args.cbmc_timeout, cbmc_max_rss=args.cbmc_max_rss*1024**2 if args.cbmc_max_rss else None, fuzz_prefilter=args.fuzz_prefilter, cbmc_batch_size=args.cbmc_batch_size, engine=args.engine, counterexamples_per_mutant=args.counterexamples_per_mutant, diversity_budget=args.diversity_budget, triage=args.triage, mutation_operators=args.mutation_operators, sample_size=args.sample_size, sample_strata=args.sample_strata, sample_seed=args.sample_seed, mutant_store_dir=args.mutant_store_dir, oracle_cache_dir=args.oracle_cache_dir, incremental_rekill=args.incremental_rekill)
 if __name__ == "__main__":
     set_up_argparse()
     # example command
@@ -0,0 +1,143 @@
+# This component evaluates the oracle and mutated functions in-process instead of running a test executable per mutation.
+# Each program is compiled into a shared object together with a small batch loop over the test inputs,
+# which is loaded with ctypes and fed the whole test suite from NumPy arrays in a single call.
+# Every evaluation runs in a forked worker, so crashing or hanging mutations do not take the pipeline down.
+from program_manipulation import ProgramManipulator
+from cpu_budget import CPUBudget
+import ctypes
+import multiprocessing as mp
+import numpy
+import os
+import subprocess
+
+
+class SharedObjectEvaluator(object):
+
+    # C types of function parameters/results mapped to NumPy types
+    supported_types = {
+        "float" : numpy.float32,
+        "double" : numpy.float64,
+        "int" : numpy.int32,
+        "int32_t" : numpy.int32,
+        "unsigned" : numpy.uint32,
+        "uint32_t" : numpy.uint32,
+        "short" : numpy.int16,
+        "int16_t" : numpy.int16,
+        "uint16_t" : numpy.uint16,
+        "long" : numpy.int64,
+        "int64_t" : numpy.int64,
+        "uint64_t" : numpy.uint64,
+        "char" : numpy.int8,
+        "int8_t" : numpy.int8,
+        "uint8_t" : numpy.uint8,
+    }
+    batch_function_name = "mbt_batch"
+    batch_source_filename = "mbt_batch.c"
+
+    def __init__(self, program_name, function_name, path_to_fakeheaders, working_dir, compilation_pre_flags="", compilation_info="", timeout=5):
+        """
+        Args:
+        program_name = path to the oracle program
+        function_name = name of the function to evaluate
+        working_dir = directory shared objects are built in. Must contain the program's dependencies.
+        timeout = seconds a single evaluation of the whole test suite may take
+        """
+        self.program_name = program_name
+        self.function_name = function_name
+        self.working_dir = working_dir
+        self.compilation_pre_flags = compilation_pre_flags if compilation_pre_flags is not None else ""
+        self.compilation_info = compilation_info if compilation_info is not None else ""
+        self.timeout = timeout
+        oracle_pm = ProgramManipulator(program_name, path_to_fakeheaders, other_headers=[f"-I{working_dir}"])
+        self.function_inputs = oracle_pm.get_function_inputs(function_name)
+        self.return_type = oracle_pm.get_function_return_type(function_name)
+
+    def supported(self):
+        if len(self.function_inputs) == 0 or self.return_type not in SharedObjectEvaluator.supported_types:
+            return False
+        return all([i[1] in SharedObjectEvaluator.supported_types for i in self.function_inputs])
+
+    def create_batch_source(self):
+        """ C source of a loop calling the function on every row of the test suite. """
+        params = ", ".join([i[1] for i in self.function_inputs])
+        arrays = "".join([f"const {i[1]} *a{n}, " for n, i in enumerate(self.function_inputs)])
+        args = ", ".join([f"a{n}[i]" for n in range(len(self.function_inputs))])
+        source = "#include <stddef.h>\n#include <stdint.h>\n"
+        source += f"{self.return_type} {self.function_name}({params});\n"
+        source += f"void {SharedObjectEvaluator.batch_function_name}(size_t n, {arrays}{self.return_type} *out) {{\n"
+        source += f"for (size_t i = 0; i < n; i++) out[i] = {self.function_name}({args});\n"
+        source += "}\n"
+        return source
+
+    def write_batch_source(self):
+        f = open(os.path.join(self.working_dir, SharedObjectEvaluator.batch_source_filename), "w+")
+        f.write(self.create_batch_source())
+        f.close()
+
+    def compile_shared_object(self, program, shared_object):
+        """
+        Compiles program (relative to the working directory) into shared_object.
+        Returns True if compilation succeeded.
+        """
+        try:
+            with CPUBudget.token():
+                result = subprocess.call(f"gcc -shared -fPIC {self.compilation_pre_flags} {program} {SharedObjectEvaluator.batch_source_filename} {self.compilation_info} -o {shared_object}", shell=True, cwd=self.working_dir, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            return False
+        return result == 0 and os.path.isfile(os.path.join(self.working_dir, shared_object))
+
+    def load_test_suite(self, test_suite):
+        """
+        Parses the test suite into one NumPy array per function input.
+        Floating point values may be hex (%a) or decimal, integers anything int(x, 0) accepts.
+        """
+        rows = [l.split() for l in open(test_suite, "r").readlines() if l.strip() != ""]
+        columns = []
+        for n, i in enumerate(self.function_inputs):
+            np_type = SharedObjectEvaluator.supported_types[i[1]]
+            if numpy.issubdtype(np_type, numpy.floating):
+                values = [float.fromhex(r[n]) for r in rows]
+            else:
+                values = [int(r[n], 0) for r in rows]
+            columns.append(numpy.array(values).astype(np_type))
+        return columns
+
+    @staticmethod
+    def evaluate_in_child(shared_object_path, columns, out, connection):
+        library = ctypes.CDLL(shared_object_path)
+        batch = getattr(library, SharedObjectEvaluator.batch_function_name)
+        batch.restype = None
+        arguments = [ctypes.c_size_t(len(out))]
+        arguments += [c.ctypes.data_as(ctypes.c_void_p) for c in columns]
+        arguments.append(out.ctypes.data_as(ctypes.c_void_p))
+        batch(*arguments)
+        connection.send_bytes(out.tobytes())
+        connection.close()
+
+    def evaluate(self, shared_object, columns):
+        """
+        Runs the function in shared_object on all rows in a forked worker.
+        Returns the array of results, or None if the worker crashed or timed out.
+        """
+        num_rows = len(columns[0]) if len(columns) > 0 else 0
+        out = numpy.zeros(num_rows, dtype=SharedObjectEvaluator.supported_types[self.return_type])
+        context = mp.get_context("fork")
+        parent_connection, child_connection = context.Pipe(duplex=False)
+        worker = context.Process(target=SharedObjectEvaluator.evaluate_in_child, args=(os.path.abspath(os.path.join(self.working_dir, shared_object)), columns, out, child_connection))
+        worker.start()
+        child_connection.close()
+        outputs = None
+        try:
+            if parent_connection.poll(self.timeout):
+                outputs = numpy.frombuffer(parent_connection.recv_bytes(), dtype=out.dtype)
+        except EOFError:
+            # worker died before sending its results
+            outputs = None
+        worker.join(1)
+        if worker.is_alive():
+            worker.kill()
+            worker.join()
+            return None
+        if worker.exitcode != 0:
+            return None
+        return outputs
@@ -0,0 +1,420 @@
+# This component is an incremental SMT engine for equivalence checks, an alternative to one CBMC run per mutation.
+# CBMC encodes the oracle function into SMT-LIB2 once (--smt2 --outfile) and the encoding is asserted on a
+# long-lived solver process. Each mutation is encoded on its own, without the oracle, and checked by pushing its
+# encoding with all symbols renamed apart, linking its inputs to the oracle's, asserting that the outputs differ,
+# and popping it again. Solver startup and the oracle's encoding are paid once instead of once per mutation.
+import os
+import re
+import select
+import subprocess
+import threading
+import time
+
+
+class IncrementalSMTEngine(object):
+
+    solver_command = ["z3", "-in"]
+    token_pattern = re.compile(r'\|[^|]*\||"(?:[^"]|"")*"|;[^\n]*|\(|\)|[^\s()|";]+')
+    # symbols of the harness' inputs and output, the #<n> suffix is their SSA index
+    harness_symbol_pattern = re.compile(r'^main::\d+::(variable_\d+|result)!\d+@\d+#(\d+)$')
+    dropped_commands = ["set-info", "set-option", "set-logic", "check-sat", "get-value", "get-model", "exit"]
+    symbol_commands = ["declare-fun", "define-fun", "declare-const"]
+    # exponent and significand bits of the C floating point types
+    float_formats = {"float" : (8, 24), "double" : (11, 53)}
+    # seconds on top of the solver timeout before an unresponsive solver is restarted
+    response_slack = 10
+
+    def __init__(self, function_name, function_inputs, return_type, working_dir, timeout=None, nan_equal=True, solver_command=None, cbmc_options=""):
+        """
+        Args:
+        function_inputs = list of [name, type] of the function's parameters, from ProgramManipulator.get_function_inputs
+        return_type = C return type of the function
+        working_dir = directory the harnesses and their encodings are written to
+        timeout = seconds the solver may spend on one mutation before it answers unknown. No limit if None.
+        nan_equal = whether two NaN outputs are equal, as in the instrumented program for CBMC
+        solver_command = SMT-LIB2 solver reading commands from stdin, z3 by default
+        cbmc_options = extra options for CBMC when encoding, e.g. --fpa
+        """
+        self.function_name = function_name
+        self.function_inputs = function_inputs
+        self.return_type = return_type
+        self.working_dir = working_dir
+        self.timeout = timeout
+        self.nan_equal = nan_equal
+        self.solver_command = solver_command if solver_command is not None else IncrementalSMTEngine.solver_command
+        self.cbmc_options = cbmc_options
+        self.process = None
+        self.buffer = b""
+        self.oracle = None
+        self.checked = 0
+        # solver calls spent on counterexamples after the first
+        self.extra_checks = 0
+
+    @staticmethod
+    def tokenize(text):
+        return [t for t in IncrementalSMTEngine.token_pattern.findall(text) if not t.startswith(";")]
+
+    @staticmethod
+    def expression_end(tokens, i):
+        """ Index after the expression starting at tokens[i]. """
+        if tokens[i] != "(":
+            return i + 1
+        depth = 0
+        for j in range(i, len(tokens)):
+            if tokens[j] == "(":
+                depth += 1
+            elif tokens[j] == ")":
+                depth -= 1
+                if depth == 0:
+                    return j + 1
+        raise Exception("Unbalanced SMT-LIB2 expression")
+
+    @staticmethod
+    def parse_commands(text):
+        """ Returns the top-level commands of an SMT-LIB2 script, each as a list of tokens. """
+        tokens = IncrementalSMTEngine.tokenize(text)
+        commands = []
+        i = 0
+        while i < len(tokens):
+            end = IncrementalSMTEngine.expression_end(tokens, i)
+            commands.append(tokens[i:end])
+            i = end
+        return commands
+
+    @staticmethod
+    def unquote(symbol):
+        return symbol[1:-1] if symbol.startswith("|") else symbol
+
+    @staticmethod
+    def render(tokens):
+        return " ".join(tokens).replace("( ", "(").replace(" )", ")")
+
+    @staticmethod
+    def symbol_sort(command):
+        """ Sort tokens of the symbol declared or defined by command. """
+        if command[1] == "declare-const":
+            return command[3:IncrementalSMTEngine.expression_end(command, 3)]
+        start = IncrementalSMTEngine.expression_end(command, 3)
+        return command[start:IncrementalSMTEngine.expression_end(command, start)]
+
+    def create_harness(self, includes, function_source, filename):
+        """ Writes a program calling the function on nondeterministic inputs, with nothing to check. """
+        main_method = ["int main(){"]
+        main_method += [f"{t} variable_{i};" for i, (_, t) in enumerate(self.function_inputs)]
+        main_method.append(f"{self.return_type} result = {self.function_name}({','.join([f'variable_{i}' for i in range(len(self.function_inputs))])});")
+        # CBMC only writes a formula for a property. This one constrains nothing but its own fresh variable.
+        main_method.append("_Bool encoding_property;")
+        main_method.append('__CPROVER_assert(encoding_property, "encoding");')
+        main_method.append("return 0;")
+        main_method.append("}")
+        f = open(os.path.join(self.working_dir, filename), "w+")
+        f.write("".join(includes) + function_source + "\n" + "\n".join(main_method))
+        f.close()
+
+    def encode(self, includes, function_source, name):
+        """
+        Encodes the function with CBMC.
+        Returns dictionary {"commands", "names", "inputs", "output", "sorts"} or None if it could not be encoded.
+        inputs has the symbol of every input, None for inputs the encoding does not mention.
+        """
+        harness = f"smt_encoding_{name}.c"
+        outfile = f"smt_encoding_{name}.smt2"
+        self.create_harness(includes, function_source, harness)
+        try:
+            subprocess.run(["cbmc", harness, "--smt2", "--outfile", outfile] + self.cbmc_options.split(), cwd=self.working_dir, capture_output=True, timeout=self.timeout)
+            text = open(os.path.join(self.working_dir, outfile), "r").read()
+        except (subprocess.TimeoutExpired, OSError) as e:
+            print(f"Could not encode {name}: {e}")
+            return None
+        finally:
+            for filename in [harness, outfile]:
+                if os.path.isfile(os.path.join(self.working_dir, filename)):
+                    os.remove(os.path.join(self.working_dir, filename))
+        try:
+            commands = [c for c in IncrementalSMTEngine.parse_commands(text) if len(c) > 2 and c[1] not in IncrementalSMTEngine.dropped_commands]
+        except Exception as e:
+            print(f"Could not parse the encoding of {name}: {e}")
+            return None
+        names = set()
+        sorts = {}
+        latest = {}
+        for command in commands:
+            if command[1] not in IncrementalSMTEngine.symbol_commands:
+                continue
+            symbol = command[2]
+            names.add(IncrementalSMTEngine.unquote(symbol))
+            sorts[symbol] = IncrementalSMTEngine.symbol_sort(command)
+            m = IncrementalSMTEngine.harness_symbol_pattern.match(IncrementalSMTEngine.unquote(symbol))
+            if m is not None and int(m.group(2)) >= latest.get(m.group(1), (-1, None))[0]:
+                latest[m.group(1)] = (int(m.group(2)), symbol)
+        if "result" not in latest:
+            print(f"The encoding of {name} has no result")
+            return None
+        return {
+            "commands" : commands,
+            "names" : names,
+            "inputs" : [latest.get(f"variable_{i}", (None, None))[1] for i in range(len(self.function_inputs))],
+            "output" : latest["result"][1],
+            "sorts" : sorts
+        }
+
+    @staticmethod
+    def rename(tokens, prefix, names):
+        return [f"|{prefix}::{IncrementalSMTEngine.unquote(t)}|" if IncrementalSMTEngine.unquote(t) in names else t for t in tokens]
+
+    def start(self, oracle):
+        """ Starts the solver and asserts the oracle's encoding. Returns False if the solver rejected it. """
+        self.oracle = oracle
+        self.process = subprocess.Popen(self.solver_command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True)
+        self.buffer = b""
+        setup = ["(set-option :produce-models true)"]
+        if self.timeout is not None:
+            setup.append(f"(set-option :timeout {int(self.timeout * 1000)})")
+        self.base_commands = set([IncrementalSMTEngine.render(c) for c in oracle["commands"]])
+        response = self.send(setup + [IncrementalSMTEngine.render(c) for c in oracle["commands"]])
+        if response is None or len(response) > 0:
+            print(f"The solver rejected the oracle's encoding: {response}")
+            self.close()
+            return False
+        return True
+
+    def restart(self):
+        self.close()
+        return self.start(self.oracle)
+
+    def close(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def write(self, text):
+        try:
+            self.process.stdin.write(text.encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def read_line(self, deadline):
+        """ Next line of the solver's output, or None if it ended or did not answer before the deadline. """
+        while b"\n" not in self.buffer:
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                return None
+            ready, _, _ = select.select([self.process.stdout], [], [], remaining)
+            if len(ready) == 0:
+                return None
+            data = os.read(self.process.stdout.fileno(), 1 << 16)
+            if len(data) == 0:
+                return None
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode().strip()
+
+    def send(self, commands, deadline=None):
+        """
+        Sends commands and returns the solver's output lines in response to them, or None if the solver did not answer.
+        The commands are written from a separate thread, so a long script cannot block on the solver's full output pipe.
+        """
+        if self.process is None:
+            return None
+        marker = f"done-{self.checked}-{time.perf_counter_ns()}"
+        writer = threading.Thread(target=self.write, args=("\n".join(commands) + f'\n(echo "{marker}")\n',))
+        writer.start()
+        lines = []
+        while True:
+            line = self.read_line(deadline)
+            if line is None:
+                lines = None
+                break
+            if line == marker:
+                break
+            if len(line) > 0:
+                lines.append(line)
+        if lines is None:
+            self.close()
+        writer.join()
+        return lines
+
+    def outputs_differ(self, oracle_output, mutated_output, sort):
+        if self.return_type in IncrementalSMTEngine.float_formats:
+            if sort[:3] != ["(", "_", "FloatingPoint"]:
+                exponent, significand = IncrementalSMTEngine.float_formats[self.return_type]
+                oracle_output = f"((_ to_fp {exponent} {significand}) {oracle_output})"
+                mutated_output = f"((_ to_fp {exponent} {significand}) {mutated_output})"
+            if self.nan_equal:
+                return f"(assert (not (or (fp.eq {oracle_output} {mutated_output}) (and (fp.isNaN {oracle_output}) (fp.isNaN {mutated_output})))))"
+            return f"(assert (not (fp.eq {oracle_output} {mutated_output})))"
+        return f"(assert (not (= {oracle_output} {mutated_output})))"
+
+    @staticmethod
+    def value_to_binary(tokens):
+        """ Bits of a bitvector or floating point value as printed by get-value, most significant first. """
+        if len(tokens) == 1:
+            value = tokens[0]
+            if value.startswith("#b"):
+                return value[2:]
+            if value.startswith("#x"):
+                return "".join([format(int(c, 16), "04b") for c in value[2:]])
+        elif tokens[1] == "fp":
+            return "".join([IncrementalSMTEngine.value_to_binary([t]) for t in tokens[2:-1]])
+        elif tokens[1] == "_" and tokens[2].startswith("bv"):
+            return format(int(tokens[2][2:]), f"0{tokens[3]}b")
+        elif tokens[1] == "_":
+            # special floating point values, (_ +zero 8 24) etc.
+            exponent, significand = int(tokens[3]), int(tokens[4])
+            sign = "1" if tokens[2].startswith("-") else "0"
+            if tokens[2] == "NaN":
+                return "0" + "1" * exponent + "1" + "0" * (significand - 2)
+            if tokens[2].endswith("oo"):
+                return sign + "1" * exponent + "0" * (significand - 1)
+            return sign + "0" * (exponent + significand - 1)
+        raise Exception(f"Unsupported value {IncrementalSMTEngine.render(tokens)}")
+
+    def get_values(self, symbols, deadline):
+        response = self.send([f"(get-value ({' '.join(symbols)}))"], deadline)
+        if response is None or any([l.startswith("(error") for l in response]):
+            return None
+        tokens = IncrementalSMTEngine.tokenize(" ".join(response))
+        values = {}
+        i = 1
+        while i < len(tokens) - 1:
+            end = IncrementalSMTEngine.expression_end(tokens, i)
+            pair = tokens[i+1:end-1]
+            value_start = IncrementalSMTEngine.expression_end(pair, 0)
+            values[pair[0]] = IncrementalSMTEngine.value_to_binary(pair[value_start:])
+            i = end
+        return values
+
+    @staticmethod
+    def float_class_predicate(bits, exponent):
+        """ SMT-LIB2 predicate of the classify_float class of a floating point bit pattern. """
+        exponent_bits = bits[1:1+exponent]
+        significand_bits = bits[1+exponent:]
+        if exponent_bits == "1" * exponent:
+            return "fp.isNaN" if "1" in significand_bits else "fp.isInfinite"
+        if exponent_bits == "0" * exponent:
+            return "fp.isSubnormal" if "1" in significand_bits else "fp.isZero"
+        return "fp.isNormal"
+
+    def input_as_float(self, symbol, c_type):
+        sort = self.oracle["sorts"][symbol]
+        if sort[:3] == ["(", "_", "FloatingPoint"]:
+            return symbol
+        exponent, significand = IncrementalSMTEngine.float_formats[c_type]
+        return f"((_ to_fp {exponent} {significand}) {symbol})"
+
+    def input_value(self, symbol, bits, c_type):
+        sort = self.oracle["sorts"][symbol]
+        if sort[:3] == ["(", "_", "FloatingPoint"]:
+            exponent, _ = IncrementalSMTEngine.float_formats[c_type]
+            return f"(fp #b{bits[0]} #b{bits[1:1+exponent]} #b{bits[1+exponent:]})"
+        return f"#b{bits}"
+
+    def class_blocking(self, bits):
+        """ Assertion excluding inputs with the same classes as bits, None if no input is a floating point value. """
+        conditions = []
+        for symbol, value, (_, c_type) in zip(self.oracle["inputs"], bits, self.function_inputs):
+            if c_type in IncrementalSMTEngine.float_formats:
+                predicate = IncrementalSMTEngine.float_class_predicate(value, IncrementalSMTEngine.float_formats[c_type][0])
+                conditions.append(f"({predicate} {self.input_as_float(symbol, c_type)})")
+        if len(conditions) == 0:
+            return None
+        return f"(assert (not (and {' '.join(conditions)})))"
+
+    def value_blocking(self, bits):
+        """ Assertion excluding exactly the inputs bits. """
+        conditions = [f"(= {symbol} {self.input_value(symbol, value, c_type)})" for symbol, value, (_, c_type) in zip(self.oracle["inputs"], bits, self.function_inputs)]
+        return f"(assert (not (and {' '.join(conditions)})))"
+
+    def set_solver_timeout(self, seconds):
+        # z3 takes the timeout in milliseconds, with its maximum meaning none
+        milliseconds = 4294967295 if seconds is None else max(1, int(seconds * 1000))
+        return self.send([f"(set-option :timeout {milliseconds})"]) is not None
+
+    def find_more_counterexamples(self, found, num_counterexamples, budget):
+        """
+        Looks for counterexamples other than found in the current scope, first ones whose inputs differ in their
+        classes from all found so far, then any other inputs. Stops after num_counterexamples in total or once
+        budget seconds are spent. Returns the list of counterexamples, found included.
+        """
+        budget_end = None if budget is None else time.perf_counter() + budget
+        for blocking in [self.class_blocking, self.value_blocking]:
+            if len(found) >= num_counterexamples:
+                break
+            assertions = [blocking(bits) for bits in found]
+            if None in assertions:
+                continue
+            if self.send(["(push 1)"]) is None:
+                return found
+            while len(found) < num_counterexamples:
+                remaining = None if budget_end is None else budget_end - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    break
+                timeout = remaining if self.timeout is None else (self.timeout if remaining is None else min(self.timeout, remaining))
+                if not self.set_solver_timeout(timeout):
+                    return found
+                deadline = None if timeout is None else time.perf_counter() + timeout + IncrementalSMTEngine.response_slack
+                response = self.send(assertions + ["(check-sat)"], deadline)
+                self.extra_checks += 1
+                if response is None:
+                    return found
+                if len(response) == 0 or response[-1] != "sat":
+                    break
+                values = self.get_values(self.oracle["inputs"], deadline)
+                if values is None:
+                    break
+                bits = [values[i] for i in self.oracle["inputs"]]
+                found.append(bits)
+                assertions = [blocking(bits)]
+            if not self.set_solver_timeout(self.timeout) or self.send(["(pop 1)"]) is None:
+                return found
+        return found
+
+    def check(self, name, encoding, num_counterexamples=1, budget=None):
+        """
+        Checks a mutated function's encoding against the oracle's.
+        Returns ("equivalent", None), ("counterexample", list of counterexamples, each a list of the inputs' bits as
+        strings), or (None, None) if the solver gave no answer. Up to num_counterexamples distinct counterexamples are
+        looked for, spending at most budget seconds on those after the first. The oracle's encoding stays asserted for
+        the next check.
+        """
+        if self.process is None and (self.oracle is None or not self.restart()):
+            return None, None
+        self.checked += 1
+        prefix = f"mutant{self.checked}"
+        commands = []
+        for command in encoding["commands"]:
+            if command[1] in IncrementalSMTEngine.symbol_commands or command[1] == "assert":
+                commands.append(IncrementalSMTEngine.render(IncrementalSMTEngine.rename(command, prefix, encoding["names"])))
+            elif IncrementalSMTEngine.render(command) not in self.base_commands:
+                # sorts and datatypes the oracle's encoding did not declare already
+                commands.append(IncrementalSMTEngine.render(command))
+        for mutated_input, oracle_input in zip(encoding["inputs"], self.oracle["inputs"]):
+            if mutated_input is not None:
+                commands.append(f"(assert (= {IncrementalSMTEngine.render(IncrementalSMTEngine.rename([mutated_input], prefix, encoding['names']))} {oracle_input}))")
+        mutated_output = IncrementalSMTEngine.render(IncrementalSMTEngine.rename([encoding["output"]], prefix, encoding["names"]))
+        commands.append(self.outputs_differ(self.oracle["output"], mutated_output, self.oracle["sorts"][self.oracle["output"]]))
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout + IncrementalSMTEngine.response_slack
+        response = self.send(["(push 1)"] + commands + ["(check-sat)"], deadline)
+        if response is None:
+            print(f"The solver did not answer for {name}. Restarting it.")
+            self.restart()
+            return None, None
+        verdict = (None, None)
+        errors = [l for l in response if l.startswith("(error")]
+        if len(errors) > 0:
+            print(f"The solver rejected the encoding of {name}: {errors[0]}")
+        elif len(response) > 0 and response[-1] == "unsat":
+            verdict = ("equivalent", None)
+        elif len(response) > 0 and response[-1] == "sat":
+            inputs = [i for i in self.oracle["inputs"]]
+            values = self.get_values(inputs, deadline)
+            if values is not None:
+                found = [[values[i] for i in inputs]]
+                if num_counterexamples > 1:
+                    found = self.find_more_counterexamples(found, num_counterexamples, budget)
+                verdict = ("counterexample", found)
+        if self.send(["(pop 1)"], deadline) is None:
+            self.restart()
+        return verdict
@@ -0,0 +1,109 @@
+# This component shrinks a test suite to a near-minimal subset that kills the same mutations.
+# It is a set cover over the mutation x test kill matrix written by the Mutator, solved greedily or,
+# if PuLP and its bundled CBC solver are installed, exactly as an integer linear program.
+from mutator import Mutator
+import numpy
+import time
+
+try:
+    import pulp
+except ImportError:
+    pulp = None
+
+
+class SuiteMinimizer(object):
+
+    methods = ["greedy", "ilp"]
+
+    def __init__(self, kill_matrix_file, test_suite=None, method="greedy", ilp_time_limit=60):
+        """
+        Args:
+        kill_matrix_file = .npz kill matrix from Mutator.write_kill_matrix
+        test_suite = suite the kill matrix was computed on. Taken from the kill matrix if not given.
+        method = "greedy" or "ilp". Falls back to greedy if PuLP is not installed or the ILP is not solved.
+        """
+        if method not in SuiteMinimizer.methods:
+            raise Exception(f"Unknown minimization method {method}. Choose from {SuiteMinimizer.methods}.")
+        self.mutations, self.kill_matrix, self.unattributed, matrix_suite, self.early_exit = Mutator.read_kill_matrix(kill_matrix_file)
+        self.test_suite = test_suite if test_suite is not None else matrix_suite
+        self.method = method
+        self.ilp_time_limit = ilp_time_limit
+
+    @staticmethod
+    def greedy_cover(kill_matrix):
+        """ Repeatedly picks the test that kills the most not yet covered mutations. """
+        uncovered = kill_matrix.any(axis=1)
+        selected = []
+        while uncovered.any():
+            gains = kill_matrix[uncovered].sum(axis=0)
+            best = int(numpy.argmax(gains))
+            selected.append(best)
+            uncovered = uncovered & ~kill_matrix[:, best]
+        return sorted(selected)
+
+    def ilp_cover(self, kill_matrix):
+        """ Exact minimum set cover. Returns None if it could not be solved to optimality in time. """
+        if pulp is None:
+            print("PuLP is not installed. Using greedy set cover.")
+            return None
+        problem = pulp.LpProblem("suite_minimization", pulp.LpMinimize)
+        tests = [pulp.LpVariable(f"t{j}", cat="Binary") for j in range(kill_matrix.shape[1])]
+        problem += pulp.lpSum(tests)
+        for i in range(kill_matrix.shape[0]):
+            killing_tests = numpy.flatnonzero(kill_matrix[i])
+            if len(killing_tests) > 0:
+                problem += pulp.lpSum([tests[j] for j in killing_tests]) >= 1
+        status = problem.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=self.ilp_time_limit))
+        if pulp.LpStatus[status] != "Optimal":
+            print(f"ILP set cover status {pulp.LpStatus[status]}. Using greedy set cover.")
+            return None
+        return sorted([j for j in range(len(tests)) if tests[j].value() is not None and tests[j].value() > 0.5])
+
+    def minimize(self, output_filename, mutator=None):
+        """
+        Writes the minimized suite to output_filename, keeping the original order of the tests.
+        Args:
+        mutator = Mutator the kill matrix was computed with. Mutations killed without a test row (crashes, timeouts,
+                  failed compiles) may depend on tests the minimized suite drops, so they are run on it again.
+                  Without a mutator, only the kills attributed to tests are checked.
+        Returns dictionary of statistics for the run data.
+        """
+        start = time.perf_counter()
+        method = self.method
+        selected = self.ilp_cover(self.kill_matrix) if method == "ilp" else None
+        if selected is None:
+            method = "greedy"
+            selected = SuiteMinimizer.greedy_cover(self.kill_matrix)
+
+        # the minimized suite must still kill every mutation that any test killed
+        killed_by_suite = self.kill_matrix.any(axis=1)
+        killed_by_minimized = self.kill_matrix[:, selected].any(axis=1) if len(selected) > 0 else numpy.zeros(len(self.mutations), dtype=bool)
+        if not numpy.array_equal(killed_by_suite, killed_by_minimized):
+            raise Exception("Minimized test suite does not preserve the mutation score.")
+
+        rows = [l for l in open(self.test_suite, "r").readlines() if l.strip() != ""]
+        f = open(output_filename, "w+")
+        f.write("".join([rows[j] for j in selected]))
+        f.close()
+
+        unattributed = [str(self.mutations[i]) for i in numpy.flatnonzero(self.unattributed)]
+        rechecked = None
+        if mutator is not None and len(unattributed) > 0:
+            kill_results = mutator.test_mutations(unattributed, output_filename)
+            lost = [m for m in unattributed if not Mutator.is_killed(kill_results.get(m, numpy.array([])))]
+            if len(lost) > 0:
+                raise Exception(f"Minimized test suite does not preserve the mutation score. No longer killed: {lost}")
+            rechecked = len(unattributed)
+        stop = time.perf_counter()
+        print(f"Minimized {self.test_suite} from {len(rows)} to {len(selected)} tests ({method}). Wrote {output_filename}")
+        return {
+            "wall_time" : stop-start,
+            "method" : method,
+            "num_tests_before" : len(rows),
+            "num_tests_after" : len(selected),
+            "mutations_killed_by_tests" : int(killed_by_suite.sum()),
+            "mutations_killed_without_test" : int(self.unattributed.sum()),
+            "mutations_rechecked_on_minimized" : rechecked,
+            "kill_matrix_early_exit" : self.early_exit,
+            "minimized_suite_filename" : output_filename
+        }
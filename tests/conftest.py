@@ -0,0 +1,5 @@
+# The components import each other by module name, as when run from src.
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
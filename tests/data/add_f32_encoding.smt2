@@ -0,0 +1,23 @@
+; SMT 2
+(set-info :source "Generated by CBMC 5.95.1 ""smt2"" output")
+(set-option :produce-models true)
+(set-logic QF_AUFBV)
+
+; find_symbols
+(declare-fun |main::1::variable_0!0@1#1| () (_ BitVec 32))
+; find_symbols
+(declare-fun |main::1::variable_1!0@1#1| () (_ BitVec 32))
+; set_to true (equal)
+(define-fun |add::$tmp::return_value (sum)!0@1#2| () (_ BitVec 32) ((_ to_ieee_bv) (fp.add RNE ((_ to_fp 8 24) |main::1::variable_0!0@1#1|) ((_ to_fp 8 24) |main::1::variable_1!0@1#1|))))
+; set_to true (equal)
+(define-fun |main::1::result!0@1#2| () (_ BitVec 32) |add::$tmp::return_value (sum)!0@1#2|)
+(declare-fun |main::1::encoding_property!0@1#1| () Bool)
+; convert
+(define-fun B0 () Bool (not |main::1::encoding_property!0@1#1|))
+(assert B0)
+(check-sat)
+
+(get-value (|main::1::result!0@1#2|))
+
+(exit)
+; end of SMT2 file
@@ -0,0 +1,121 @@
+import pytest
+import equivalence_checker_cbmc
+from cbmc_cache import CBMCResultCache
+from equivalence_checker_cbmc import EquivalenceChecker
+
+FIRST = ["0x1p+0", "0x1p+1"]
+SECOND = ["0x0p+0", "0x1p+1"]
+THIRD = ["inf", "0x1p+1"]
+FOURTH = ["0x1p-149", "0x1p+1"]
+
+
+class Output(object):
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+
+    def verified(self):
+        return self.inputs is None
+
+
+class DiversityChecker(EquivalenceChecker):
+    """ Checker whose CBMC runs for more counterexamples answer with the next of answers. """
+
+    def __init__(self, cache, counterexamples_per_mutant, answers):
+        self.cache = cache
+        self.counterexamples_per_mutant = counterexamples_per_mutant
+        self.diversity_budget = 60
+        self.function_inputs = [["a", "float"], ["b", "float"]]
+        self.num_processes = 1
+        self.cbmc_timeout = None
+        self.cbmc_max_rss = None
+        self.backend = ""
+        self.working_dir = "."
+        self.answers = list(answers)
+        self.assumptions = []
+
+    def create_instrumented_program(self, mutated_program, mutated_function=None, assumptions=None, filename=None):
+        self.assumptions.append(assumptions)
+
+    def get_counterexample_from_cbmc_output(self, cbmc_output, mutation_name):
+        return cbmc_output.inputs
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    checkers = []
+
+    class Scheduler(object):
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def run(self, jobs):
+            checker = checkers[-1]
+            return {job.name : {"status" : "done", "output" : Output(checker.answers.pop(0)), "wall_time" : 1.0} for job in jobs}
+
+    monkeypatch.setattr(equivalence_checker_cbmc, "CBMCScheduler", Scheduler)
+    return checkers
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CBMCResultCache(str(tmp_path / "cache"), cbmc_version="test")
+
+
+def search(scheduler, cache, counterexamples_per_mutant, answers, cached=False):
+    checker = DiversityChecker(cache, counterexamples_per_mutant, answers)
+    scheduler.append(checker)
+    entries = {"m.c" : cache.lookup("key")} if cached else None
+    status = "hit" if cached else "miss"
+    extras = checker.find_more_counterexamples_CBMC([[FIRST, "m.c", status]], {"m.c" : "key"}, entries)
+    return checker, [e[0] for e in extras]
+
+
+def test_search_caches_all_counterexamples(scheduler, cache):
+    cache.store("key", "counterexample", FIRST)
+    checker, extras = search(scheduler, cache, 3, [SECOND, THIRD])
+    assert extras == [SECOND, THIRD]
+    entry = cache.lookup("key")
+    assert entry["counterexample"] == FIRST
+    assert entry["counterexamples"] == [FIRST, SECOND, THIRD]
+    assert entry["diversity_searched"] == 3
+
+
+def test_cache_hit_serves_extras_without_cbmc(scheduler, cache):
+    cache.store("key", "counterexample", FIRST, counterexamples=[FIRST, SECOND, THIRD], diversity_searched=3)
+    checker, extras = search(scheduler, cache, 3, [], cached=True)
+    assert extras == [SECOND, THIRD]
+    assert checker.assumptions == []
+    assert checker.diversity_stats["cached_extra_counterexamples"] == 2
+    assert checker.diversity_stats["extra_cbmc_runs"] == 0
+
+
+def test_cache_hit_after_exhausted_search_is_not_searched_again(scheduler, cache):
+    # the value mode run proves there are no counterexamples besides the two found
+    cache.store("key", "counterexample", FIRST)
+    search(scheduler, cache, 3, [SECOND, None, None])
+    assert cache.lookup("key")["counterexamples"] == [FIRST, SECOND]
+    checker, extras = search(scheduler, cache, 3, [], cached=True)
+    assert extras == [SECOND]
+    assert checker.assumptions == []
+
+
+def test_cache_hit_asking_for_more_continues_the_search(scheduler, cache):
+    cache.store("key", "counterexample", FIRST, counterexamples=[FIRST, SECOND, THIRD], diversity_searched=3)
+    checker, extras = search(scheduler, cache, 4, [FOURTH], cached=True)
+    assert extras == [SECOND, THIRD, FOURTH]
+    # the cached counterexamples are excluded from the new search
+    assert len(checker.assumptions) == 1 and len(checker.assumptions[0]) == 3
+    assert cache.lookup("key")["counterexamples"] == [FIRST, SECOND, THIRD, FOURTH]
+    assert cache.lookup("key")["diversity_searched"] == 4
+
+
+def test_entry_without_counterexample_list_is_searched(scheduler, cache, tmp_path):
+    (tmp_path / "cache" / "key.json").write_text('{"verdict": "counterexample", "counterexample": ["0x1p+0", "0x1p+1"]}')
+    entry = cache.lookup("key")
+    assert entry["counterexamples"] == [FIRST]
+    assert entry["diversity_searched"] == 0
+    checker, extras = search(scheduler, cache, 2, [SECOND], cached=True)
+    assert extras == [SECOND]
+    assert cache.lookup("key")["counterexamples"] == [FIRST, SECOND]
@@ -0,0 +1,108 @@
+import io
+import json
+import os
+import random
+import pytest
+from cbmc_trace_parser import CBMCTraceParser
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+VARIABLES = ["variable_0", "variable_1", "result", "mutated_result"]
+
+
+def read(name):
+    return open(os.path.join(DATA, name), "r").read()
+
+
+def extract(cbmc_json, variable_name):
+    """ The extraction from the whole json before the streaming parser: last assignment in the last result's trace. """
+    trace = None
+    for value in cbmc_json:
+        if "result" in value:
+            trace = value["result"][0].get("trace")
+    if trace is None:
+        return None
+    value = None
+    for event in trace:
+        if event.get("assignmentType") == "variable" and event.get("lhs") == variable_name:
+            value = event["value"]
+    return value
+
+
+def without_events(cbmc_json):
+    for element in cbmc_json:
+        for result in element.get("result", []):
+            if "trace" in result:
+                result["trace"] = [0] * len(result["trace"])
+    return cbmc_json
+
+
+def parse_chunks(chunks):
+    parser = CBMCTraceParser(VARIABLES)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser
+
+
+def check(parser, text):
+    cbmc_json = json.loads(text)
+    assert parser.complete()
+    assert parser.verified() == (cbmc_json[-1].get("cProverStatus") == "success")
+    values = parser.trace_values()
+    if extract(cbmc_json, "result") is None:
+        assert values is None
+    else:
+        assert values == {v : extract(cbmc_json, v) for v in VARIABLES}
+    assert parser.elements == without_events(cbmc_json)
+
+
+@pytest.mark.parametrize("name", ["cbmc_failure.json", "cbmc_success.json"])
+def test_whole_output_matches_json(name):
+    text = read(name)
+    check(parse_chunks([text]), text)
+
+
+@pytest.mark.parametrize("name", ["cbmc_failure.json", "cbmc_success.json"])
+def test_every_split_point_matches_json(name):
+    text = read(name)
+    for i in range(len(text) + 1):
+        check(parse_chunks([text[:i], text[i:]]), text)
+
+
+def test_random_chunks_match_json():
+    text = read("cbmc_failure.json")
+    rng = random.Random(0)
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(1, len(text)), 40))
+        check(parse_chunks([text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]), text)
+
+
+def test_splits_after_backslash_inside_strings():
+    text = read("cbmc_failure.json")
+    offsets = [i + 1 for i, c in enumerate(text) if c == "\\"]
+    assert len(offsets) > 0
+    for i in offsets:
+        check(parse_chunks([text[:i], text[i:]]), text)
+
+
+def test_last_assignment_is_kept():
+    values = parse_chunks([read("cbmc_failure.json")]).trace_values()
+    assert values["variable_0"]["data"] == "1.0f"
+    assert values["mutated_result"]["data"] == "3.0f"
+
+
+def test_parse_stream_single_characters():
+    text = read("cbmc_failure.json")
+    check(CBMCTraceParser(VARIABLES).parse_stream(io.StringIO(text), chunk_size=1), text)
+
+
+def test_truncated_output_is_incomplete():
+    text = read("cbmc_failure.json")
+    parser = parse_chunks([text[:len(text) // 2]])
+    assert not parser.complete()
+    assert not parser.verified()
+
+
+def test_malformed_output_is_incomplete():
+    parser = parse_chunks(['[{"program": "CBMC"}, {"messageText": x}]'])
+    assert parser.failed
+    assert not parser.complete()
@@ -0,0 +1,98 @@
+import pytest
+from mutant_diff import MutantDiff, MutantSet
+from program_manipulation import ProgramManipulator
+
+TYPEDEF_PROGRAM = """typedef float f32;
+typedef struct { f32 x; } pair;
+
+f32 foo(f32 a, f32 b) {
+    f32 r = a + b; // sum
+    return r;
+}
+
+int main(void) {
+    return (int) foo(1, 2);
+}
+"""
+
+MACRO_PROGRAM = """#define ADD(x, y) ((x) + (y))
+
+float foo(float a, float b) {
+    return ADD(a, b);
+}
+"""
+
+STRING_PROGRAM = """int puts(const char *s);
+
+int foo(int a) {
+    puts("http://example /* not a comment");
+    return a + 1; /* a comment */
+}
+"""
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.fixture
+def fakeheaders(tmp_path):
+    path = tmp_path / "fake_libc_include"
+    path.mkdir()
+    return str(path)
+
+
+def counts():
+    return dict(ProgramManipulator.parse_cache.counts)
+
+
+def test_diff_round_trips_the_mutated_function(tmp_path, fakeheaders):
+    oracle = write(tmp_path, "oracle.c", TYPEDEF_PROGRAM)
+    mutation = write(tmp_path, "oracle.MUT1.c", TYPEDEF_PROGRAM.replace("a + b", "a - b"))
+    mutants = MutantSet(oracle, "foo", fakeheaders)
+    assert mutants.standalone_parse
+    diff = mutants.add(mutation)
+    assert isinstance(diff, MutantDiff)
+    assert len(diff.edits) == 1
+    mutation_lines = open(mutation, "r").readlines()
+    assert diff.apply(mutants.oracle_function_lines) == mutation_lines[3:7]
+    assert mutants.get_function_source(mutation) == "".join(mutation_lines[3:7])
+    before = counts()
+    assert mutants.get_function(mutation) == ProgramManipulator(mutation, fakeheaders).get_function("foo")
+    assert counts()["function_parses"] == before["function_parses"] + 1
+    assert counts()["function_fallbacks"] == before["function_fallbacks"]
+
+
+def test_mutation_outside_the_function_has_no_diff(tmp_path, fakeheaders):
+    oracle = write(tmp_path, "oracle.c", TYPEDEF_PROGRAM)
+    mutation = write(tmp_path, "oracle.MUT2.c", TYPEDEF_PROGRAM.replace("foo(1, 2)", "foo(2, 2)"))
+    mutants = MutantSet(oracle, "foo", fakeheaders)
+    assert mutants.add(mutation) is None
+    before = counts()
+    assert mutants.get_function(mutation) == ProgramManipulator(mutation, fakeheaders).get_function("foo")
+    assert counts()["function_fallbacks"] == before["function_fallbacks"] + 1
+
+
+def test_function_using_macros_falls_back_to_full_parse(tmp_path, fakeheaders):
+    oracle = write(tmp_path, "oracle.c", MACRO_PROGRAM)
+    mutation = write(tmp_path, "oracle.MUT1.c", MACRO_PROGRAM.replace("ADD(a, b)", "ADD(a, -b)"))
+    mutants = MutantSet(oracle, "foo", fakeheaders)
+    assert not mutants.standalone_parse
+    before = counts()
+    function = mutants.get_function(mutation)
+    assert function == ProgramManipulator(mutation, fakeheaders).get_function("foo")
+    assert "ADD" not in function
+    assert counts()["function_fallbacks"] == before["function_fallbacks"] + 1
+    assert counts()["function_parses"] == before["function_parses"]
+
+
+def test_comment_markers_inside_strings_are_kept(tmp_path, fakeheaders):
+    oracle = write(tmp_path, "oracle.c", STRING_PROGRAM)
+    mutants = MutantSet(oracle, "foo", fakeheaders)
+    assert mutants.standalone_parse
+    function = mutants.parse_function("".join(mutants.oracle_function_lines))
+    assert function is not None
+    mutation = write(tmp_path, "oracle.MUT1.c", STRING_PROGRAM.replace("a + 1", "a - 1"))
+    assert mutants.get_function(mutation) == ProgramManipulator(mutation, fakeheaders).get_function("foo")
@@ -0,0 +1,51 @@
+import shutil
+import pytest
+from mutant_triage import MutantTriage
+
+pytestmark = pytest.mark.skipif(shutil.which("gcc") is None, reason="gcc is not installed")
+
+# helper is only called with constant arguments, so gcc -O2 specializes it into helper.constprop.0
+PROGRAM = """
+#include <math.h>
+static __attribute__((noinline)) float helper(float a, int n, float b) {
+    float r = 0;
+    for (int i = 0; i < n; i++)
+        r += sinf(a * b);
+    return r;
+}
+float foo(float a, float b) {
+    return helper(a, %d, b) + helper(b, %d, a);
+}
+"""
+
+
+def hash_of(tmp_path, name, n):
+    program = tmp_path / name
+    program.write_text(PROGRAM % (n, n))
+    return MutantTriage(str(program), "foo", str(tmp_path), working_dir_name=str(tmp_path)).hash_program(str(program))
+
+
+def test_identical_programs_hash_equal(tmp_path):
+    oracle = hash_of(tmp_path, "oracle.c", 3)
+    assert oracle is not None
+    assert hash_of(tmp_path, "mutation.c", 3) == oracle
+
+
+def test_mutated_call_into_specialized_clone_hashes_differently(tmp_path):
+    assert hash_of(tmp_path, "mutation.c", 4) != hash_of(tmp_path, "oracle.c", 3)
+
+
+def test_clone_code_is_part_of_canonical_text():
+    assembly = "\n".join(["\t.type\thelper.constprop.0, @function",
+                          "helper.constprop.0:",
+                          "\tmovl\t$4, %eax",
+                          "\tret",
+                          "\t.size\thelper.constprop.0, .-helper.constprop.0",
+                          "\t.type\tfoo, @function",
+                          "foo:",
+                          "\tcall\thelper.constprop.0",
+                          "\tret",
+                          "\t.size\tfoo, .-foo"])
+    code = MutantTriage.canonicalize(assembly, "foo")
+    assert "movl\t$4, %eax" in code
+    assert MutantTriage.canonicalize(assembly, "bar") is None
@@ -0,0 +1,99 @@
+import numpy
+from mutator import Mutator
+
+MUTATIONS = ["p.MUT0.c", "p.MUT1.c", "p.MUT2.c", "p.MUT3.c"]
+# the previous pass on the 4 rows of the old suite: MUT0 killed at row 1, MUT1 killed without a row
+PREVIOUS_ROWS = {
+    "p.MUT0.c" : numpy.array([1]),
+    "p.MUT1.c" : None,
+    "p.MUT2.c" : numpy.array([], dtype=numpy.int64),
+    "p.MUT3.c" : numpy.array([], dtype=numpy.int64),
+}
+OLD_ROWS = ["1 2\n", "3 4\n", "5 6\n", "7 8\n"]
+NEW_ROWS = ["9 10\n", "11 12\n", "13 14\n"]
+
+
+class SyntheticMutator(Mutator):
+    """ Mutator whose mutations differ from the oracle on the rows of the suite with the values in differing_values. """
+
+    def __init__(self, tmp_path, differing_values):
+        self.mutated_program_dir_name = str(tmp_path / "mutations")
+        self.working_dir_name = str(tmp_path / "working") + "/"
+        (tmp_path / "mutations").mkdir(exist_ok=True)
+        (tmp_path / "working").mkdir(exist_ok=True)
+        for m in MUTATIONS:
+            (tmp_path / "mutations" / m).write_text("")
+        self.file_dependencies = []
+        self.build_cache = None
+        self.early_exit = False
+        self.kill_rows = {}
+        self.kill_test_suite = None
+        self.differing_values = differing_values
+        self.tested = []
+
+    def test_mutations(self, mutated_programs, test_suite, first_rows=None):
+        self.tested.append((list(mutated_programs), first_rows))
+        rows = [l for l in open(test_suite, "r").readlines() if l.strip() != ""]
+        return {m : numpy.array([j for j, row in enumerate(rows) if row in self.differing_values.get(m, [])], dtype=numpy.int64) for m in mutated_programs}
+
+    def kill_mutations(self, test_suite):
+        self.tested.append(("full pass", test_suite))
+        return None
+
+
+def write_suite(tmp_path, name, rows):
+    path = tmp_path / name
+    path.write_text("".join(rows))
+    return str(path)
+
+
+def previous_pass(mutator, tmp_path):
+    mutator.kill_rows = dict(PREVIOUS_ROWS)
+    mutator.num_test_rows = len(OLD_ROWS)
+    mutator.kill_test_suite = write_suite(tmp_path, "old.ssv", OLD_ROWS)
+
+
+def check_combined_rows(mutator):
+    assert mutator.tested == [(["p.MUT2.c", "p.MUT3.c"], {"p.MUT2.c" : 1})]
+    assert list(mutator.kill_rows["p.MUT0.c"]) == [1]
+    assert mutator.kill_rows["p.MUT1.c"] is None
+    # the second new row is row 5 of the combined suite
+    assert list(mutator.kill_rows["p.MUT2.c"]) == [5]
+    assert list(mutator.kill_rows["p.MUT3.c"]) == []
+    assert mutator.num_test_rows == len(OLD_ROWS) + len(NEW_ROWS)
+    assert mutator.incremental_data == {"fallback" : False, "first_new_row" : 4, "new_rows" : 3, "previously_killed" : 2, "survivors_tested" : 2, "survivors_killed" : 1}
+
+
+def test_new_row_kills_are_numbered_in_the_combined_suite(tmp_path):
+    mutator = SyntheticMutator(tmp_path, {"p.MUT2.c" : ["11 12\n"], "p.MUT0.c" : ["13 14\n"]})
+    previous_pass(mutator, tmp_path)
+    suite = write_suite(tmp_path, "new.ssv", OLD_ROWS + NEW_ROWS)
+    mutator.kill_new_rows(suite, len(OLD_ROWS), counterexample_rows={"p.MUT2.c" : 5, "p.MUT3.c" : 2})
+    check_combined_rows(mutator)
+
+
+def test_kill_matrix_merges_previous_and_new_rows(tmp_path):
+    mutator = SyntheticMutator(tmp_path, {"p.MUT2.c" : ["11 12\n"]})
+    previous_pass(mutator, tmp_path)
+    previous_matrix = mutator.write_kill_matrix(str(tmp_path / "previous.npz"))
+    # the pass is continued from the kill matrix on disk, not from the rows in memory
+    mutator.kill_rows = {}
+    mutator.kill_test_suite = None
+    suite = write_suite(tmp_path, "new.ssv", OLD_ROWS + NEW_ROWS)
+    mutator.kill_new_rows(suite, len(OLD_ROWS), previous_kill_matrix=previous_matrix, counterexample_rows={"p.MUT2.c" : 5})
+    check_combined_rows(mutator)
+    mutations, matrix, unattributed, test_suite, _ = Mutator.read_kill_matrix(mutator.write_kill_matrix(str(tmp_path / "combined.npz")))
+    assert mutations == MUTATIONS
+    assert test_suite == suite
+    assert matrix.shape == (4, 7)
+    assert [list(numpy.flatnonzero(row)) for row in matrix] == [[1], [], [5], []]
+    assert list(unattributed) == [False, True, False, False]
+
+
+def test_suite_not_extending_the_previous_one_runs_in_full(tmp_path):
+    mutator = SyntheticMutator(tmp_path, {})
+    previous_pass(mutator, tmp_path)
+    suite = write_suite(tmp_path, "new.ssv", ["0 0\n"] + OLD_ROWS[1:] + NEW_ROWS)
+    mutator.kill_new_rows(suite, len(OLD_ROWS))
+    assert mutator.tested == [("full pass", suite)]
+    assert mutator.incremental_data == {"fallback" : True}
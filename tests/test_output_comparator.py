@@ -0,0 +1,71 @@
+import numpy
+import pytest
+from output_comparator import OutputComparator
+
+
+def floats(bit_patterns):
+    return numpy.array(bit_patterns, dtype=numpy.uint32).view(numpy.float32)
+
+
+QUIET_NAN = 0x7fc00000
+QUIET_NAN_PAYLOAD = 0x7fc00001
+SIGNALLING_NAN = 0x7f800001
+NEGATIVE_QUIET_NAN = 0xffc00000
+ONE = 0x3f800000
+
+
+def test_signed_zeros():
+    zeros = numpy.array([0.0, -0.0, 0.0, 1.0])
+    negated = numpy.array([-0.0, 0.0, 0.0, 1.0])
+    assert list(OutputComparator.differing_rows(zeros, negated)) == []
+    assert list(OutputComparator.differing_rows(zeros, negated, signed_zeros=True)) == [0, 1]
+
+
+def test_printed_signed_zeros():
+    assert OutputComparator.outputs_equal(["0x0p+0"], ["-0x0p+0"])
+    assert not OutputComparator.outputs_equal(["0x0p+0"], ["-0x0p+0"], signed_zeros=True)
+
+
+def test_nans_are_equal_without_payloads():
+    oracle = floats([QUIET_NAN, QUIET_NAN, QUIET_NAN, ONE])
+    mutation = floats([QUIET_NAN_PAYLOAD, SIGNALLING_NAN, NEGATIVE_QUIET_NAN, QUIET_NAN])
+    assert list(OutputComparator.differing_rows(oracle, mutation)) == [3]
+
+
+def test_nan_payloads_and_signs_differ_with_nan_payloads():
+    oracle = floats([QUIET_NAN, QUIET_NAN, QUIET_NAN, SIGNALLING_NAN, QUIET_NAN_PAYLOAD])
+    mutation = floats([QUIET_NAN_PAYLOAD, SIGNALLING_NAN, NEGATIVE_QUIET_NAN, SIGNALLING_NAN, QUIET_NAN_PAYLOAD])
+    assert list(OutputComparator.differing_rows(oracle, mutation, nan_payloads=True)) == [0, 1, 2]
+
+
+def test_nan_payloads_in_double_outputs():
+    oracle = numpy.array([0x7ff8000000000000, 0x7ff0000000000001], dtype=numpy.uint64).view(numpy.float64)
+    mutation = numpy.array([0x7ff8000000000001, 0x7ff0000000000001], dtype=numpy.uint64).view(numpy.float64)
+    assert list(OutputComparator.differing_rows(oracle, mutation)) == []
+    assert list(OutputComparator.differing_rows(oracle, mutation, nan_payloads=True)) == [0]
+
+
+def test_printed_nans_are_equal():
+    assert OutputComparator.outputs_equal(["nan", "0x1p+0"], ["-nan", "0x1p+0"])
+
+
+def test_rows_past_the_shorter_output_differ():
+    oracle = ["0x1p+0", "0x1p+1", "0x1p+2", "0x1p+3"]
+    assert list(OutputComparator.differing_rows(oracle, oracle[:2])) == [2, 3]
+    assert list(OutputComparator.differing_rows(oracle[:1], oracle)) == [1, 2, 3]
+    assert list(OutputComparator.differing_rows(oracle, [])) == [0, 1, 2, 3]
+
+
+def test_read_outputs_skips_blank_lines(tmp_path):
+    path = tmp_path / "output.txt"
+    path.write_text("0x1p+0\n\n-0x1.8p+1\n")
+    assert list(OutputComparator.read_outputs(str(path))) == [1.0, -3.0]
+
+
+def test_unreadable_output_raises(tmp_path):
+    path = tmp_path / "output.txt"
+    path.write_text("0x1p+0\nSegmentation fault\n")
+    with pytest.raises(ValueError):
+        OutputComparator.read_outputs(str(path))
+    with pytest.raises(OSError):
+        OutputComparator.read_outputs(str(tmp_path / "missing.txt"))
@@ -0,0 +1,74 @@
+import json
+import os
+import pytest
+from run_journal import RunJournal
+
+
+def test_records_are_completed_and_done(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"))
+    journal.record("add_f32", "mutation", {"num_mutations" : 3})
+    assert journal.completed("add_f32", "mutation") == {"num_mutations" : 3}
+    assert journal.completed("add_f32", "kill") is None
+    assert not journal.is_done("add_f32")
+    journal.record("add_f32", "done", {"killed" : 2})
+    assert journal.is_done("add_f32")
+    assert not journal.is_done("sub_f32")
+
+
+def test_unknown_stage_is_rejected(tmp_path):
+    journal = RunJournal(str(tmp_path / "journal.jsonl"))
+    with pytest.raises(Exception):
+        journal.record("add_f32", "minimize", {})
+
+
+def test_new_run_resets_at_run_start(tmp_path):
+    filename = str(tmp_path / "journal.jsonl")
+    first = RunJournal(filename)
+    first.record("add_f32", "done", {})
+    second = RunJournal(filename)
+    second.record("sub_f32", "kill", {})
+    assert not second.is_done("add_f32")
+    resumed = RunJournal(filename, resume=True)
+    assert not resumed.is_done("add_f32")
+    assert resumed.completed("sub_f32", "kill") == {}
+
+
+def test_resume_after_interrupted_run_skips_finished_work(tmp_path):
+    filename = str(tmp_path / "journal.jsonl")
+    RunJournal(filename).record("old_f32", "done", {})
+    journal = RunJournal(filename)
+    journal.record("add_f32", "mutation", {})
+    journal.record("add_f32", "kill", {})
+    journal.record("add_f32", "cbmc", {})
+    journal.record("add_f32", "rekill", {})
+    journal.record("add_f32", "done", {"killed" : 5})
+    journal.record("sub_f32", "mutation", {"num_mutations" : 7})
+    journal.record("sub_f32", "kill", {"killed" : 1})
+    # the run is killed while writing the kill record of sub_f32
+    size = os.path.getsize(filename)
+    f = open(filename, "rb+")
+    f.truncate(size - 10)
+    f.close()
+
+    resumed = RunJournal(filename, resume=True)
+    assert resumed.is_done("add_f32")
+    assert resumed.completed("add_f32", "done") == {"killed" : 5}
+    assert not resumed.is_done("old_f32")
+    assert not resumed.is_done("sub_f32")
+    assert resumed.completed("sub_f32", "mutation") == {"num_mutations" : 7}
+    assert resumed.completed("sub_f32", "kill") is None
+
+    # the resumed run continues the interrupted one, and its records start on a line of their own
+    resumed.record("sub_f32", "kill", {"killed" : 1})
+    resumed.record("sub_f32", "done", {})
+    again = RunJournal(filename, resume=True)
+    assert again.is_done("add_f32")
+    assert again.is_done("sub_f32")
+    lines = open(filename, "r").read().splitlines()
+    assert json.loads(lines[-1])["stage"] == "done"
+    assert len([l for l in lines if "run_start" in l]) == 2
+
+
+def test_resume_without_journal_starts_empty(tmp_path):
+    resumed = RunJournal(str(tmp_path / "missing.jsonl"), resume=True)
+    assert not resumed.is_done("add_f32")
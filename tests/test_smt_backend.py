@@ -0,0 +1,64 @@
+import os
+import pytest
+from smt_backend import IncrementalSMTEngine
+
+ENCODING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "add_f32_encoding.smt2")
+
+
+@pytest.fixture
+def commands():
+    return IncrementalSMTEngine.parse_commands(open(ENCODING, "r").read())
+
+
+def test_parse_commands_splits_top_level_commands(commands):
+    assert [c[1] for c in commands] == ["set-info", "set-option", "set-logic", "declare-fun", "declare-fun", "define-fun",
+                                        "define-fun", "declare-fun", "define-fun", "assert", "check-sat", "get-value", "exit"]
+    assert all([c[0] == "(" and c[-1] == ")" for c in commands])
+
+
+def test_parse_commands_keeps_quoted_symbols_and_strings_whole(commands):
+    assert commands[0][3] == '"Generated by CBMC 5.95.1 ""smt2"" output"'
+    assert commands[5][2] == "|add::$tmp::return_value (sum)!0@1#2|"
+    assert IncrementalSMTEngine.symbol_sort(commands[5]) == ["(", "_", "BitVec", "32", ")"]
+    assert IncrementalSMTEngine.symbol_sort(commands[7]) == ["Bool"]
+
+
+def test_parse_commands_finds_harness_symbols(commands):
+    symbols = [IncrementalSMTEngine.unquote(c[2]) for c in commands if c[1] in IncrementalSMTEngine.symbol_commands]
+    matches = [IncrementalSMTEngine.harness_symbol_pattern.match(s) for s in symbols]
+    assert [(m.group(1), m.group(2)) for m in matches if m is not None] == [("variable_0", "1"), ("variable_1", "1"), ("result", "2")]
+
+
+def test_parse_commands_rejects_unbalanced_script():
+    with pytest.raises(Exception):
+        IncrementalSMTEngine.parse_commands("(assert (and a b)")
+
+
+def test_rename_only_renames_the_given_symbols(commands):
+    names = set(["main::1::variable_0!0@1#1", "main::1::variable_1!0@1#1", "add::$tmp::return_value (sum)!0@1#2"])
+    renamed = IncrementalSMTEngine.rename(commands[5], "mutant", names)
+    assert renamed[2] == "|mutant::add::$tmp::return_value (sum)!0@1#2|"
+    assert "|mutant::main::1::variable_0!0@1#1|" in renamed
+    assert "|mutant::main::1::variable_1!0@1#1|" in renamed
+    assert [t for t, r in zip(commands[5], renamed) if t != r] == [commands[5][2], "|main::1::variable_0!0@1#1|", "|main::1::variable_1!0@1#1|"]
+    assert IncrementalSMTEngine.rename(["(", "assert", "B0", ")"], "mutant", set(["B0"])) == ["(", "assert", "|mutant::B0|", ")"]
+
+
+def test_value_to_binary_bitvectors():
+    assert IncrementalSMTEngine.value_to_binary(["#b0101"]) == "0101"
+    assert IncrementalSMTEngine.value_to_binary(["#x3f80"]) == "0011111110000000"
+    assert IncrementalSMTEngine.value_to_binary(IncrementalSMTEngine.tokenize("(_ bv5 8)")) == "00000101"
+
+
+def test_value_to_binary_floating_point():
+    one = IncrementalSMTEngine.tokenize("(fp #b0 #x7f #b00000000000000000000000)")
+    assert IncrementalSMTEngine.value_to_binary(one) == "0" + "01111111" + "0" * 23
+    assert IncrementalSMTEngine.value_to_binary(IncrementalSMTEngine.tokenize("(_ +zero 8 24)")) == "0" * 32
+    assert IncrementalSMTEngine.value_to_binary(IncrementalSMTEngine.tokenize("(_ -zero 8 24)")) == "1" + "0" * 31
+    assert IncrementalSMTEngine.value_to_binary(IncrementalSMTEngine.tokenize("(_ -oo 8 24)")) == "1" + "1" * 8 + "0" * 23
+    assert IncrementalSMTEngine.value_to_binary(IncrementalSMTEngine.tokenize("(_ NaN 8 24)")) == "0" + "1" * 9 + "0" * 22
+
+
+def test_value_to_binary_rejects_unsupported_values():
+    with pytest.raises(Exception):
+        IncrementalSMTEngine.value_to_binary(IncrementalSMTEngine.tokenize("(store a 0 1)"))
@@ -0,0 +1,91 @@
+import numpy
+import pytest
+import suite_minimizer
+from mutator import Mutator
+from suite_minimizer import SuiteMinimizer
+
+# mutation x test row kills: MUT3 is killed by no row, MUT4 was killed without a row (e.g. it crashed)
+KILL_ROWS = {
+    "p.MUT0.c" : numpy.array([0, 2]),
+    "p.MUT1.c" : numpy.array([2, 3]),
+    "p.MUT2.c" : numpy.array([4]),
+    "p.MUT3.c" : numpy.array([], dtype=numpy.int64),
+    "p.MUT4.c" : None,
+}
+NUM_ROWS = 6
+
+
+class RecheckingMutator(object):
+    """ Records the mutations rechecked on the minimized suite and kills the ones in killed. """
+
+    def __init__(self, killed):
+        self.killed = killed
+        self.calls = []
+
+    def test_mutations(self, mutations, test_suite):
+        self.calls.append((list(mutations), test_suite))
+        return {m : numpy.array([0]) if m in self.killed else numpy.array([], dtype=numpy.int64) for m in mutations}
+
+
+def write_kill_matrix(tmp_path, kill_rows, num_rows):
+    suite = tmp_path / "suite.ssv"
+    suite.write_text("".join([f"{j} {j}\n" for j in range(num_rows)]))
+    mutator = Mutator.__new__(Mutator)
+    mutator.kill_rows = kill_rows
+    mutator.num_test_rows = num_rows
+    mutator.early_exit = False
+    mutator.kill_test_suite = str(suite)
+    return mutator.write_kill_matrix(str(tmp_path / "km.npz"))
+
+
+def assert_score_preserved(kill_matrix, selected):
+    killed = kill_matrix.any(axis=1)
+    assert numpy.array_equal(kill_matrix[:, selected].any(axis=1), killed)
+
+
+def test_greedy_cover_keeps_every_kill():
+    rng = numpy.random.default_rng(0)
+    for _ in range(200):
+        kill_matrix = rng.random((rng.integers(1, 30), rng.integers(1, 40))) < rng.random()
+        assert_score_preserved(kill_matrix, SuiteMinimizer.greedy_cover(kill_matrix))
+
+
+@pytest.mark.skipif(suite_minimizer.pulp is None, reason="PuLP is not installed")
+def test_ilp_cover_keeps_every_kill_with_no_more_tests_than_greedy(tmp_path):
+    minimizer = SuiteMinimizer(write_kill_matrix(tmp_path, KILL_ROWS, NUM_ROWS), method="ilp")
+    rng = numpy.random.default_rng(1)
+    for _ in range(20):
+        kill_matrix = rng.random((rng.integers(1, 15), rng.integers(1, 20))) < rng.random()
+        selected = minimizer.ilp_cover(kill_matrix)
+        assert selected is not None
+        assert_score_preserved(kill_matrix, selected)
+        assert len(selected) <= len(SuiteMinimizer.greedy_cover(kill_matrix))
+
+
+@pytest.mark.parametrize("method", SuiteMinimizer.methods)
+def test_minimized_suite_keeps_the_kills(tmp_path, method):
+    minimizer = SuiteMinimizer(write_kill_matrix(tmp_path, KILL_ROWS, NUM_ROWS), method=method)
+    output = str(tmp_path / "min.ssv")
+    stats = minimizer.minimize(output)
+    rows = open(output, "r").read().splitlines()
+    assert rows == ["2 2", "4 4"]
+    assert stats["num_tests_before"] == NUM_ROWS
+    assert stats["num_tests_after"] == 2
+    assert stats["mutations_killed_by_tests"] == 3
+    assert stats["mutations_killed_without_test"] == 1
+    assert stats["mutations_rechecked_on_minimized"] is None
+
+
+def test_unattributed_kill_is_rechecked_on_the_minimized_suite(tmp_path):
+    minimizer = SuiteMinimizer(write_kill_matrix(tmp_path, KILL_ROWS, NUM_ROWS))
+    output = str(tmp_path / "min.ssv")
+    mutator = RecheckingMutator(["p.MUT4.c"])
+    stats = minimizer.minimize(output, mutator=mutator)
+    assert mutator.calls == [(["p.MUT4.c"], output)]
+    assert stats["mutations_rechecked_on_minimized"] == 1
+
+
+def test_unattributed_kill_lost_on_the_minimized_suite_raises(tmp_path):
+    minimizer = SuiteMinimizer(write_kill_matrix(tmp_path, KILL_ROWS, NUM_ROWS))
+    with pytest.raises(Exception, match="p.MUT4.c"):
+        minimizer.minimize(str(tmp_path / "min.ssv"), mutator=RecheckingMutator([]))